@@ -228,7 +228,7 @@ sed -i "s/localserverip/${LOCAL_SERVER_IP}/g" relecov_platform/settings.py
 
 echo "Creating the database structure for relecov-platform"
 python3 manage.py migrate
-python3 manage.py makemigrations relecov_core django_plotly_dash
+python3 manage.py makemigrations relecov_core relecov_dashboard django_plotly_dash
 python3 manage.py migrate
 
 ## Adding permissions
@@ -3,6 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
 
 from relecov_core.models import (
+    ApiKey,
     BioinfoAnalysisValue,
     BioinfoAnalysisField,
     Classification,
@@ -23,6 +24,7 @@ from relecov_core.models import (
     PublicDatabaseValues,
     PublicDatabaseType,
     Sample,
+    SampleAccession,
     SampleState,
     Schema,
     SchemaProperties,
@@ -131,6 +133,11 @@ class PublicDatabaseValuesAdmin(admin.ModelAdmin):
     search_fields = ["value__icontains", "sampleID__sequencing_sample_id__icontains"]
 
 
+class SampleAccessionAdmin(admin.ModelAdmin):
+    list_display = ["accession", "database_type", "sampleID"]
+    search_fields = ["accession", "sampleID__sequencing_sample_id__icontains"]
+
+
 class SampleAdmin(admin.ModelAdmin):
     list_display = [
         "sequencing_sample_id",
@@ -180,7 +187,7 @@ class SchemaPropertiesAdmin(admin.ModelAdmin):
 
 
 class TemporalSampleStorageAdmin(admin.ModelAdmin):
-    list_display = ["sample_name", "field", "value", "user"]
+    list_display = ["sample_name", "user", "generated_at"]
 
 
 class PropertyOptionsAdmin(admin.ModelAdmin):
@@ -196,6 +203,15 @@ class MetadataVisualizationAdmin(admin.ModelAdmin):
     ]
 
 
+class ApiKeyAdmin(admin.ModelAdmin):
+    # keys are created with the create_api_key command, which shows the key
+    list_display = ["name", "user", "key_prefix", "scopes", "created_at", "revoked_at"]
+    readonly_fields = ["key_prefix", "key_hash"]
+
+    def has_add_permission(self, request):
+        return False
+
+
 # Register models
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
@@ -217,6 +233,7 @@ admin.site.register(PropertyOptions, PropertyOptionsAdmin)
 admin.site.register(PublicDatabaseType, PublicDatabaseTypeAdmin)
 admin.site.register(PublicDatabaseFields, PublicDatabaseFieldsAdmin)
 admin.site.register(PublicDatabaseValues, PublicDatabaseValuesAdmin)
+admin.site.register(SampleAccession, SampleAccessionAdmin)
 admin.site.register(MetadataVisualization, MetadataVisualizationAdmin)
 admin.site.register(BioinfoAnalysisField, BioinfoAnalysisFielddAdmin)
 admin.site.register(BioinfoAnalysisValue, BioinfoAnalysisValueAdmin)
@@ -226,3 +243,4 @@ admin.site.register(Error, ErrorAdmin)
 admin.site.register(DateUpdateState, DateUpdateStateAdmin)
 admin.site.register(LineageInfo, LineageInfoAdmin)
 admin.site.register(OrganismAnnotation, OrganismAnnotationAdmin)
+admin.site.register(ApiKey, ApiKeyAdmin)
@@ -0,0 +1,53 @@
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+
+from relecov_core.api.utils.api_key_handling import verify_api_key
+from relecov_core.core_config import (
+    ERROR_API_KEY_INVALID,
+    ERROR_API_KEY_SCOPE_NOT_ALLOWED,
+)
+
+
+class ApiKeyAuthentication(BaseAuthentication):
+    """Authentication for pipelines with the header
+    "Authorization: Api-Key <key>". request.auth is set to the prefix and
+    the scopes of the key
+    """
+
+    keyword = "Api-Key"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed(ERROR_API_KEY_INVALID)
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(ERROR_API_KEY_INVALID)
+        result = verify_api_key(key)
+        if result is None:
+            raise AuthenticationFailed(ERROR_API_KEY_INVALID)
+        return result
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+def api_key_scope(scope):
+    """Return a permission class which requires the scope when the request
+    is authenticated with an api key. Requests authenticated in other ways
+    are not restricted
+    """
+
+    class HasApiKeyScope(BasePermission):
+        message = ERROR_API_KEY_SCOPE_NOT_ALLOWED
+
+        def has_permission(self, request, view):
+            if not isinstance(request.successful_authenticator, ApiKeyAuthentication):
+                return True
+            return scope in request.auth["scopes"]
+
+    return HasApiKeyScope
@@ -9,6 +9,17 @@ urlpatterns = [
         "createBioinfoData", views.create_bioinfo_metadata, name="create_bioinfo_data"
     ),
     path("createSampleData", views.create_sample_data, name="create_sample_data"),
+    path(
+        "createSampleBatchData",
+        views.create_sample_batch_data,
+        name="create_sample_batch_data",
+    ),
     path("createVariantData", views.create_variant_data, name="create_variant_data"),
+    path(
+        "ingestionJob/<int:job_id>",
+        views.ingestion_job_status,
+        name="ingestion_job_status",
+    ),
     path("updateState", views.update_state, name="update_state"),
+    path("updateStateBulk", views.update_state_bulk, name="update_state_bulk"),
 ]
@@ -0,0 +1,103 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from django.conf import settings
+
+from relecov_core.core_config import (
+    API_KEY_CACHE_SIZE,
+    API_KEY_CACHE_TTL,
+    API_KEY_SCOPES,
+    ERROR_API_KEY_INVALID,
+    ERROR_API_KEY_SCOPE_NOT_DEFINED,
+)
+from relecov_core.models import ApiKey
+
+_verified_keys_lock = threading.Lock()
+
+
+def get_api_key_hash(key):
+    """Return the keyed hash stored for the key. A fast hash is enough
+    because keys are random values, not passwords chosen by users
+    """
+    return hmac.new(
+        settings.SECRET_KEY.encode("utf-8"), key.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def create_api_key(user_obj, name, scopes):
+    """Create a new key for the user. The key is returned only here, since
+    it cannot be recovered from the stored hash
+    """
+    for scope in scopes:
+        if scope not in API_KEY_SCOPES:
+            return {"ERROR": ERROR_API_KEY_SCOPE_NOT_DEFINED}
+    key_prefix = secrets.token_hex(4)
+    key = "%s.%s" % (key_prefix, secrets.token_urlsafe(32))
+    api_key_obj = ApiKey.objects.create_new_api_key(
+        {
+            "user": user_obj,
+            "name": name,
+            "key_prefix": key_prefix,
+            "key_hash": get_api_key_hash(key),
+            "scopes": list(scopes),
+        }
+    )
+    return {"api_key": api_key_obj, "key": key}
+
+
+def revoke_api_key(key_prefix):
+    api_key_obj = ApiKey.objects.filter(
+        key_prefix__exact=key_prefix, revoked_at=None
+    ).last()
+    if api_key_obj is None:
+        return {"ERROR": ERROR_API_KEY_INVALID}
+    api_key_obj.revoke()
+    return {"SUCCESS": api_key_obj.get_key_prefix()}
+
+
+def verify_api_key(key):
+    """Return the user and the information of the key, or None if the key
+    does not exist, was revoked or belongs to an inactive user. The user and
+    the scopes of verified keys are kept in memory for API_KEY_CACHE_TTL
+    seconds. Revocation and user deactivation are checked in the database
+    on every call, since they can be done in any process
+    """
+    key_hash = get_api_key_hash(key)
+    now = time.monotonic()
+    with _verified_keys_lock:
+        cached = ApiKey.objects.verified_keys.get(key_hash)
+    if cached is not None and cached[0] > now:
+        if ApiKey.objects.filter(
+            key_hash__exact=key_hash, revoked_at=None, user__is_active=True
+        ).exists():
+            return cached[1], cached[2]
+        with _verified_keys_lock:
+            ApiKey.objects.verified_keys.pop(key_hash, None)
+        return None
+    api_key_obj = (
+        ApiKey.objects.filter(key_hash__exact=key_hash, revoked_at=None)
+        .select_related("user")
+        .first()
+    )
+    if api_key_obj is None or not api_key_obj.user.is_active:
+        return None
+    key_info = {
+        "key_prefix": api_key_obj.get_key_prefix(),
+        "scopes": api_key_obj.get_scopes(),
+    }
+    with _verified_keys_lock:
+        verified_keys = ApiKey.objects.verified_keys
+        if len(verified_keys) >= API_KEY_CACHE_SIZE:
+            for cached_hash in [h for h, v in verified_keys.items() if v[0] <= now]:
+                del verified_keys[cached_hash]
+            if len(verified_keys) >= API_KEY_CACHE_SIZE:
+                verified_keys.clear()
+        verified_keys[key_hash] = (
+            now + API_KEY_CACHE_TTL,
+            api_key_obj.user,
+            key_info,
+        )
+    return api_key_obj.user, key_info
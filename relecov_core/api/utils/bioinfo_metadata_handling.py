@@ -1,18 +1,30 @@
+from django.db import transaction
+
 from relecov_core.models import (
     BioinfoAnalysisField,
     BioinfoAnalysisValue,
     LineageFields,
+    LineageValues,
     Sample,
 )
 
 from relecov_core.core_config import (
+    ERROR_ANALYSIS_ALREADY_DEFINED,
+    ERROR_ANALYSIS_DATE_NOT_INCLUDED,
+    ERROR_SAMPLE_NAME_NOT_INCLUDED,
+    ERROR_SAMPLE_NOT_DEFINED,
+    ERROR_SCHEMA_NAME_VERSION_NOT_DEFINED,
     ERROR_UNABLE_TO_STORE_IN_DATABASE,
+    UPSERT_BATCH_SIZE,
 )
 
 from relecov_core.api.serializers import (
     CreateBioinfoAnalysisValueSerializer,
     CreateLineageValueSerializer,
 )
+from relecov_core.api.utils.common_functions import get_schema_version_if_exists
+from relecov_core.utils.handling_samples import get_sample_obj_from_sample_name
+from relecov_core.utils.handling_sample_state import record_sample_states
 
 
 def split_bioinfo_data(data, schema_obj):
@@ -20,6 +32,7 @@ def split_bioinfo_data(data, schema_obj):
     split_data = {}
     split_data["bioinfo"] = {}
     split_data["lineage"] = {}
+    split_data["analysis_date"] = data.get("analysis_date")
     for field, value in data.items():
         if field == "sequencing_sample_id":
             split_data["sample"] = value
@@ -61,6 +74,7 @@ def store_bioinfo_data(s_data, schema_obj):
         data = {
             "value": value,
             "bioinfo_analysis_fieldID": field_id,
+            "analysis_date": s_data.get("analysis_date"),
         }
 
         bio_value_serializer = CreateBioinfoAnalysisValueSerializer(data=data)
@@ -78,12 +92,187 @@ def store_bioinfo_data(s_data, schema_obj):
             .last()
             .get_lineage_field_id()
         )
-        data = {"value": value, "lineage_fieldID": lineage_id}
+        data = {
+            "value": value,
+            "lineage_fieldID": lineage_id,
+            "analysis_date": s_data.get("analysis_date"),
+        }
         lineage_value_serializer = CreateLineageValueSerializer(data=data)
 
         if not lineage_value_serializer.is_valid():
             return {"ERROR": str(field + " " + ERROR_UNABLE_TO_STORE_IN_DATABASE)}
         lineage_value_obj = lineage_value_serializer.save()
-        sample_obj.linage_values.add(lineage_value_obj)
+        sample_obj.lineage_values.add(lineage_value_obj)
 
     return {"SUCCESS": "success"}
+
+
+def store_bioinfo_request(data):
+    """Store the bioinfo analysis sent to the createBioinfoData request and
+    move the sample to the Bioinfo state
+    """
+    schema_obj = get_schema_version_if_exists(data)
+    if schema_obj is None:
+        return {"ERROR": ERROR_SCHEMA_NAME_VERSION_NOT_DEFINED}
+    if "sequencing_sample_id" not in data:
+        return {"ERROR": ERROR_SAMPLE_NAME_NOT_INCLUDED}
+    sample_obj = get_sample_obj_from_sample_name(data["sequencing_sample_id"])
+    if sample_obj is None:
+        return {"ERROR": ERROR_SAMPLE_NOT_DEFINED}
+
+    analysis_defined = get_analysis_defined(sample_obj)
+    if data.get("analysis_date") in list(analysis_defined):
+        return {"ERROR": ERROR_ANALYSIS_ALREADY_DEFINED}
+
+    split_data = split_bioinfo_data(data, schema_obj)
+    if "ERROR" in split_data:
+        return split_data
+
+    stored_data = store_bioinfo_data(split_data, schema_obj)
+    if "ERROR" in stored_data:
+        return stored_data
+    # update sample state and include it in DateUpdateState table
+    return record_sample_states(sample_obj.get_sample_id(), ["Bioinfo"])
+
+
+def get_stored_analysis_values(value_objs, analysis_date, analysis_dates):
+    """Return the values stored for the analysis. Values stored before the
+    analysis date was recorded with them are only taken when the sample
+    has no other analysis
+    """
+    stored_objs = list(value_objs.filter(analysis_date__exact=analysis_date))
+    if len(stored_objs) == 0 and analysis_dates == [analysis_date]:
+        stored_objs = list(value_objs.filter(analysis_date=None))
+    return stored_objs
+
+
+def upsert_analysis_values(model, field_name, m2m, stored_objs, new_values, date):
+    """Compare the stored values with the requested ones, keyed by field id,
+    and apply the differences. New values are added to the sample relation
+    with a single query. Return the inserted, updated and deleted counts
+    """
+    field_attname = field_name + "_id"
+    stored_values = {}
+    delete_ids = []
+    for value_obj in sorted(stored_objs, key=lambda obj: obj.pk):
+        field_id = getattr(value_obj, field_attname)
+        if field_id in stored_values:
+            delete_ids.append(value_obj.pk)
+        else:
+            stored_values[field_id] = value_obj
+    insert_objs = []
+    update_objs = []
+    for field_id, value in new_values.items():
+        if field_id not in stored_values:
+            # created one by one because the pks are needed for the relation
+            # with the sample and bulk_create does not return them in MySQL
+            insert_objs.append(
+                model.objects.create(
+                    **{field_attname: field_id, "value": value, "analysis_date": date}
+                )
+            )
+            continue
+        value_obj = stored_values[field_id]
+        if value_obj.value != value or value_obj.analysis_date != date:
+            value_obj.value = value
+            value_obj.analysis_date = date
+            update_objs.append(value_obj)
+    delete_ids += [
+        value_obj.pk
+        for field_id, value_obj in stored_values.items()
+        if field_id not in new_values
+    ]
+    if len(insert_objs) > 0:
+        m2m.add(*insert_objs)
+    model.objects.bulk_update(
+        update_objs, ["value", "analysis_date"], batch_size=UPSERT_BATCH_SIZE
+    )
+    for idx in range(0, len(delete_ids), UPSERT_BATCH_SIZE):
+        model.objects.filter(pk__in=delete_ids[idx : idx + UPSERT_BATCH_SIZE]).delete()
+    return [len(insert_objs), len(update_objs), len(delete_ids)]
+
+
+def upsert_bioinfo_request(data):
+    """Store the bioinfo analysis sent to the createBioinfoData request
+    replacing the values previously sent for the same sample and analysis
+    date. Only the changed values are written, inside one transaction. The
+    sample is moved to the Bioinfo state only when the analysis is new
+    """
+    schema_obj = get_schema_version_if_exists(data)
+    if schema_obj is None:
+        return {"ERROR": ERROR_SCHEMA_NAME_VERSION_NOT_DEFINED}
+    if "sequencing_sample_id" not in data:
+        return {"ERROR": ERROR_SAMPLE_NAME_NOT_INCLUDED}
+    analysis_date = data.get("analysis_date")
+    if not analysis_date:
+        return {"ERROR": ERROR_ANALYSIS_DATE_NOT_INCLUDED}
+    sample_obj = get_sample_obj_from_sample_name(data["sequencing_sample_id"])
+    if sample_obj is None:
+        return {"ERROR": ERROR_SAMPLE_NOT_DEFINED}
+
+    bioinfo_fields = dict(
+        BioinfoAnalysisField.objects.filter(schemaID=schema_obj)
+        .order_by("pk")
+        .values_list("property_name", "pk")
+    )
+    lineage_fields = dict(
+        LineageFields.objects.filter(schemaID=schema_obj)
+        .order_by("pk")
+        .values_list("property_name", "pk")
+    )
+    bioinfo_fields = {name.lower(): pk for name, pk in bioinfo_fields.items()}
+    lineage_fields = {name.lower(): pk for name, pk in lineage_fields.items()}
+    new_bioinfo = {}
+    new_lineage = {}
+    for field, value in data.items():
+        if value is not None:
+            value = str(value)
+            if len(value) > 240:
+                return {"ERROR": str(field + " " + ERROR_UNABLE_TO_STORE_IN_DATABASE)}
+        if field.lower() in bioinfo_fields:
+            new_bioinfo[bioinfo_fields[field.lower()]] = value
+        elif field.lower() in lineage_fields:
+            new_lineage[lineage_fields[field.lower()]] = value
+
+    analysis_dates = list(set(get_analysis_defined(sample_obj)))
+    stored_bioinfo = get_stored_analysis_values(
+        sample_obj.bio_analysis_values.all(), analysis_date, analysis_dates
+    )
+    stored_lineage = get_stored_analysis_values(
+        sample_obj.lineage_values.all(), analysis_date, analysis_dates
+    )
+    new_analysis = analysis_date not in analysis_dates
+    with transaction.atomic():
+        bioinfo_changes = upsert_analysis_values(
+            BioinfoAnalysisValue,
+            "bioinfo_analysis_fieldID",
+            sample_obj.bio_analysis_values,
+            stored_bioinfo,
+            new_bioinfo,
+            analysis_date,
+        )
+        lineage_changes = upsert_analysis_values(
+            LineageValues,
+            "lineage_fieldID",
+            sample_obj.lineage_values,
+            stored_lineage,
+            new_lineage,
+            analysis_date,
+        )
+        if new_analysis:
+            result = record_sample_states(sample_obj.get_sample_id(), ["Bioinfo"])
+            if "ERROR" in result:
+                transaction.set_rollback(True)
+                return result
+    if bioinfo_changes[1] > 0 or bioinfo_changes[2] > 0:
+        # utilization counts are only updated with new values
+        BioinfoAnalysisField.objects.clear_fields_utilization()
+    changes = [b + ln for b, ln in zip(bioinfo_changes, lineage_changes)]
+    return {
+        "SUCCESS": {
+            "inserted": changes[0],
+            "updated": changes[1],
+            "deleted": changes[2],
+            "unchanged": len(new_bioinfo) + len(new_lineage) - changes[0] - changes[1],
+        }
+    }
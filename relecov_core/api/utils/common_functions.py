@@ -1,7 +1,5 @@
 from relecov_core.models import Schema, BioinfoAnalysisValue
 
-from relecov_core.api.serializers import CreateDateAfterChangeStateSerializer
-
 
 def get_schema_version_if_exists(data):
     """Check if schema name and schema version exists"""
@@ -27,10 +25,16 @@ def get_analysis_defined(s_obj):
     ).values_list("value", flat=True)
 
 
-def update_change_state_date(sample_id, state_id):
-    """Update the DateUpdateState table with the new sample state"""
-    d_date = {"stateID": state_id, "sampleID": sample_id}
-    date_update_serializer = CreateDateAfterChangeStateSerializer(data=d_date)
-    if date_update_serializer.is_valid():
-        date_update_serializer.save()
-    return
+def is_query_option_set(request, option):
+    """Check if the boolean option is set in the query string of the request"""
+    return request.query_params.get(option, "").lower() in ["true", "1", "yes"]
+
+
+def is_async_request(request):
+    """Check if the client asks to queue the request instead of waiting"""
+    return is_query_option_set(request, "async")
+
+
+def is_upsert_request(request):
+    """Check if the client asks to replace the analysis with the same date"""
+    return is_query_option_set(request, "upsert")
@@ -0,0 +1,220 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from relecov_core.api.utils.bioinfo_metadata_handling import (
+    store_bioinfo_request,
+    upsert_bioinfo_request,
+)
+from relecov_core.api.utils.common_functions import get_schema_version_if_exists
+from relecov_core.api.utils.variant_handling import (
+    store_variant_request,
+    upsert_variant_request,
+)
+from relecov_core.core_config import (
+    ERROR_IDEMPOTENCY_KEY_INVALID,
+    ERROR_IDEMPOTENCY_KEY_REUSED,
+    ERROR_INGESTION_TYPE_NOT_DEFINED,
+    ERROR_SAMPLE_NAME_NOT_INCLUDED,
+    ERROR_SCHEMA_NAME_VERSION_NOT_DEFINED,
+    ERROR_VARIANT_INFORMATION_NOT_DEFINED,
+    INGESTION_BATCH_SIZE,
+    INGESTION_LOCK_TIMEOUT,
+)
+from relecov_core.models import IngestionJob, IngestionLock
+from relecov_core.signals import ingestion_completed
+
+# job_type, the function that applies the request, the request field with
+# the sample name and the event sent in the ingestion signal
+INGESTION_FUNCTIONS = {
+    "bioinfo": [store_bioinfo_request, "sequencing_sample_id", "bioinfo"],
+    "bioinfo_upsert": [upsert_bioinfo_request, "sequencing_sample_id", "bioinfo"],
+    "variant": [store_variant_request, "sample_name", "variant"],
+    "variant_upsert": [upsert_variant_request, "sample_name", "variant"],
+}
+
+
+def validate_ingestion_request(job_type, data):
+    """Checks done before queuing the request. They do not need to read the
+    sample, which could be created by a request still in the queue
+    """
+    if job_type not in INGESTION_FUNCTIONS:
+        return {"ERROR": ERROR_INGESTION_TYPE_NOT_DEFINED}
+    if not data.get(INGESTION_FUNCTIONS[job_type][1]):
+        return {"ERROR": ERROR_SAMPLE_NAME_NOT_INCLUDED}
+    event = INGESTION_FUNCTIONS[job_type][2]
+    if event == "bioinfo" and get_schema_version_if_exists(data) is None:
+        return {"ERROR": ERROR_SCHEMA_NAME_VERSION_NOT_DEFINED}
+    if event == "variant" and not isinstance(data.get("variants"), list):
+        return {"ERROR": ERROR_VARIANT_INFORMATION_NOT_DEFINED}
+    return {"SUCCESS": "valid"}
+
+
+def queue_ingestion_job(job_type, data, user_obj, idempotency_key=None):
+    """Store the request in the queue. When the idempotency key was already
+    used by the user, the existing job is returned instead of creating a new
+    one, provided that the request data are the same
+    """
+    if idempotency_key:
+        if len(idempotency_key) > 80:
+            return {"ERROR": ERROR_IDEMPOTENCY_KEY_INVALID}
+        job_obj = IngestionJob.objects.filter(
+            user=user_obj, idempotency_key__exact=idempotency_key
+        ).first()
+        if job_obj is not None:
+            if job_obj.get_job_type() != job_type or job_obj.payload != data:
+                return {"ERROR": ERROR_IDEMPOTENCY_KEY_REUSED}
+            return job_obj
+    else:
+        idempotency_key = None
+    result = validate_ingestion_request(job_type, data)
+    if "ERROR" in result:
+        return result
+    try:
+        with transaction.atomic():
+            return IngestionJob.objects.create_new_job(
+                {
+                    "user": user_obj,
+                    "job_type": job_type,
+                    "sample_name": data[INGESTION_FUNCTIONS[job_type][1]],
+                    "idempotency_key": idempotency_key,
+                    "payload": data,
+                }
+            )
+    except IntegrityError:
+        # a retry with the same key was stored at the same time
+        return IngestionJob.objects.get(
+            user=user_obj, idempotency_key__exact=idempotency_key
+        )
+
+
+def get_ingestion_job(job_id, user_obj):
+    """Return the job if it was queued by the user. Superusers can see all
+    jobs
+    """
+    job_objs = IngestionJob.objects.filter(pk=job_id)
+    if not user_obj.is_superuser:
+        job_objs = job_objs.filter(user=user_obj)
+    return job_objs.first()
+
+
+def acquire_ingestion_lock(sample_name):
+    """Create the lock row for the sample. Return False if another worker is
+    applying the jobs of the sample. Stale locks are removed and the jobs
+    left running by the dead worker, whose changes were rolled back, are
+    queued again
+    """
+    stale_date = timezone.now() - timedelta(seconds=INGESTION_LOCK_TIMEOUT)
+    stale_locks = IngestionLock.objects.filter(locked_at__lt=stale_date)
+    stale_samples = list(stale_locks.values_list("sample_name", flat=True))
+    if len(stale_samples) > 0:
+        IngestionJob.objects.filter(
+            sample_name__in=stale_samples, state__exact="running"
+        ).update(state="queued", started_at=None)
+        stale_locks.delete()
+    try:
+        with transaction.atomic():
+            IngestionLock.objects.create(sample_name=sample_name)
+    except IntegrityError:
+        return False
+    return True
+
+
+def release_ingestion_lock(sample_name):
+    IngestionLock.objects.filter(sample_name__exact=sample_name).delete()
+    return
+
+
+def apply_ingestion_job(job_obj):
+    """Apply the request stored in the job inside a transaction, so that
+    nothing is kept in database when the request fails
+    """
+    function = INGESTION_FUNCTIONS[job_obj.get_job_type()][0]
+    try:
+        with transaction.atomic():
+            result = function(job_obj.payload)
+            if "ERROR" in result:
+                transaction.set_rollback(True)
+    except Exception as e:
+        result = {"ERROR": str(e)}
+    state = "error" if "ERROR" in result else "done"
+    IngestionJob.objects.filter(pk=job_obj.pk).update(
+        state=state, result=result, finished_at=timezone.now()
+    )
+    return state
+
+
+def run_sample_ingestion_jobs(sample_name):
+    """Apply the queued jobs of the sample in the order they were received.
+    Return a list with the type and final state of each executed job, empty
+    if the sample is locked by other worker
+    """
+    if not acquire_ingestion_lock(sample_name):
+        return []
+    executed = []
+    try:
+        while True:
+            job_obj = (
+                IngestionJob.objects.filter(
+                    sample_name__exact=sample_name, state__exact="queued"
+                )
+                .order_by("pk")
+                .first()
+            )
+            if job_obj is None:
+                break
+            claimed = IngestionJob.objects.filter(
+                pk=job_obj.pk, state__exact="queued"
+            ).update(state="running", started_at=timezone.now())
+            if claimed == 0:
+                continue
+            executed.append([job_obj.get_job_type(), apply_ingestion_job(job_obj)])
+    finally:
+        release_ingestion_lock(sample_name)
+    return executed
+
+
+def run_sample_ingestion_jobs_in_thread(sample_name):
+    """Run the jobs of the sample closing the database connection opened by
+    the thread
+    """
+    try:
+        return run_sample_ingestion_jobs(sample_name)
+    finally:
+        connection.close()
+
+
+def run_pending_ingestion_jobs(workers=1, batch_size=INGESTION_BATCH_SIZE):
+    """Apply the queued jobs of the samples with the oldest requests, using
+    a thread for each sample up to the number of workers. The ingestion
+    signal is sent once per kind of stored data. Return the number of
+    executed jobs
+    """
+    sample_names = [
+        job["sample_name"]
+        for job in IngestionJob.objects.filter(state__exact="queued")
+        .values("sample_name")
+        .annotate(first_job=Min("pk"))
+        .order_by("first_job")[:batch_size]
+    ]
+    if len(sample_names) == 0:
+        return 0
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(run_sample_ingestion_jobs_in_thread, sample_names)
+            )
+    else:
+        results = [run_sample_ingestion_jobs(name) for name in sample_names]
+    executed = [job for result in results for job in result]
+    events = set(
+        INGESTION_FUNCTIONS[job_type][2]
+        for job_type, state in executed
+        if state == "done"
+    )
+    for event in sorted(events):
+        ingestion_completed.send(sender=run_pending_ingestion_jobs, event=event)
+    return len(executed)
@@ -1,12 +1,48 @@
 from datetime import datetime
-from relecov_core.core_config import ERROR_INTIAL_SETTINGS_NOT_DEFINED
-from relecov_core.models import SampleState, Sample
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from relecov_core.core_config import (
+    BATCH_SAMPLE_CREATED,
+    BATCH_SAMPLE_DUPLICATED,
+    BATCH_SAMPLE_INVALID,
+    ERROR_INTIAL_SETTINGS_NOT_DEFINED,
+    ERROR_MISSING_SAMPLE_DATA,
+    ERROR_UNABLE_TO_STORE_IN_DATABASE,
+)
+from relecov_core.models import (
+    DateUpdateState,
+    PublicDatabaseFields,
+    PublicDatabaseValues,
+    SampleAccession,
+    SampleState,
+    Sample,
+)
+from relecov_core.utils.handling_public_database import get_sample_accessions
 
 from relecov_core.utils.handling_samples import (
+    get_lab_user_map,
     increase_unique_value,
     get_user_id_from_collecting_institution,
 )
 
+# Sample fields which are not taken from the request
+SAMPLE_FIELDS_NOT_IN_REQUEST = [
+    "id",
+    "state",
+    "user",
+    "error_type",
+    "schema_obj",
+    "sample_unique_id",
+    "state_date",
+    "created_at",
+]
+# Number of rows sent in a single insert or "IN" condition
+SAMPLE_BATCH_SIZE = 500
+
 
 def prepare_fields_in_sample(s_data):
     """Add sample state and set to None GISAID and ENA if not set"""
@@ -24,8 +60,10 @@ def prepare_fields_in_sample(s_data):
     return s_data
 
 
-def split_sample_data(data):
-    """Split the json request into dictionnaries with the right fields"""
+def split_sample_fields(data):
+    """Split the json request into dictionnaries with the right fields,
+    without adding the values which are fetched from database
+    """
     split_data = {"sample": {}, "author": {}, "gisaid": {}, "ena": {}}
 
     for item, value in data.items():
@@ -41,7 +79,12 @@ def split_sample_data(data):
         if "date" in item:
             value = datetime.strptime(value, "%Y-%m-%d")
         split_data["sample"][item] = value
+    return split_data
 
+
+def split_sample_data(data):
+    """Split the json request into dictionnaries with the right fields"""
+    split_data = split_sample_fields(data)
     # add user and state to sample data
     split_data["sample"]["state"] = (
         SampleState.objects.filter(state__exact="Defined").last().get_state_id()
@@ -57,3 +100,208 @@ def split_sample_data(data):
     else:
         split_data["sample"]["sample_unique_id"] = "AAA-0001"
     return split_data
+
+
+def get_sample_public_states(split_data):
+    """Return the public database types, and their states, for which the
+    request includes an accession, following the same rules used when a
+    single sample is created
+    """
+    pub_dbs = []
+    accessions = get_sample_accessions(split_data)
+    if "ena" in accessions:
+        pub_dbs.append(["ena", "Ena"])
+    if "gisaid" in accessions:
+        pub_dbs.append(["gisaid", "Gisaid"])
+    if len(split_data["author"]) > 0:
+        pub_dbs.append(["author", None])
+    return pub_dbs
+
+
+def reserve_sample_unique_ids(number):
+    """Return the next "number" sample unique ids. It must be called inside
+    a transaction, so that the last sample is locked until the new ones are
+    stored
+    """
+    last_sample = Sample.objects.select_for_update().order_by("pk").last()
+    unique_ids = []
+    unique_id = None if last_sample is None else last_sample.get_unique_id()
+    for _ in range(number):
+        if unique_id is None:
+            unique_id = "AAA-0001"
+        else:
+            unique_id = increase_unique_value(unique_id)
+        unique_ids.append(unique_id)
+    return unique_ids
+
+
+def create_sample_batch(samples, schema_obj):
+    """Create the samples of the list. Duplicated samples are checked with
+    one query for all of them, the sample values are validated before any
+    insert and samples, state logs and public database values are stored in
+    bulk. Return a list with the result of each sample, in the same order,
+    which is created, duplicated or invalid
+    """
+    sample_fields = {
+        field.name: field
+        for field in Sample._meta.concrete_fields
+        if field.name not in SAMPLE_FIELDS_NOT_IN_REQUEST
+    }
+    state_ids = {}
+    for state in ["Defined", "Ena", "Gisaid"]:
+        state_ids[state] = SampleState.objects.get_state_id(state)
+        if state_ids[state] is None:
+            return {"ERROR": ERROR_INTIAL_SETTINGS_NOT_DEFINED}
+    pub_db_fields = {}
+    for field_obj in PublicDatabaseFields.objects.filter(
+        schemaID=schema_obj
+    ).select_related("database_type"):
+        db_type = field_obj.database_type.public_type_name.lower()
+        pub_db_fields.setdefault(db_type, []).append(field_obj)
+    lab_users = get_lab_user_map()
+
+    # entries which are not dictionaries, or without a valid name, are
+    # reported as invalid in the loop below
+    sample_names = []
+    for data in samples:
+        sample_name = None
+        if isinstance(data, dict):
+            sample_name = data.get("sequencing_sample_id")
+        if not isinstance(sample_name, (str, int)):
+            sample_name = None
+        sample_names.append(sample_name)
+    # names are compared case-insensitively, as for a single sample
+    lower_names = list(
+        {
+            str(sample_name).lower()
+            for sample_name in sample_names
+            if sample_name is not None
+        }
+    )
+    defined_names = set()
+    for idx in range(0, len(lower_names), SAMPLE_BATCH_SIZE):
+        defined_names.update(
+            Sample.objects.annotate(sample_name=Lower("sequencing_sample_id"))
+            .filter(sample_name__in=lower_names[idx : idx + SAMPLE_BATCH_SIZE])
+            .values_list("sample_name", flat=True)
+        )
+
+    results = []
+    new_samples = []
+    for sample_name, data in zip(sample_names, samples):
+        result = {"sample_name": sample_name}
+        results.append(result)
+        if (
+            not isinstance(data, dict)
+            or sample_name is None
+            or "collecting_institution" not in data
+        ):
+            result["result"] = BATCH_SAMPLE_INVALID
+            result["ERROR"] = ERROR_MISSING_SAMPLE_DATA
+            continue
+        lower_name = str(sample_name).lower()
+        if lower_name in defined_names:
+            result["result"] = BATCH_SAMPLE_DUPLICATED
+            continue
+        try:
+            split_data = split_sample_fields(data)
+        except (TypeError, ValueError) as e:
+            result["result"] = BATCH_SAMPLE_INVALID
+            result["ERROR"] = str(e)
+            continue
+        sample_obj = Sample(
+            schema_obj=schema_obj,
+            **{
+                key: value
+                for key, value in split_data["sample"].items()
+                if key in sample_fields
+            }
+        )
+        collecting_institution = data["collecting_institution"] or ""
+        sample_obj.user_id = lab_users.get(str(collecting_institution).lower())
+        try:
+            sample_obj.clean_fields(exclude=SAMPLE_FIELDS_NOT_IN_REQUEST)
+        except ValidationError as e:
+            result["result"] = BATCH_SAMPLE_INVALID
+            result["ERROR"] = e.message_dict
+            continue
+        pub_values = []
+        states = ["Defined"]
+        for pub_db, state in get_sample_public_states(split_data):
+            for field_obj in pub_db_fields.get(pub_db, []):
+                value = split_data[pub_db].get(field_obj.get_property_name(), "")
+                pub_values.append([field_obj, value])
+            if state is not None:
+                states.append(state)
+        long_values = [
+            field_obj.get_property_name()
+            for field_obj, value in pub_values
+            if value is not None and len(str(value)) > 240
+        ]
+        if len(long_values) > 0:
+            result["result"] = BATCH_SAMPLE_INVALID
+            result["ERROR"] = str(
+                long_values[0] + " " + ERROR_UNABLE_TO_STORE_IN_DATABASE
+            )
+            continue
+        defined_names.add(lower_name)
+        new_samples.append(
+            [result, sample_obj, states, pub_values, get_sample_accessions(split_data)]
+        )
+
+    if len(new_samples) == 0:
+        return results
+    now = timezone.now()
+    with transaction.atomic():
+        unique_ids = reserve_sample_unique_ids(len(new_samples))
+        for unique_id, (_, sample_obj, states, _, _) in zip(unique_ids, new_samples):
+            sample_obj.sample_unique_id = unique_id
+            sample_obj.state_id = state_ids[states[-1]]
+            sample_obj.state_date = now
+        Sample.objects.bulk_create(
+            [new_sample[1] for new_sample in new_samples],
+            batch_size=SAMPLE_BATCH_SIZE,
+        )
+        # pks are not returned by bulk_create in every database
+        sample_ids = {}
+        for idx in range(0, len(unique_ids), SAMPLE_BATCH_SIZE):
+            sample_ids.update(
+                Sample.objects.filter(
+                    sample_unique_id__in=unique_ids[idx : idx + SAMPLE_BATCH_SIZE]
+                ).values_list("sample_unique_id", "pk")
+            )
+        state_logs = []
+        value_objs = []
+        accession_objs = []
+        for result, sample_obj, states, pub_values, accessions in new_samples:
+            sample_id = sample_ids[sample_obj.sample_unique_id]
+            for state in states:
+                state_logs.append(
+                    DateUpdateState(sampleID_id=sample_id, stateID_id=state_ids[state])
+                )
+            for field_obj, value in pub_values:
+                value_objs.append(
+                    PublicDatabaseValues(
+                        sampleID_id=sample_id,
+                        public_database_fieldID=field_obj,
+                        value=value,
+                    )
+                )
+            for database_type, accession in accessions.items():
+                accession_objs.append(
+                    SampleAccession(
+                        sampleID_id=sample_id,
+                        database_type=database_type,
+                        accession=accession,
+                    )
+                )
+            result["result"] = BATCH_SAMPLE_CREATED
+            result["sample_unique_id"] = sample_obj.sample_unique_id
+        DateUpdateState.objects.bulk_create(state_logs, batch_size=SAMPLE_BATCH_SIZE)
+        PublicDatabaseValues.objects.bulk_create(
+            value_objs, batch_size=SAMPLE_BATCH_SIZE
+        )
+        SampleAccession.objects.bulk_create(
+            accession_objs, batch_size=SAMPLE_BATCH_SIZE
+        )
+    return results
@@ -5,10 +5,22 @@ from relecov_core.api.serializers import (
     CreateVariantAnnotationSerializer,
     CreateVariantSerializer,
 )
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
 from relecov_core.core_config import (
+    ERROR_ANALYSIS_ALREADY_DEFINED,
+    ERROR_ANALYSIS_DATE_NOT_INCLUDED,
     ERROR_GENE_NOT_DEFINED_IN_DATABASE,
     ERROR_CHROMOSOME_NOT_DEFINED_IN_DATABASE,
+    ERROR_SAMPLE_NAME_NOT_INCLUDED,
+    ERROR_SAMPLE_NOT_DEFINED,
     ERROR_UNABLE_TO_STORE_IN_DATABASE,
+    ERROR_VARIANT_INFORMATION_NOT_DEFINED,
+    ERROR_VARIANT_POSITION_NOT_VALID,
+    UPSERT_BATCH_SIZE,
 )
 
 from relecov_core.models import (
@@ -19,6 +31,8 @@ from relecov_core.models import (
     VariantAnnotation,
 )
 
+from relecov_core.utils.handling_samples import get_sample_obj_from_sample_name
+from relecov_core.utils.handling_sample_state import record_sample_states
 from relecov_core.utils.handling_variant import (
     get_if_chromosomes_exists,
     get_gene_obj_from_gene_name,
@@ -72,14 +86,27 @@ def store_variant_in_sample(v_data):
     return v_obj
 
 
+def get_variant_position(data):
+    """Return the position of the variant as integer, or None if it is not
+    a valid number
+    """
+    try:
+        return int(data["Variant"]["pos"])
+    except (TypeError, ValueError):
+        return None
+
+
 def get_variant_id(data):
     """look out for the necessary reference ids to create the variance instance"""
     chr_obj = get_if_chromosomes_exists(data["Chromosome"])
     if chr_obj is None:
         return {"ERROR": ERROR_CHROMOSOME_NOT_DEFINED_IN_DATABASE}
+    pos = get_variant_position(data)
+    if pos is None:
+        return {"ERROR": ERROR_VARIANT_POSITION_NOT_VALID}
     variant_obj = Variant.objects.filter(
         chromosomeID_id=chr_obj,
-        pos__iexact=data["Variant"]["pos"],
+        pos=pos,
         alt__iexact=data["Variant"]["alt"],
     ).last()
     if variant_obj is None:
@@ -90,7 +117,7 @@ def get_variant_id(data):
         variant_dict = {}
         variant_dict["chromosomeID_id"] = chr_obj.get_chromosome_id()
         variant_dict["filterID_id"] = filter_obj.get_filter_id()
-        variant_dict["pos"] = data["Variant"]["pos"]
+        variant_dict["pos"] = pos
         variant_dict["alt"] = data["Variant"]["alt"]
         variant_dict["ref"] = data["Variant"]["ref"]
         variant_serializer = CreateVariantSerializer(data=variant_dict)
@@ -106,23 +133,61 @@ def get_variant_analysis_defined(s_obj):
     )
 
 
-def get_required_variant_ann_id(data):
-    """Look for the ids that variant annotation needs"""
+def get_required_variant_ann_id(data, known_ids=None):
+    """Look for the ids that variant annotation needs. known_ids is a
+    dictionary, shared by the variants of the same request, where the gene
+    and effect ids already found are kept
+    """
+    if known_ids is None:
+        known_ids = {}
     v_ann_ids = {}
-    gene_obj = get_gene_obj_from_gene_name(data["Gene"])
-
-    if gene_obj is None:
-        return {"ERROR": ERROR_GENE_NOT_DEFINED_IN_DATABASE}
-    v_ann_ids["geneID_id"] = gene_obj.get_gene_id()
-    effect_obj = create_or_get_effect_obj(data["Effect"])
-    if isinstance(effect_obj, dict):
-        return effect_obj
-    v_ann_ids["geneID_id"] = gene_obj.get_gene_id()
-    v_ann_ids["effectID_id"] = effect_obj.get_effect_id()
+    if ("gene", data["Gene"]) not in known_ids:
+        gene_obj = get_gene_obj_from_gene_name(data["Gene"])
+        if gene_obj is None:
+            return {"ERROR": ERROR_GENE_NOT_DEFINED_IN_DATABASE}
+        known_ids[("gene", data["Gene"])] = gene_obj.get_gene_id()
+    if ("effect", data["Effect"]) not in known_ids:
+        effect_obj = create_or_get_effect_obj(data["Effect"])
+        if isinstance(effect_obj, dict):
+            return effect_obj
+        known_ids[("effect", data["Effect"])] = effect_obj.get_effect_id()
+    v_ann_ids["geneID_id"] = known_ids[("gene", data["Gene"])]
+    v_ann_ids["effectID_id"] = known_ids[("effect", data["Effect"])]
     return v_ann_ids
 
 
-def split_variant_data(data, sample_obj, date):
+def get_variant_annotation_key(variant_id, gene_id, effect_id, hgvs_c, hgvs_p):
+    """Return the hash which identifies the annotation, stored in the
+    annotation_key column. hgvs values are not case sensitive
+    """
+    key_data = "|".join(
+        [
+            str(variant_id),
+            str(gene_id),
+            str(effect_id),
+            str(hgvs_c).lower(),
+            str(hgvs_p).lower(),
+        ]
+    )
+    return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+
+def get_stored_annotation_keys(annotation_keys):
+    """Return the set of the given keys which are already stored, checked
+    with a single query for each chunk of keys
+    """
+    annotation_keys = list(set(annotation_keys))
+    stored_keys = set()
+    for idx in range(0, len(annotation_keys), UPSERT_BATCH_SIZE):
+        stored_keys.update(
+            VariantAnnotation.objects.filter(
+                annotation_key__in=annotation_keys[idx : idx + UPSERT_BATCH_SIZE]
+            ).values_list("annotation_key", flat=True)
+        )
+    return stored_keys
+
+
+def split_variant_data(data, sample_obj, date, known_ids=None):
 
     split_data = {"variant_in_sample": {}, "variant_ann": {}}
     split_data["variant_in_sample"]["sampleID_id"] = sample_obj.get_sample_id()
@@ -134,22 +199,274 @@ def split_variant_data(data, sample_obj, date):
 
     split_data["variant_in_sample"].update(data["VariantInSample"])
 
-    v_ann_id = get_required_variant_ann_id(data)
+    v_ann_id = get_required_variant_ann_id(data, known_ids)
     if "ERROR" in v_ann_id:
         return v_ann_id
     split_data["variant_ann"] = v_ann_id
     split_data["variant_ann"]["variantID_id"] = variant_id
 
     split_data["variant_ann"].update(data["VariantAnnotation"])
+    split_data["variant_ann"]["annotation_key"] = get_variant_annotation_key(
+        variant_id,
+        v_ann_id["geneID_id"],
+        v_ann_id["effectID_id"],
+        split_data["variant_ann"]["hgvs_c"],
+        split_data["variant_ann"]["hgvs_p"],
+    )
     return split_data
 
 
 def variant_annotation_exists(data):
     """Check if variant annotation exists. Return True if exists"""
-    if VariantAnnotation.objects.filter(
-        hgvs_c__iexact=data["hgvs_c"],
-        hgvs_p__iexact=data["hgvs_p"],
-        hgvs_p_1_letter__iexact=data["hgvs_p_1_letter"],
-    ).exists():
-        return True
-    return False
+    return VariantAnnotation.objects.filter(
+        annotation_key__exact=data["annotation_key"]
+    ).exists()
+
+
+def store_variant_request(data):
+    """Store the variants sent to the createVariantData request and move
+    the sample to the Variant state. If any variant cannot be stored, the
+    ones already created are deleted
+    """
+    if "sample_name" not in data:
+        return {"ERROR": ERROR_SAMPLE_NAME_NOT_INCLUDED}
+    sample_obj = get_sample_obj_from_sample_name(data["sample_name"])
+    if sample_obj is None:
+        return {"ERROR": ERROR_SAMPLE_NOT_DEFINED}
+    analysis_defined = get_variant_analysis_defined(sample_obj)
+    if data.get("analysis_date") in list(analysis_defined):
+        return {"ERROR": ERROR_ANALYSIS_ALREADY_DEFINED}
+
+    if "variants" not in data:
+        return {"ERROR": ERROR_VARIANT_INFORMATION_NOT_DEFINED}
+    known_ids = {}
+    split_variants = []
+    for v_data in data["variants"]:
+        split_data = split_variant_data(
+            v_data, sample_obj, data["analysis_date"], known_ids
+        )
+        if "ERROR" in split_data:
+            return {"ERROR": split_data}
+        split_variants.append(split_data)
+    # annotations of the request that are already stored, or created while
+    # storing the previous variants
+    known_annotations = get_stored_annotation_keys(
+        [split_data["variant_ann"]["annotation_key"] for split_data in split_variants]
+    )
+    v_in_sample_list = []
+    v_an_list = []
+
+    for split_data in split_variants:
+        variant_in_sample_obj = store_variant_in_sample(split_data["variant_in_sample"])
+        if isinstance(variant_in_sample_obj, dict):
+            delete_created_variancs(v_in_sample_list, v_an_list)
+            return {"ERROR": variant_in_sample_obj}
+        v_in_sample_list.append(variant_in_sample_obj)
+
+        annotation_key = split_data["variant_ann"]["annotation_key"]
+        if annotation_key not in known_annotations:
+            variant_ann_obj = store_variant_annotation(split_data["variant_ann"])
+            if isinstance(variant_ann_obj, dict):
+                delete_created_variancs(v_in_sample_list, v_an_list)
+                return {"ERROR": variant_ann_obj}
+            v_an_list.append(variant_ann_obj)
+            known_annotations.add(annotation_key)
+
+    # update sample state and include it in DateUpdateState table
+    return record_sample_states(sample_obj.get_sample_id(), ["Variant"])
+
+
+def get_upsert_variant_ids(variants):
+    """Return the variant id of each variant in the request, or the error.
+    Stored variants are fetched with one query per chromosome and only the
+    new ones are created
+    """
+    chromosomes = {}
+    positions = {}
+    for v_data in variants:
+        chr_name = v_data["Chromosome"]
+        if chr_name not in chromosomes:
+            chr_obj = get_if_chromosomes_exists(chr_name)
+            if chr_obj is None:
+                return {"ERROR": ERROR_CHROMOSOME_NOT_DEFINED_IN_DATABASE}
+            chromosomes[chr_name] = chr_obj
+            positions[chr_name] = set()
+        pos = get_variant_position(v_data)
+        if pos is None:
+            return {"ERROR": ERROR_VARIANT_POSITION_NOT_VALID}
+        positions[chr_name].add(pos)
+    stored_ids = {}
+    for chr_name, chr_obj in chromosomes.items():
+        for pos, alt, pk in (
+            Variant.objects.filter(
+                chromosomeID_id=chr_obj, pos__in=list(positions[chr_name])
+            )
+            .order_by("pk")
+            .values_list("pos", "alt", "pk")
+        ):
+            stored_ids[(chr_name, pos, str(alt).lower())] = pk
+    variant_ids = []
+    for v_data in variants:
+        key = (
+            v_data["Chromosome"],
+            get_variant_position(v_data),
+            str(v_data["Variant"]["alt"]).lower(),
+        )
+        if key not in stored_ids:
+            variant_id = get_variant_id(v_data)
+            if isinstance(variant_id, dict):
+                return variant_id
+            stored_ids[key] = int(variant_id)
+        variant_ids.append(stored_ids[key])
+    return variant_ids
+
+
+def get_new_variant_annotations(variants, variant_ids):
+    """Return the annotations of the request which are not stored yet, or
+    the error. All the annotation keys are checked with a single query
+    """
+    known_ids = {}
+    new_annotations = []
+    for v_data, variant_id in zip(variants, variant_ids):
+        v_ann_ids = get_required_variant_ann_id(v_data, known_ids)
+        if "ERROR" in v_ann_ids:
+            return v_ann_ids
+        ann_data = v_data["VariantAnnotation"]
+        v_ann_obj = VariantAnnotation(
+            geneID_id_id=v_ann_ids["geneID_id"],
+            effectID_id_id=v_ann_ids["effectID_id"],
+            variantID_id_id=variant_id,
+            hgvs_c=ann_data["hgvs_c"],
+            hgvs_p=ann_data["hgvs_p"],
+            hgvs_p_1_letter=ann_data["hgvs_p_1_letter"],
+            annotation_key=get_variant_annotation_key(
+                variant_id,
+                v_ann_ids["geneID_id"],
+                v_ann_ids["effectID_id"],
+                ann_data["hgvs_c"],
+                ann_data["hgvs_p"],
+            ),
+        )
+        try:
+            v_ann_obj.clean_fields(exclude=["geneID_id", "effectID_id", "variantID_id"])
+        except ValidationError:
+            return {"ERROR": ERROR_UNABLE_TO_STORE_IN_DATABASE}
+        new_annotations.append(v_ann_obj)
+    known_annotations = get_stored_annotation_keys(
+        [v_ann_obj.annotation_key for v_ann_obj in new_annotations]
+    )
+    v_ann_objs = []
+    for v_ann_obj in new_annotations:
+        if v_ann_obj.annotation_key in known_annotations:
+            continue
+        known_annotations.add(v_ann_obj.annotation_key)
+        v_ann_objs.append(v_ann_obj)
+    return v_ann_objs
+
+
+def upsert_variants(sample_obj, analysis_date, variants):
+    """Make the variants stored for the sample and analysis date equal to
+    the ones in the request. The stored and requested sets are compared in
+    memory and only the inserts, updates and deletes are applied, with bulk
+    queries inside one transaction. Return the number of changes
+    """
+    variant_ids = get_upsert_variant_ids(variants)
+    if isinstance(variant_ids, dict):
+        return variant_ids
+    v_in_sample_fields = ["dp", "ref_dp", "alt_dp", "af"]
+    new_values = {}
+    for v_data, variant_id in zip(variants, variant_ids):
+        v_in_sample_obj = VariantInSample(
+            sampleID_id=sample_obj,
+            variantID_id_id=variant_id,
+            analysis_date=analysis_date,
+            **{
+                field: value
+                for field, value in v_data["VariantInSample"].items()
+                if field in v_in_sample_fields
+            }
+        )
+        try:
+            v_in_sample_obj.clean_fields(exclude=["sampleID_id", "variantID_id"])
+        except ValidationError:
+            return {"ERROR": ERROR_UNABLE_TO_STORE_IN_DATABASE}
+        # the last value is kept if the variant is repeated in the request
+        new_values[variant_id] = v_in_sample_obj
+    v_ann_objs = get_new_variant_annotations(variants, variant_ids)
+    if isinstance(v_ann_objs, dict):
+        return v_ann_objs
+
+    stored_objs = {}
+    delete_ids = []
+    for v_in_sample_obj in VariantInSample.objects.filter(
+        sampleID_id=sample_obj, analysis_date__exact=analysis_date
+    ).order_by("pk"):
+        if v_in_sample_obj.variantID_id_id in stored_objs:
+            delete_ids.append(v_in_sample_obj.pk)
+        else:
+            stored_objs[v_in_sample_obj.variantID_id_id] = v_in_sample_obj
+    insert_objs = []
+    update_objs = []
+    for variant_id, new_obj in new_values.items():
+        if variant_id not in stored_objs:
+            insert_objs.append(new_obj)
+            continue
+        stored_obj = stored_objs[variant_id]
+        changed = False
+        for field in v_in_sample_fields:
+            # compare the cleaned value with the stored one
+            if str(getattr(stored_obj, field)) != str(getattr(new_obj, field)):
+                setattr(stored_obj, field, getattr(new_obj, field))
+                changed = True
+        if changed:
+            update_objs.append(stored_obj)
+    delete_ids += [
+        stored_obj.pk
+        for variant_id, stored_obj in stored_objs.items()
+        if variant_id not in new_values
+    ]
+
+    with transaction.atomic():
+        VariantInSample.objects.bulk_create(insert_objs, batch_size=UPSERT_BATCH_SIZE)
+        VariantInSample.objects.bulk_update(
+            update_objs, v_in_sample_fields, batch_size=UPSERT_BATCH_SIZE
+        )
+        for idx in range(0, len(delete_ids), UPSERT_BATCH_SIZE):
+            VariantInSample.objects.filter(
+                pk__in=delete_ids[idx : idx + UPSERT_BATCH_SIZE]
+            ).delete()
+        VariantAnnotation.objects.bulk_create(v_ann_objs, batch_size=UPSERT_BATCH_SIZE)
+    return {
+        "inserted": len(insert_objs),
+        "updated": len(update_objs),
+        "deleted": len(delete_ids),
+        "unchanged": len(new_values) - len(insert_objs) - len(update_objs),
+        "new_analysis": len(stored_objs) == 0 and len(insert_objs) > 0,
+    }
+
+
+def upsert_variant_request(data):
+    """Store the variants sent to the createVariantData request replacing
+    the ones previously sent for the same sample and analysis date. The
+    sample is moved to the Variant state only when the analysis is new
+    """
+    if "sample_name" not in data:
+        return {"ERROR": ERROR_SAMPLE_NAME_NOT_INCLUDED}
+    if not data.get("analysis_date"):
+        return {"ERROR": ERROR_ANALYSIS_DATE_NOT_INCLUDED}
+    if not isinstance(data.get("variants"), list):
+        return {"ERROR": ERROR_VARIANT_INFORMATION_NOT_DEFINED}
+    sample_obj = get_sample_obj_from_sample_name(data["sample_name"])
+    if sample_obj is None:
+        return {"ERROR": ERROR_SAMPLE_NOT_DEFINED}
+    with transaction.atomic():
+        changes = upsert_variants(sample_obj, data["analysis_date"], data["variants"])
+        if "ERROR" in changes:
+            transaction.set_rollback(True)
+            return changes
+        if changes.pop("new_analysis"):
+            result = record_sample_states(sample_obj.get_sample_id(), ["Variant"])
+            if "ERROR" in result:
+                transaction.set_rollback(True)
+                return result
+    return {"SUCCESS": changes}
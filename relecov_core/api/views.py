@@ -13,48 +13,55 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from django.http import QueryDict
-from relecov_core.api.serializers import (
-    CreateDateAfterChangeStateSerializer,
-    CreateSampleSerializer,
-    CreateErrorSerializer,
-    UpdateStateSampleSerializer,
-)
+from relecov_core.api.authentication import ApiKeyAuthentication, api_key_scope
+from relecov_core.api.serializers import CreateSampleSerializer
 
-from relecov_core.models import SampleState, Error
+from relecov_core.signals import ingestion_completed
 
 
 from relecov_core.api.utils.sample_handling import (
+    create_sample_batch,
+    get_sample_public_states,
     split_sample_data,
 )
 from relecov_core.utils.handling_samples import get_sample_obj_from_sample_name
+from relecov_core.utils.handling_sample_state import (
+    record_sample_states,
+    update_sample_states,
+)
 
 from relecov_core.api.utils.bioinfo_metadata_handling import (
-    split_bioinfo_data,
-    store_bioinfo_data,
-    get_analysis_defined,
+    store_bioinfo_request,
+    upsert_bioinfo_request,
 )
 
 from relecov_core.api.utils.public_db_handling import store_pub_databases_data
+from relecov_core.utils.handling_public_database import (
+    get_sample_accessions,
+    store_sample_accessions,
+)
 
 from relecov_core.api.utils.variant_handling import (
-    split_variant_data,
-    store_variant_annotation,
-    store_variant_in_sample,
-    delete_created_variancs,
-    variant_annotation_exists,
-    get_variant_analysis_defined,
+    store_variant_request,
+    upsert_variant_request,
 )
 
 from relecov_core.api.utils.common_functions import (
     get_schema_version_if_exists,
-    update_change_state_date,
+    is_async_request,
+    is_upsert_request,
+)
+from relecov_core.api.utils.ingestion_handling import (
+    get_ingestion_job,
+    queue_ingestion_job,
 )
 
 from relecov_core.core_config import (
+    BATCH_SAMPLE_CREATED,
+    ERROR_INGESTION_JOB_NOT_DEFINED,
     ERROR_SAMPLE_NAME_NOT_INCLUDED,
-    ERROR_SAMPLE_NOT_DEFINED,
-    ERROR_VARIANT_INFORMATION_NOT_DEFINED,
-    ERROR_ANALYSIS_ALREADY_DEFINED,
+    ERROR_SAMPLE_STATE_LIST_NOT_INCLUDED,
+    ERROR_SCHEMA_NAME_VERSION_NOT_DEFINED,
 )
 
 
@@ -136,9 +143,11 @@ from relecov_core.core_config import (
         500: "Internal Server Error",
     },
 )
-@authentication_classes([SessionAuthentication, BasicAuthentication])
 @api_view(["POST"])
-@permission_classes([IsAuthenticated])
+@authentication_classes(
+    [SessionAuthentication, BasicAuthentication, ApiKeyAuthentication]
+)
+@permission_classes([IsAuthenticated, api_key_scope("create_sample")])
 def create_sample_data(request):
     if request.method == "POST":
         data = request.data
@@ -146,10 +155,10 @@ def create_sample_data(request):
             data = data.dict()
 
         schema_obj = get_schema_version_if_exists(data)
-        schema_id = schema_obj.get_schema_id()
         if schema_obj is None:
-            error = {"ERROR": "schema name and version is not defined"}
+            error = {"ERROR": ERROR_SCHEMA_NAME_VERSION_NOT_DEFINED}
             return Response(error, status=status.HTTP_400_BAD_REQUEST)
+        schema_id = schema_obj.get_schema_id()
         # check if sample id field and collecting_institution are in the request
         if "sequencing_sample_id" not in data or "collecting_institution" not in data:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -169,187 +178,186 @@ def create_sample_data(request):
             )
         sample_obj = sample_serializer.save()
         sample_id = sample_obj.get_sample_id()
-        # update sample state date
-        data = {
-            "sampleID": sample_id,
-            "stateID": split_data["sample"]["state"],
-        }
-        date_serilizer = CreateDateAfterChangeStateSerializer(data=data)
-        if date_serilizer.is_valid():
-            date_serilizer.save()
-
-        # Save ENA info if included
-        if len(split_data["ena"]) > 0:
-            if (
-                split_data["ena"]["ena_sample_accession"] != "Not Provided"
-                and split_data["ena"]["ena_sample_accession"] != ""
-            ):
-                result = store_pub_databases_data(
-                    split_data["ena"], "ena", schema_obj, sample_id
-                )
-                if "ERROR" in result:
-                    return Response(result, status=status.HTTP_400_BAD_REQUEST)
-                # Save entry in update state table
-                sample_obj.update_state("Ena")
-                state_id = (
-                    SampleState.objects.filter(state__exact="Ena").last().get_state_id()
-                )
-                data = {"sampleID": sample_id, "stateID": state_id}
-                date_serilizer = CreateDateAfterChangeStateSerializer(data=data)
-                if date_serilizer.is_valid():
-                    date_serilizer.save()
-        # Save GISAID info if included
-        if len(split_data["gisaid"]) > 0:
-            if "EPI_ISL" in split_data["gisaid"]["gisaid_accession_id"]:
-                result = store_pub_databases_data(
-                    split_data["gisaid"], "gisaid", schema_obj, sample_id
-                )
-                if "ERROR" in result:
-                    return Response(result, status=status.HTTP_400_BAD_REQUEST)
-                # Save entry in update state table
-                sample_obj.update_state("Gisaid")
-                state_id = (
-                    SampleState.objects.filter(state__exact="Gisaid")
-                    .last()
-                    .get_state_id()
-                )
-                data = {"sampleID": sample_id, "stateID": state_id}
-                date_serilizer = CreateDateAfterChangeStateSerializer(data=data)
-                if date_serilizer.is_valid():
-                    date_serilizer.save()
-        # Save AUTHOR info if included
-        if len(split_data["author"]) > 0:
+        # states reached by the sample. They are recorded at the end
+        sample_states = ["Defined"]
+
+        # Save ENA, GISAID and AUTHOR info if included. The states and the
+        # accessions are both taken from get_sample_accessions, as in batch
+        for pub_db, state in get_sample_public_states(split_data):
             result = store_pub_databases_data(
-                split_data["author"], "author", schema_obj, sample_id
+                split_data[pub_db], pub_db, schema_obj, sample_id
             )
             if "ERROR" in result:
                 return Response(result, status=status.HTTP_400_BAD_REQUEST)
+            if state is not None:
+                sample_states.append(state)
+        store_sample_accessions(sample_obj, get_sample_accessions(split_data))
+        result = record_sample_states(sample_id, sample_states)
+        if "ERROR" in result:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        ingestion_completed.send(sender=create_sample_data, event="sample")
         return Response("Successful upload information", status=status.HTTP_201_CREATED)
 
 
-@authentication_classes([SessionAuthentication, BasicAuthentication])
+@swagger_auto_schema(
+    method="post",
+    operation_description="Create several samples in one request. The result of each sample is created, duplicated or invalid.",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "schema_name": openapi.Schema(
+                type=openapi.TYPE_STRING, description="Name of the schema"
+            ),
+            "schema_version": openapi.Schema(
+                type=openapi.TYPE_STRING, description="Version of the schema"
+            ),
+            "samples": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    description="Sample data with the fields used in createSampleData",
+                ),
+            ),
+        },
+    ),
+    responses={
+        201: "Samples processed",
+        400: "Bad Request",
+        500: "Internal Server Error",
+    },
+)
 @api_view(["POST"])
-@permission_classes([IsAuthenticated])
-def create_bioinfo_metadata(request):
-    if request.method == "POST":
-        data = request.data
-
-    if isinstance(data, QueryDict):
-        data = data.dict()
-    # check schema (name and version)
-    schema_obj = get_schema_version_if_exists(data)
-    if schema_obj is None:
-        error = {"ERROR": "schema name and version is not defined"}
-        return Response(error, status=status.HTTP_400_BAD_REQUEST)
-    if "sequencing_sample_id" not in data:
+@authentication_classes(
+    [SessionAuthentication, BasicAuthentication, ApiKeyAuthentication]
+)
+@permission_classes([IsAuthenticated, api_key_scope("create_sample")])
+def create_sample_batch_data(request):
+    data = request.data
+    if "samples" not in data or not isinstance(data["samples"], list):
         return Response(
-            {"ERROR": ERROR_SAMPLE_NAME_NOT_INCLUDED},
+            {"ERROR": ERROR_SAMPLE_STATE_LIST_NOT_INCLUDED},
             status=status.HTTP_400_BAD_REQUEST,
         )
-    sample_obj = get_sample_obj_from_sample_name(data["sequencing_sample_id"])
-    if sample_obj is None:
-        return Response(
-            {"ERROR": ERROR_SAMPLE_NOT_DEFINED}, status=status.HTTP_400_BAD_REQUEST
-        )
-
-    analysis_defined = get_analysis_defined(sample_obj)
-    if data["analysis_date"] in list(analysis_defined):
+    schema_obj = get_schema_version_if_exists(data)
+    if schema_obj is None:
         return Response(
-            {"ERROR": ERROR_ANALYSIS_ALREADY_DEFINED},
+            {"ERROR": ERROR_SCHEMA_NAME_VERSION_NOT_DEFINED},
             status=status.HTTP_400_BAD_REQUEST,
         )
+    result = create_sample_batch(data["samples"], schema_obj)
+    if "ERROR" in result:
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    if any(sample["result"] == BATCH_SAMPLE_CREATED for sample in result):
+        ingestion_completed.send(sender=create_sample_batch_data, event="sample")
+    return Response({"samples": result}, status=status.HTTP_201_CREATED)
+
+
+def accept_ingestion_job(request, job_type, data):
+    """Store the request in the ingestion queue and answer with the job"""
+    job_obj = queue_ingestion_job(
+        job_type, data, request.user, request.headers.get("Idempotency-Key")
+    )
+    if isinstance(job_obj, dict):
+        return Response(job_obj, status=status.HTTP_400_BAD_REQUEST)
+    return Response(job_obj.get_job_info(), status=status.HTTP_202_ACCEPTED)
+
+
+async_parameter = openapi.Parameter(
+    "async",
+    openapi.IN_QUERY,
+    description="If true the data are queued and the response includes the job id",
+    type=openapi.TYPE_BOOLEAN,
+)
+upsert_parameter = openapi.Parameter(
+    "upsert",
+    openapi.IN_QUERY,
+    description="If true the analysis with the same date is replaced, writing only the changes, whose counts are returned",
+    type=openapi.TYPE_BOOLEAN,
+)
 
-    split_data = split_bioinfo_data(data, schema_obj)
-    if "ERROR" in split_data:
-        return Response(split_data, status=status.HTTP_400_BAD_REQUEST)
-
-    stored_data = store_bioinfo_data(split_data, schema_obj)
-    if "ERROR" in stored_data:
-        return Response(stored_data, status=status.HTTP_400_BAD_REQUEST)
-    state_id = SampleState.objects.filter(state__exact="Bioinfo").last().get_state_id()
-    data_date = {"sampleID": sample_obj.get_sample_id(), "stateID": state_id}
 
-    # update sample state
-    sample_obj.update_state("Bioinfo")
-    # Include date and state in DateState table
-    date_serializer = CreateDateAfterChangeStateSerializer(data=data_date)
-    if date_serializer.is_valid():
-        date_serializer.save()
+@swagger_auto_schema(
+    method="post", manual_parameters=[async_parameter, upsert_parameter]
+)
+@api_view(["POST"])
+@authentication_classes(
+    [SessionAuthentication, BasicAuthentication, ApiKeyAuthentication]
+)
+@permission_classes([IsAuthenticated, api_key_scope("create_bioinfo")])
+def create_bioinfo_metadata(request):
+    if request.method == "POST":
+        data = request.data
 
+    if isinstance(data, QueryDict):
+        data = data.dict()
+    if is_async_request(request):
+        if is_upsert_request(request):
+            return accept_ingestion_job(request, "bioinfo_upsert", data)
+        return accept_ingestion_job(request, "bioinfo", data)
+    if is_upsert_request(request):
+        result = upsert_bioinfo_request(data)
+        if "ERROR" in result:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        ingestion_completed.send(sender=create_bioinfo_metadata, event="bioinfo")
+        return Response(result, status=status.HTTP_200_OK)
+    result = store_bioinfo_request(data)
+    if "ERROR" in result:
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    ingestion_completed.send(sender=create_bioinfo_metadata, event="bioinfo")
     return Response(status=status.HTTP_201_CREATED)
 
 
-@authentication_classes([SessionAuthentication, BasicAuthentication])
+@swagger_auto_schema(
+    method="post", manual_parameters=[async_parameter, upsert_parameter]
+)
 @api_view(["POST"])
-@permission_classes([IsAuthenticated])
+@authentication_classes(
+    [SessionAuthentication, BasicAuthentication, ApiKeyAuthentication]
+)
+@permission_classes([IsAuthenticated, api_key_scope("create_variant")])
 def create_variant_data(request):
     if request.method == "POST":
         data = request.data
         if isinstance(data, QueryDict):
             data = data.dict()
+        if is_async_request(request):
+            if is_upsert_request(request):
+                return accept_ingestion_job(request, "variant_upsert", data)
+            return accept_ingestion_job(request, "variant", data)
+        if is_upsert_request(request):
+            result = upsert_variant_request(data)
+            if "ERROR" in result:
+                return Response(result, status=status.HTTP_400_BAD_REQUEST)
+            ingestion_completed.send(sender=create_variant_data, event="variant")
+            return Response(result, status=status.HTTP_200_OK)
+        result = store_variant_request(data)
+        if "ERROR" in result:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        ingestion_completed.send(sender=create_variant_data, event="variant")
+        return Response(status=status.HTTP_201_CREATED)
 
-        sample_obj = get_sample_obj_from_sample_name(data["sample_name"])
-        if sample_obj is None:
-            return Response(
-                {"ERROR": ERROR_SAMPLE_NOT_DEFINED}, status=status.HTTP_400_BAD_REQUEST
-            )
-        analysis_defined = get_variant_analysis_defined(sample_obj)
-        if data["analysis_date"] in list(analysis_defined):
-            return Response(
-                {"ERROR": ERROR_ANALYSIS_ALREADY_DEFINED},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        if "variants" not in data:
-            return Response(
-                {"ERROR": ERROR_VARIANT_INFORMATION_NOT_DEFINED},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        found_error = False
-        v_in_sample_list = []
-        v_an_list = []
-
-        for v_data in data["variants"]:
-            split_data = split_variant_data(v_data, sample_obj, data["analysis_date"])
-
-            if "ERROR" in split_data:
-                error = {"ERROR": split_data}
-                found_error = True
-                break
-
-            variant_in_sample_obj = store_variant_in_sample(
-                split_data["variant_in_sample"]
-            )
-
-            if isinstance(variant_in_sample_obj, dict):
-                error = {"ERROR": variant_in_sample_obj}
-                found_error = True
-                break
-
-            v_in_sample_list.append(variant_in_sample_obj)
-
-            if not variant_annotation_exists(split_data["variant_ann"]):
-                variant_ann_obj = store_variant_annotation(split_data["variant_ann"])
-                if isinstance(variant_ann_obj, dict):
-                    error = {"ERROR": variant_ann_obj}
-                    found_error = True
-                    break
-
-                v_an_list.append(variant_ann_obj)
-
-        if found_error:
-            delete_created_variancs(v_in_sample_list, v_an_list)
-            return Response(error, status=status.HTTP_400_BAD_REQUEST)
 
-        sample_obj.update_state("Variant")
-        # Include date and state in DateState table
-        state_id = (
-            SampleState.objects.filter(state__exact="Variant").last().get_state_id()
+@swagger_auto_schema(
+    method="get",
+    operation_description="Return the state of a job queued with the async option.",
+    responses={
+        200: "Job information",
+        404: "Job not found",
+    },
+)
+@api_view(["GET"])
+@authentication_classes(
+    [SessionAuthentication, BasicAuthentication, ApiKeyAuthentication]
+)
+@permission_classes([IsAuthenticated])
+def ingestion_job_status(request, job_id):
+    job_obj = get_ingestion_job(job_id, request.user)
+    if job_obj is None:
+        return Response(
+            {"ERROR": ERROR_INGESTION_JOB_NOT_DEFINED},
+            status=status.HTTP_404_NOT_FOUND,
         )
-        sample_id = sample_obj.get_sample_id()
-        update_change_state_date(sample_id, state_id)
-
-        return Response(status=status.HTTP_201_CREATED)
+    return Response(job_obj.get_job_info(), status=status.HTTP_200_OK)
 
 
 @swagger_auto_schema(
@@ -376,52 +384,75 @@ def create_variant_data(request):
         500: "Internal Server Error",
     },
 )
-@authentication_classes([SessionAuthentication, BasicAuthentication])
-@permission_classes([IsAuthenticated])
 @api_view(["PUT"])
+@authentication_classes(
+    [SessionAuthentication, BasicAuthentication, ApiKeyAuthentication]
+)
+@permission_classes([IsAuthenticated, api_key_scope("update_state")])
 def update_state(request):
     if request.method == "PUT":
         data = request.data
         if isinstance(data, QueryDict):
             data = data.dict()
-        data["user"] = request.user.pk
-        sample_obj = get_sample_obj_from_sample_name(data["sample_name"])
-        if sample_obj is None:
+        if "sample_name" not in data or "state" not in data:
             return Response(
-                {"ERROR": ERROR_SAMPLE_NOT_DEFINED}, status=status.HTTP_400_BAD_REQUEST
+                {"ERROR": ERROR_SAMPLE_NAME_NOT_INCLUDED},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        sample_id = sample_obj.get_sample_id()
-        # if state exists,
-        if SampleState.objects.filter(state=data["state"]).exists():
-            s_data = {
-                "state": SampleState.objects.filter(state=data["state"])
-                .last()
-                .get_state_id()
-            }
-        else:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-
-        sample_serializer = UpdateStateSampleSerializer(sample_obj, data=s_data)
-        if not sample_serializer.is_valid():
+        result = update_sample_states([data])
+        if "ERROR" in result:
             return Response(
-                sample_serializer.errors, status=status.HTTP_400_BAD_REQUEST
-            )
-        sample_serializer.save()
-
-        if "error_type" in data and "Error" in data["state"]:
-            error_type_id = (
-                Error.objects.filter(error_name=data["error_type"])
-                .last()
-                .get_error_id()
+                {"ERROR": result["ERROR"][0]["ERROR"]},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            e_data = {"error_type": error_type_id}
-            sample_err_serializer = CreateErrorSerializer(sample_obj, data=e_data)
-            if not sample_err_serializer.is_valid():
-                return Response(
-                    sample_err_serializer.errors, status=status.HTTP_400_BAD_REQUEST
-                )
-            sample_err_serializer.save()
+        return Response("Successful upload information", status=status.HTTP_201_CREATED)
 
-        update_change_state_date(sample_id, s_data["state"])
 
-        return Response("Successful upload information", status=status.HTTP_201_CREATED)
+@swagger_auto_schema(
+    method="put",
+    operation_description="Update the state of several samples in one request. If any entry is not valid no sample is updated.",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "samples": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "sample_name": openapi.Schema(
+                            type=openapi.TYPE_STRING, description="Name of Sample"
+                        ),
+                        "state": openapi.Schema(
+                            type=openapi.TYPE_STRING, description="Sample Status"
+                        ),
+                        "error_type": openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description="(Optional) Type of error when the status of the sample is ERROR",
+                        ),
+                    },
+                ),
+            ),
+        },
+    ),
+    responses={
+        201: "Successful update information",
+        400: "Bad Request",
+        500: "Internal Server Error",
+    },
+)
+@api_view(["PUT"])
+@authentication_classes(
+    [SessionAuthentication, BasicAuthentication, ApiKeyAuthentication]
+)
+@permission_classes([IsAuthenticated, api_key_scope("update_state")])
+def update_state_bulk(request):
+    data = request.data
+    if "samples" not in data or not isinstance(data["samples"], list):
+        return Response(
+            {"ERROR": ERROR_SAMPLE_STATE_LIST_NOT_INCLUDED},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    result = update_sample_states(data["samples"])
+    if "ERROR" in result:
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result, status=status.HTTP_201_CREATED)
@@ -0,0 +1,457 @@
+import base64
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from relecov_core.api.utils.api_key_handling import create_api_key
+from relecov_core.benchmark.dataset import (
+    BENCHMARK_CHROMOSOME,
+    BENCHMARK_SCHEMA_NAME,
+    BENCHMARK_SCHEMA_VERSION,
+    BENCHMARK_USER_PASSWORD,
+    EFFECTS,
+    LINEAGES,
+    SARS_COV_2_GENES,
+)
+from relecov_core.core_config import (
+    ALLOWED_EMPTY_FIELDS_IN_METADATA_SAMPLE_FORM,
+    FIELD_FOR_GETTING_SAMPLE_ID,
+)
+from relecov_core.models import Sample, Variant
+from relecov_core.utils.handling_samples import validate_input_samples
+
+# url names of the dashboard views
+DASHBOARD_VIEWS = [
+    "methodology_index",
+    "methodology_host_info",
+    "methodology_sample_processing",
+    "methodology_sequencing",
+    "methodology_bioinfo",
+    "variants_index",
+    "received_samples_dashboard",
+    "mutations_in_lineages_dashboard",
+    "spike_mutations_3d_dashboard",
+    "lineages_voc_dashboard",
+    "variants_mutations_in_lineages_needle_plot",
+    "variants_mutations_in_lineages_heatmap",
+    "variants_mutations_in_lineages_table",
+    "variants_lineage_variation_over_time_graph",
+    "samples_received_over_time_map",
+    "samples_received_over_time_pie",
+    "samples_received_over_time_pie_laboratory",
+    "spike_mutations_3D_color",
+    "spike_mutations_3D_BN",
+]
+
+
+def count_queries(counter):
+    """Return a wrapper for connection.execute_wrapper which counts the
+    executed queries
+    """
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    return wrapper
+
+
+def get_error_text(error):
+    return "%s: %s" % (type(error).__name__, str(error).split("\n")[0])
+
+
+def run_case(name, group, func, repeat):
+    """Execute the function repeat times, recording the wall time, the
+    number of SQL queries and the returned status of each run. The case is
+    stopped at the first exception, which is recorded as error
+    """
+    result = {"name": name, "group": group, "runs": [], "queries": [], "status": []}
+    for iteration in range(repeat):
+        counter = [0]
+        with connection.execute_wrapper(count_queries(counter)):
+            start = time.perf_counter()
+            try:
+                status = func(iteration)
+            except Exception as e:
+                result["error"] = get_error_text(e)
+                break
+            result["runs"].append(time.perf_counter() - start)
+        result["queries"].append(counter[0])
+        result["status"].append(status)
+    if len(result["runs"]) > 0:
+        result["min"] = min(result["runs"])
+        result["median"] = statistics.median(result["runs"])
+        result["max"] = max(result["runs"])
+    return result
+
+
+def get_api_cases(dataset):
+    """Cases for the REST API views. Each iteration uploads a new sample,
+    its bioinfo analysis and its variants, so the cases must be executed in
+    order and with the same number of iterations
+    """
+    client = APIClient()
+    client.force_authenticate(user=User.objects.get(username="admin"))
+    variant_objs = list(Variant.objects.all()[:100])
+    bulk_sample_names = list(
+        Sample.objects.order_by("pk").values_list("sequencing_sample_id", flat=True)
+    )
+    lab_name = dataset["lims_samples"][0]["laboratory"]
+
+    def sample_name(iteration):
+        return "BENCH-API-%06d" % iteration
+
+    def get_sample_data(name, number):
+        return {
+            "sequencing_sample_id": name,
+            "collecting_lab_sample_id": name,
+            "microbiology_lab_sample_id": name,
+            "submitting_lab_sample_id": name,
+            "collecting_institution": lab_name,
+            "sequence_file_R1_fastq": "%s_R1.fastq.gz" % name,
+            "sequence_file_R2_fastq": "%s_R2.fastq.gz" % name,
+            "sequencing_date": "2022-06-01",
+            "gisaid_accession_id": "EPI_ISL_%s" % (90000000 + number),
+            "ena_sample_accession": "ERS%s" % (9000000 + number),
+        }
+
+    def create_sample_data(iteration):
+        data = get_sample_data(sample_name(iteration), iteration)
+        data["schema_name"] = BENCHMARK_SCHEMA_NAME
+        data["schema_version"] = BENCHMARK_SCHEMA_VERSION
+        return client.post(
+            reverse("relecov_api:create_sample_data"), data, format="json"
+        ).status_code
+
+    def create_bioinfo_data(iteration):
+        data = {
+            "schema_name": BENCHMARK_SCHEMA_NAME,
+            "schema_version": BENCHMARK_SCHEMA_VERSION,
+            "sequencing_sample_id": sample_name(iteration),
+            "analysis_date": "20220605",
+            "depth_of_coverage_value": "1500",
+            "number_of_variants_in_consensus": "60",
+            "number_of_base_pairs_sequenced": "25000000",
+            "per_Ns": "1.5",
+            "per_reads_host": "5.2",
+            "per_reads_virus": "90.1",
+            "per_unmapped": "4.7",
+            "lineage_name": LINEAGES[iteration % len(LINEAGES)],
+            "lineage_algorithm_software_version": "pangolin 4.1.2",
+        }
+        return client.post(
+            reverse("relecov_api:create_bioinfo_data"), data, format="json"
+        ).status_code
+
+    def get_variants():
+        variants = []
+        for idx, variant_obj in enumerate(variant_objs):
+            pos = variant_obj.pos
+            gene = SARS_COV_2_GENES[0][0]
+            for name, start, end in SARS_COV_2_GENES:
+                if start <= pos <= end:
+                    gene = name
+                    break
+            variants.append(
+                {
+                    "Chromosome": BENCHMARK_CHROMOSOME,
+                    "Variant": {
+                        "pos": variant_obj.pos,
+                        "ref": variant_obj.ref,
+                        "alt": variant_obj.alt,
+                    },
+                    "Filter": "PASS",
+                    "VariantInSample": {
+                        "dp": "1000",
+                        "ref_dp": "100",
+                        "alt_dp": "900",
+                        "af": "0.9",
+                    },
+                    "Gene": gene,
+                    "Effect": EFFECTS[idx % len(EFFECTS)],
+                    "VariantAnnotation": {
+                        "hgvs_c": "c.%s%s>%s"
+                        % (variant_obj.pos, variant_obj.ref, variant_obj.alt),
+                        "hgvs_p": "p.Bench%s" % idx,
+                        "hgvs_p_1_letter": "p.B%s" % idx,
+                    },
+                }
+            )
+        return variants
+
+    def create_variant_data(iteration):
+        data = {
+            "sample_name": sample_name(iteration),
+            "analysis_date": "20220605",
+            "variants": get_variants(),
+        }
+        return client.post(
+            reverse("relecov_api:create_variant_data"), data, format="json"
+        ).status_code
+
+    def upsert_variant_data(iteration):
+        # corrected analysis: 10 changed values and 5 removed variants
+        variants = get_variants()[:-5]
+        for v_data in variants[:10]:
+            v_data["VariantInSample"]["dp"] = "2000"
+        data = {
+            "sample_name": sample_name(iteration),
+            "analysis_date": "20220605",
+            "variants": variants,
+        }
+        return client.post(
+            reverse("relecov_api:create_variant_data") + "?upsert=true",
+            data,
+            format="json",
+        ).status_code
+
+    def update_state(iteration):
+        data = {"sample_name": sample_name(iteration), "state": "Gisaid"}
+        return client.put(
+            reverse("relecov_api:update_state"), data, format="json"
+        ).status_code
+
+    def create_sample_batch_data(iteration):
+        # one sequencing run of 96 samples
+        data = {
+            "schema_name": BENCHMARK_SCHEMA_NAME,
+            "schema_version": BENCHMARK_SCHEMA_VERSION,
+            "samples": [
+                get_sample_data(
+                    "BENCH-BATCH-%04d-%02d" % (iteration, idx), 100000 + idx
+                )
+                for idx in range(96)
+            ],
+        }
+        return client.post(
+            reverse("relecov_api:create_sample_batch_data"), data, format="json"
+        ).status_code
+
+    def update_state_bulk(iteration):
+        # move 100 of the generated samples to the Ena state
+        data = {
+            "samples": [
+                {"sample_name": sample_name, "state": "Ena"}
+                for sample_name in bulk_sample_names[
+                    iteration * 100 : (iteration + 1) * 100
+                ]
+            ]
+        }
+        return client.put(
+            reverse("relecov_api:update_state_bulk"), data, format="json"
+        ).status_code
+
+    return [
+        ["api_create_sample_data", create_sample_data],
+        ["api_create_bioinfo_data", create_bioinfo_data],
+        ["api_create_variant_data", create_variant_data],
+        ["api_upsert_variant_data", upsert_variant_data],
+        ["api_update_state", update_state],
+        ["api_update_state_bulk_100", update_state_bulk],
+        ["api_create_sample_batch_data_96", create_sample_batch_data],
+    ]
+
+
+def get_auth_cases(dataset):
+    """Cases to compare the authentication overhead of the API. Each
+    iteration sends 10 requests for a job which does not exist, so the
+    response is 404 after the user is authenticated
+    """
+    admin_obj = User.objects.get(username="admin")
+    basic_client = APIClient()
+    basic_client.credentials(
+        HTTP_AUTHORIZATION="Basic %s"
+        % base64.b64encode(
+            ("admin:%s" % BENCHMARK_USER_PASSWORD).encode("utf-8")
+        ).decode("ascii")
+    )
+    api_key_client = APIClient()
+    api_key_client.credentials(
+        HTTP_AUTHORIZATION="Api-Key %s"
+        % create_api_key(admin_obj, "benchmark", [])["key"]
+    )
+    url = reverse("relecov_api:ingestion_job_status", kwargs={"job_id": 0})
+
+    def auth_case(client):
+        def case(iteration):
+            for _ in range(10):
+                status = client.get(url).status_code
+            return status
+
+        return case
+
+    return [
+        ["auth_basic_10_requests", auth_case(basic_client)],
+        ["auth_api_key_10_requests", auth_case(api_key_client)],
+    ]
+
+
+def get_page_cases(dataset):
+    """Cases for the pages of the core application, requested by a
+    laboratory user and by a RELECOV manager
+    """
+    lab_client = Client()
+    lab_client.force_login(User.objects.get(username=dataset["lab_users"][0]))
+    manager_client = Client()
+    manager_client.force_login(User.objects.get(username=dataset["manager_user"]))
+    lab_name = dataset["lims_samples"][0]["laboratory"]
+    sample_ids = list(
+        Sample.objects.filter(collecting_institution__exact=lab_name).values_list(
+            "pk", flat=True
+        )
+    )
+
+    def intranet_lab(iteration):
+        return lab_client.get(reverse("intranet")).status_code
+
+    def intranet_manager(iteration):
+        return manager_client.get(reverse("intranet")).status_code
+
+    def accession_list_manager(iteration):
+        return manager_client.get(
+            reverse("accession_list", kwargs={"database_type": "gisaid"}),
+            {"page": iteration + 1, "page_size": 50},
+        ).status_code
+
+    def sample_display(iteration):
+        sample_id = sample_ids[iteration % len(sample_ids)]
+        return lab_client.get(
+            reverse("sample_display", kwargs={"sample_id": sample_id})
+        ).status_code
+
+    def search_sample(iteration):
+        data = {
+            "action": "searchSample",
+            "sampleName": "",
+            "sDate": "",
+            "lab": lab_name,
+            "sampleState": "",
+        }
+        return manager_client.post(reverse("search_sample"), data).status_code
+
+    return [
+        ["intranet_lab_user", intranet_lab],
+        ["intranet_manager", intranet_manager],
+        ["accession_list_manager", accession_list_manager],
+        ["sample_display", sample_display],
+        ["search_sample", search_sample],
+    ]
+
+
+def get_form_cases(dataset):
+    """Cases for the validation of the metadata form. Each iteration checks
+    a 384 row submission where a quarter of the samples are already
+    recorded and some rows have empty required values
+    """
+    heading = (
+        [FIELD_FOR_GETTING_SAMPLE_ID]
+        + ALLOWED_EMPTY_FIELDS_IN_METADATA_SAMPLE_FORM
+        + ["Form field %s" % idx for idx in range(35)]
+    )
+    recorded_names = list(
+        Sample.objects.order_by("pk").values_list("sequencing_sample_id", flat=True)
+    )
+    rows = []
+    for idx in range(384):
+        if idx % 4 == 0 and len(recorded_names) > 0:
+            # recorded samples are submitted with a different case
+            sample_name = recorded_names[idx % len(recorded_names)].swapcase()
+        else:
+            sample_name = "FORM-%04d" % idx
+        row = [sample_name] + ["value %s" % col for col in range(1, len(heading))]
+        if idx % 12 == 1:
+            row[-1] = ""
+        rows.append(row)
+
+    def validate_form(iteration):
+        result = validate_input_samples(rows, heading)
+        return "%s saved, %s recorded, %s incomplete" % (
+            len(result.get("save_samples", [])),
+            len(result.get("s_already_record", [])),
+            len(result.get("s_incomplete", [])),
+        )
+
+    return [["validate_metadata_form_384_rows", validate_form]]
+
+
+def get_pre_processing_cases(dataset):
+    from relecov_dashboard.utils.pre_processing_jobs import PRE_PROCESSING_FUNCTIONS
+
+    def pre_processing_case(function):
+        def case(iteration):
+            result = function()
+            if result is not None and "ERROR" in result:
+                raise ValueError(result["ERROR"])
+            return "Success"
+
+        return case
+
+    return [
+        [function.__name__, pre_processing_case(function)]
+        for function in PRE_PROCESSING_FUNCTIONS.values()
+    ]
+
+
+def get_dashboard_cases(dataset):
+    """Cases for the dashboard views. The first run shows the time without
+    cached page
+    """
+    client = Client()
+    client.force_login(User.objects.get(username=dataset["manager_user"]))
+
+    def dashboard_case(url_name):
+        def case(iteration):
+            return client.get(reverse(url_name)).status_code
+
+        return case
+
+    return [
+        ["dashboard_%s" % url_name, dashboard_case(url_name)]
+        for url_name in DASHBOARD_VIEWS
+    ]
+
+
+BENCHMARK_GROUPS = {
+    "api": get_api_cases,
+    "auth": get_auth_cases,
+    "pages": get_page_cases,
+    "forms": get_form_cases,
+    "pre_processing": get_pre_processing_cases,
+    "dashboard": get_dashboard_cases,
+}
+
+
+def run_benchmark(dataset, repeat=5, groups=None, lims_app=None):
+    """Run the benchmark cases of the requested groups against the
+    generated dataset. When the fake iSkyLIMS application is given, the
+    number of requests it received is recorded for each case
+    """
+    results = []
+    for group, get_cases in BENCHMARK_GROUPS.items():
+        if groups and group not in groups:
+            continue
+        try:
+            cases = get_cases(dataset)
+        except Exception as e:
+            results.append({"name": group, "group": group, "error": get_error_text(e)})
+            continue
+        for name, func in cases:
+            if lims_app is not None:
+                lims_app.reset_request_count()
+            result = run_case(name, group, func, repeat)
+            if lims_app is not None:
+                result["lims_requests"] = lims_app.get_request_count()
+            results.append(result)
+    return results
+
+
+def write_benchmark_results(file_name, data):
+    with open(file_name, "w") as fh:
+        json.dump(data, fh, indent=4, default=str)
+    return
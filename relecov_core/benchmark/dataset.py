@@ -0,0 +1,587 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.db.models import Max
+
+from relecov_core.api.utils.variant_handling import get_variant_annotation_key
+from relecov_core.models import (
+    BioinfoAnalysisField,
+    BioinfoAnalysisValue,
+    Chromosome,
+    ConfigSetting,
+    DateUpdateState,
+    Effect,
+    Error,
+    Filter,
+    Gene,
+    LineageFields,
+    LineageValues,
+    Profile,
+    PublicDatabaseFields,
+    PublicDatabaseType,
+    PublicDatabaseValues,
+    Sample,
+    SampleAccession,
+    SampleState,
+    Schema,
+    Variant,
+    VariantAnnotation,
+    VariantInSample,
+)
+
+BENCHMARK_SCHEMA_NAME = "relecov"
+BENCHMARK_SCHEMA_VERSION = "2.0.0"
+BENCHMARK_USER_PASSWORD = "benchmark"
+BENCHMARK_CHROMOSOME = "NC_045512.2"
+LAB_NAME_FORMAT = "Benchmark laboratory %s"
+LAB_SAMPLE_ID_FORMAT = "LAB%03d-%06d"
+
+# gene name, start and end in NC_045512.2
+SARS_COV_2_GENES = [
+    ["orf1ab", 266, 21555],
+    ["S", 21563, 25384],
+    ["ORF3a", 25393, 26220],
+    ["E", 26245, 26472],
+    ["M", 26523, 27191],
+    ["ORF6", 27202, 27387],
+    ["ORF7a", 27394, 27759],
+    ["ORF7b", 27756, 27887],
+    ["ORF8", 27894, 28259],
+    ["N", 28274, 29533],
+    ["ORF10", 29558, 29674],
+]
+SAMPLE_STATES = [
+    ["Defined", "Sample Defined"],
+    ["Bioinfo", "Recorded Bioinfo Metadata"],
+    ["Variant", "Recorded Variant data"],
+    ["Ena", "Uploaded to ENA"],
+    ["Gisaid", "Uploaded to GISAID"],
+    ["Error", "Error in the sample"],
+]
+BIOINFO_FIELDS = [
+    "analysis_date",
+    "depth_of_coverage_value",
+    "number_of_variants_in_consensus",
+    "number_of_base_pairs_sequenced",
+    "per_Ns",
+    "per_reads_host",
+    "per_reads_virus",
+    "per_unmapped",
+    "qc_filtered",
+    "variant_designation",
+]
+LINEAGE_FIELDS = ["lineage_name", "lineage_algorithm_software_version"]
+LINEAGES = ["B.1.1.7", "B.1.617.2", "BA.1", "BA.2", "BA.5.2", "BQ.1.1", "XBB.1.5"]
+PUBLIC_DATABASE_FIELDS = {
+    "gisaid": ["gisaid_accession_id", "virus_name"],
+    "ena": ["ena_sample_accession", "ena_study_accession"],
+    "author": ["analysis_authors", "author_submitter", "authors"],
+}
+EFFECTS = [
+    "missense_variant",
+    "synonymous_variant",
+    "upstream_gene_variant",
+    "frameshift_variant",
+    "stop_gained",
+]
+REGIONS = ["Andalucia", "Aragon", "Catalunya", "Galicia", "Madrid", "Valencia"]
+LIMS_OPTIONS = {
+    "specimen_source": ["Nasopharynx swab", "Oropharynx swab", "Saliva"],
+    "nucleic_acid_extraction_protocol": ["MagMAX", "QIAamp", "Chemagic"],
+    "library_preparation_kit": ["Illumina COVIDSeq", "Nextera XT", "ARTIC v4"],
+    "sequencing_instrument_platform": ["Illumina", "Oxford Nanopore", "Ion Torrent"],
+    "sequencing_instrument_model": ["MiSeq", "NextSeq 500", "GridION", "S5"],
+    "host_gender": ["female", "male", "unknown"],
+}
+NUCLEOTIDES = ["A", "C", "G", "T"]
+
+
+@contextmanager
+def allow_fixed_dates(*fields):
+    """Allow to store the generated dates in fields defined with auto_now_add"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def bulk_create_with_pks(model, objs, batch_size=1000):
+    """Insert the instances in bulk and set their pk. Databases which do not
+    return the inserted rows (MySQL) get the pks from the new rows, that are
+    inserted in the same order that the list
+    """
+    if len(objs) == 0:
+        return objs
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size=batch_size)
+    last_pk = model.objects.aggregate(Max("pk"))["pk__max"] or 0
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    new_pks = model.objects.filter(pk__gt=last_pk).order_by("pk")
+    for obj, pk in zip(objs, new_pks.values_list("pk", flat=True)):
+        obj.pk = pk
+    return objs
+
+
+def create_settings_data():
+    """Create the sample states, errors and group that the application
+    expects to be loaded at installation time
+    """
+    for state, display in SAMPLE_STATES:
+        SampleState.objects.get_or_create(
+            state=state, defaults={"display_string": display, "description": display}
+        )
+    Error.objects.get_or_create(
+        error_name="Bioinfo failure",
+        defaults={"display_string": "Bioinfo failure", "description": "benchmark"},
+    )
+    Group.objects.get_or_create(name="RelecovManager")
+    return
+
+
+def set_iskylims_server(url):
+    """Point the iSkyLIMS requests to the given server"""
+    ConfigSetting.objects.filter(configuration_name="ISKYLIMS_SERVER").delete()
+    ConfigSetting.objects.create(
+        configuration_name="ISKYLIMS_SERVER", configuration_value=url
+    )
+    return
+
+
+def create_schema_data(admin_obj):
+    """Create a schema with the bioinfo, lineage and public database fields"""
+    schema_obj = Schema.objects.create(
+        file_name="schemas/relecov_schema.json",
+        user_name=admin_obj,
+        schema_name=BENCHMARK_SCHEMA_NAME,
+        schema_version=BENCHMARK_SCHEMA_VERSION,
+        schema_in_use=True,
+        schema_default=True,
+        schema_apps_name="relecov_core",
+    )
+    fields = {"bioinfo": {}, "lineage": {}, "public": {}}
+    for field in BIOINFO_FIELDS:
+        field_obj = BioinfoAnalysisField.objects.create(
+            property_name=field, label_name=field.replace("_", " ")
+        )
+        field_obj.schemaID.add(schema_obj)
+        fields["bioinfo"][field] = field_obj
+    for field in LINEAGE_FIELDS:
+        field_obj = LineageFields.objects.create(
+            property_name=field, label_name=field.replace("_", " ")
+        )
+        field_obj.schemaID.add(schema_obj)
+        fields["lineage"][field] = field_obj
+    for db_type, db_fields in PUBLIC_DATABASE_FIELDS.items():
+        type_obj = PublicDatabaseType.objects.create(
+            public_type_name=db_type, public_type_display=db_type.upper()
+        )
+        for field in db_fields:
+            field_obj = PublicDatabaseFields.objects.create(
+                database_type=type_obj,
+                property_name=field,
+                label_name=field.replace("_", " "),
+            )
+            field_obj.schemaID.add(schema_obj)
+            fields["public"][field] = field_obj
+    return schema_obj, fields
+
+
+def create_annotation_data(rnd, num_variants):
+    """Create the chromosome, genes and a pool of variants with their
+    annotation, spread over the genes
+    """
+    chrom_obj = Chromosome.objects.create(chromosome=BENCHMARK_CHROMOSOME)
+    gene_objs = bulk_create_with_pks(
+        Gene,
+        [
+            Gene(chromosomeID=chrom_obj, gene_name=name, gene_start=start, gene_end=end)
+            for name, start, end in SARS_COV_2_GENES
+        ],
+    )
+    filter_obj = Filter.objects.create(filter="PASS")
+    effect_objs = bulk_create_with_pks(Effect, [Effect(effect=e) for e in EFFECTS])
+
+    positions = rnd.sample(range(SARS_COV_2_GENES[0][1], 29674), num_variants)
+    variant_objs = []
+    for pos in sorted(positions):
+        ref = rnd.choice(NUCLEOTIDES)
+        alt = rnd.choice([n for n in NUCLEOTIDES if n != ref])
+        variant_objs.append(
+            Variant(
+                chromosomeID_id=chrom_obj,
+                filterID_id=filter_obj,
+                pos=pos,
+                ref=ref,
+                alt=alt,
+            )
+        )
+    variant_objs = bulk_create_with_pks(Variant, variant_objs)
+
+    annotation_objs = []
+    for variant_obj in variant_objs:
+        pos = variant_obj.pos
+        gene_obj = gene_objs[0]
+        for g_obj in gene_objs:
+            if g_obj.gene_start <= pos <= g_obj.gene_end:
+                gene_obj = g_obj
+                break
+        aa_pos = (pos - gene_obj.gene_start) // 3 + 1
+        effect_obj = rnd.choice(effect_objs)
+        hgvs_c = "c.%s%s>%s" % (pos, variant_obj.ref, variant_obj.alt)
+        hgvs_p = "p.Xaa%sYaa" % aa_pos
+        annotation_objs.append(
+            VariantAnnotation(
+                geneID_id=gene_obj,
+                effectID_id=effect_obj,
+                variantID_id=variant_obj,
+                hgvs_c=hgvs_c,
+                hgvs_p=hgvs_p,
+                hgvs_p_1_letter="p.X%sY" % aa_pos,
+                annotation_key=get_variant_annotation_key(
+                    variant_obj.pk, gene_obj.pk, effect_obj.pk, hgvs_c, hgvs_p
+                ),
+            )
+        )
+    bulk_create_with_pks(VariantAnnotation, annotation_objs)
+    return variant_objs
+
+
+def create_lab_users(num_labs):
+    """Create one user per laboratory with its profile and a manager user"""
+    lab_users = []
+    for idx in range(num_labs):
+        lab_name = LAB_NAME_FORMAT % (idx + 1)
+        user_obj = User.objects.create_user(
+            username="lab_user_%s" % (idx + 1), password=BENCHMARK_USER_PASSWORD
+        )
+        Profile.objects.filter(user=user_obj).update(
+            laboratory=lab_name, code_id="LAB%03d" % (idx + 1)
+        )
+        lab_users.append([lab_name, user_obj])
+    manager_obj = User.objects.create_user(
+        username="relecov_manager", password=BENCHMARK_USER_PASSWORD
+    )
+    manager_obj.groups.add(Group.objects.get(name="RelecovManager"))
+    return lab_users, manager_obj
+
+
+def create_lims_sample(rnd, sample_name, lab_name, region, collection, entry):
+    """Return the values that iSkyLIMS keeps for the sample"""
+    lims_sample = {
+        "sample_name": sample_name,
+        "laboratory": lab_name,
+        "region": region,
+        "collectionSampleDate": collection.strftime("%Y-%m-%d"),
+        "sampleEntryDate": entry.strftime("%Y-%m-%d"),
+        "diagnostic_pcr_Ct_value_1": "%.1f" % rnd.uniform(12, 35),
+        "host_age": str(rnd.randint(1, 99)),
+        "number_of_samples_in_run": str(rnd.choice([24, 48, 96, 384])),
+    }
+    for field, options in LIMS_OPTIONS.items():
+        lims_sample[field] = rnd.choice(options)
+    return lims_sample
+
+
+def generate_lims_samples(num_labs=10, samples_per_lab=100, seed=1):
+    """Generate the iSkyLIMS values of the samples without using the
+    database. Sample and laboratory names match the ones created by
+    generate_dataset
+    """
+    rnd = random.Random(seed)
+    start_date = datetime(2022, 1, 1)
+    lims_samples = []
+    for lab_idx in range(num_labs):
+        for s_idx in range(samples_per_lab):
+            collection_date = start_date + timedelta(days=rnd.randint(0, 500))
+            lims_samples.append(
+                create_lims_sample(
+                    rnd,
+                    LAB_SAMPLE_ID_FORMAT % (lab_idx + 1, s_idx + 1),
+                    LAB_NAME_FORMAT % (lab_idx + 1),
+                    REGIONS[lab_idx % len(REGIONS)],
+                    collection_date,
+                    collection_date + timedelta(days=rnd.randint(1, 5)),
+                )
+            )
+    return lims_samples
+
+
+def get_lims_samples_from_database(seed=1):
+    """Generate the iSkyLIMS values for the samples stored in database.
+    Collection and entry dates are set some days before the sequencing date
+    """
+    rnd = random.Random(seed)
+    lab_names = []
+    lims_samples = []
+    sample_values = Sample.objects.exclude(collecting_lab_sample_id=None).values(
+        "collecting_lab_sample_id",
+        "collecting_institution",
+        "sequencing_date",
+        "created_at",
+    )
+    for sample in sample_values.order_by("pk"):
+        lab_name = sample["collecting_institution"] or ""
+        if lab_name not in lab_names:
+            lab_names.append(lab_name)
+        entry_date = (sample["sequencing_date"] or sample["created_at"]) - timedelta(
+            days=rnd.randint(1, 10)
+        )
+        lims_samples.append(
+            create_lims_sample(
+                rnd,
+                sample["collecting_lab_sample_id"],
+                lab_name,
+                REGIONS[lab_names.index(lab_name) % len(REGIONS)],
+                entry_date - timedelta(days=rnd.randint(1, 5)),
+                entry_date,
+            )
+        )
+    return lims_samples
+
+
+def generate_dataset(num_labs=10, samples_per_lab=100, variants_per_sample=100, seed=1):
+    """Fill the database with a synthetic RELECOV dataset. Return a summary
+    and the sample values that the fake iSkyLIMS will serve
+    """
+    rnd = random.Random(seed)
+    start_date = datetime(2022, 1, 1)
+    with transaction.atomic():
+        create_settings_data()
+        states = {s.state: s for s in SampleState.objects.all()}
+        admin_obj = User.objects.create_superuser(
+            username="admin", password=BENCHMARK_USER_PASSWORD, email=""
+        )
+        schema_obj, fields = create_schema_data(admin_obj)
+        variant_pool = create_annotation_data(
+            rnd, min(29000, max(variants_per_sample * 5, 500))
+        )
+        lab_users, manager_obj = create_lab_users(num_labs)
+
+        sample_objs = []
+        lims_samples = []
+        for lab_idx, (lab_name, user_obj) in enumerate(lab_users):
+            for s_idx in range(samples_per_lab):
+                num = lab_idx * samples_per_lab + s_idx
+                lab_sample_id = LAB_SAMPLE_ID_FORMAT % (lab_idx + 1, s_idx + 1)
+                collection_date = start_date + timedelta(days=rnd.randint(0, 500))
+                entry_date = collection_date + timedelta(days=rnd.randint(1, 5))
+                sequencing_date = entry_date + timedelta(days=rnd.randint(1, 10))
+                sample_objs.append(
+                    Sample(
+                        state=states["Defined"],
+                        user=user_obj,
+                        schema_obj=schema_obj,
+                        sample_unique_id="%s%s%s-%04d"
+                        % (
+                            chr(65 + num // 9999 // 676 % 26),
+                            chr(65 + num // 9999 // 26 % 26),
+                            chr(65 + num // 9999 % 26),
+                            num % 9999 + 1,
+                        ),
+                        microbiology_lab_sample_id=lab_sample_id,
+                        collecting_lab_sample_id=lab_sample_id,
+                        sequencing_sample_id="SEQ%07d" % (num + 1),
+                        submitting_lab_sample_id=lab_sample_id,
+                        collecting_institution=lab_name,
+                        sequence_file_R1_fastq="%s_R1.fastq.gz" % lab_sample_id,
+                        sequence_file_R2_fastq="%s_R2.fastq.gz" % lab_sample_id,
+                        sequence_file_R1_md5="%032x" % rnd.getrandbits(128),
+                        sequence_file_R2_md5="%032x" % rnd.getrandbits(128),
+                        r1_fastq_filepath="/data/%s" % lab_name,
+                        r2_fastq_filepath="/data/%s" % lab_name,
+                        sequencing_date=sequencing_date,
+                        state_date=sequencing_date,
+                        created_at=sequencing_date,
+                    )
+                )
+                lims_samples.append(
+                    create_lims_sample(
+                        rnd,
+                        lab_sample_id,
+                        lab_name,
+                        REGIONS[lab_idx % len(REGIONS)],
+                        collection_date,
+                        entry_date,
+                    )
+                )
+
+        with allow_fixed_dates(Sample._meta.get_field("created_at")):
+            sample_objs = bulk_create_with_pks(Sample, sample_objs)
+
+        bioinfo_values = []
+        lineage_values = []
+        public_values = []
+        sample_accessions = []
+        date_updates = []
+        variants_in_sample = []
+        for sample_obj in sample_objs:
+            analysis_date = sample_obj.sequencing_date + timedelta(
+                days=rnd.randint(1, 7)
+            )
+            date_updates.append(
+                DateUpdateState(
+                    stateID=states["Defined"],
+                    sampleID=sample_obj,
+                    date=sample_obj.sequencing_date,
+                )
+            )
+            # 90 % of the samples have bioinfo analysis and variants
+            if rnd.random() > 0.9:
+                continue
+            b_values = {
+                "analysis_date": analysis_date.strftime("%Y%m%d"),
+                "depth_of_coverage_value": "%.0f" % rnd.uniform(100, 3000),
+                "number_of_variants_in_consensus": str(rnd.randint(20, 120)),
+                "number_of_base_pairs_sequenced": str(rnd.randint(10**6, 10**8)),
+                "per_Ns": "%.2f" % rnd.uniform(0, 10),
+                "per_reads_host": "%.2f" % rnd.uniform(0, 30),
+                "per_reads_virus": "%.2f" % rnd.uniform(50, 99),
+                "per_unmapped": "%.2f" % rnd.uniform(0, 10),
+                "qc_filtered": str(rnd.randint(10**5, 10**6)),
+                "variant_designation": "Variant of concern",
+            }
+            for field, value in b_values.items():
+                bioinfo_values.append(
+                    [
+                        sample_obj,
+                        BioinfoAnalysisValue(
+                            value=value,
+                            bioinfo_analysis_fieldID=fields["bioinfo"][field],
+                            analysis_date=b_values["analysis_date"],
+                        ),
+                    ]
+                )
+            for field, value in [
+                ["lineage_name", rnd.choice(LINEAGES)],
+                ["lineage_algorithm_software_version", "pangolin 4.1.2"],
+            ]:
+                lineage_values.append(
+                    [
+                        sample_obj,
+                        LineageValues(
+                            value=value,
+                            lineage_fieldID=fields["lineage"][field],
+                            analysis_date=b_values["analysis_date"],
+                        ),
+                    ]
+                )
+            for state in ["Bioinfo", "Variant"]:
+                date_updates.append(
+                    DateUpdateState(
+                        stateID=states[state], sampleID=sample_obj, date=analysis_date
+                    )
+                )
+            for variant_obj in rnd.sample(variant_pool, variants_per_sample):
+                dp = rnd.randint(50, 5000)
+                alt_dp = rnd.randint(0, dp)
+                variants_in_sample.append(
+                    VariantInSample(
+                        sampleID_id=sample_obj,
+                        variantID_id=variant_obj,
+                        analysis_date=b_values["analysis_date"],
+                        dp=dp,
+                        ref_dp=dp - alt_dp,
+                        alt_dp=alt_dp,
+                        af=round(alt_dp / dp, 4),
+                    )
+                )
+            # public databases
+            if rnd.random() < 0.6:
+                upload_date = analysis_date + timedelta(days=rnd.randint(1, 20))
+                public_values += [
+                    PublicDatabaseValues(
+                        public_database_fieldID=fields["public"]["gisaid_accession_id"],
+                        sampleID=sample_obj,
+                        value="EPI_ISL_%s" % (10000000 + sample_obj.pk),
+                    ),
+                    PublicDatabaseValues(
+                        public_database_fieldID=fields["public"]["virus_name"],
+                        sampleID=sample_obj,
+                        value="hCoV-19/Spain/%s/2022"
+                        % sample_obj.collecting_lab_sample_id,
+                    ),
+                    PublicDatabaseValues(
+                        public_database_fieldID=fields["public"][
+                            "ena_sample_accession"
+                        ],
+                        sampleID=sample_obj,
+                        value="ERS%s" % (1000000 + sample_obj.pk),
+                    ),
+                ]
+                sample_accessions += [
+                    SampleAccession(
+                        sampleID=sample_obj,
+                        database_type="gisaid",
+                        accession="EPI_ISL_%s" % (10000000 + sample_obj.pk),
+                    ),
+                    SampleAccession(
+                        sampleID=sample_obj,
+                        database_type="ena",
+                        accession="ERS%s" % (1000000 + sample_obj.pk),
+                    ),
+                ]
+                for state in ["Gisaid", "Ena"]:
+                    date_updates.append(
+                        DateUpdateState(
+                            stateID=states[state], sampleID=sample_obj, date=upload_date
+                        )
+                    )
+                sample_obj.state = states["Gisaid"]
+                sample_obj.state_date = upload_date
+            else:
+                sample_obj.state = states["Variant"]
+                sample_obj.state_date = analysis_date
+
+        bulk_create_with_pks(
+            BioinfoAnalysisValue, [value_obj for _, value_obj in bioinfo_values]
+        )
+        Sample.bio_analysis_values.through.objects.bulk_create(
+            [
+                Sample.bio_analysis_values.through(
+                    sample_id=sample_obj.pk, bioinfoanalysisvalue_id=value_obj.pk
+                )
+                for sample_obj, value_obj in bioinfo_values
+            ],
+            batch_size=1000,
+        )
+        bulk_create_with_pks(
+            LineageValues, [value_obj for _, value_obj in lineage_values]
+        )
+        Sample.lineage_values.through.objects.bulk_create(
+            [
+                Sample.lineage_values.through(
+                    sample_id=sample_obj.pk, lineagevalues_id=value_obj.pk
+                )
+                for sample_obj, value_obj in lineage_values
+            ],
+            batch_size=1000,
+        )
+        PublicDatabaseValues.objects.bulk_create(public_values, batch_size=1000)
+        SampleAccession.objects.bulk_create(sample_accessions, batch_size=1000)
+        VariantInSample.objects.bulk_create(variants_in_sample, batch_size=2000)
+        with allow_fixed_dates(DateUpdateState._meta.get_field("date")):
+            DateUpdateState.objects.bulk_create(date_updates, batch_size=1000)
+        Sample.objects.bulk_update(
+            sample_objs, ["state", "state_date"], batch_size=1000
+        )
+
+    return {
+        "summary": {
+            "labs": num_labs,
+            "samples": len(sample_objs),
+            "variants_in_pool": len(variant_pool),
+            "variants_in_sample": len(variants_in_sample),
+            "bioinfo_values": len(bioinfo_values),
+            "date_update_states": len(date_updates),
+            "seed": seed,
+        },
+        "lab_users": [user_obj.username for _, user_obj in lab_users],
+        "manager_user": manager_obj.username,
+        "lims_samples": lims_samples,
+    }
@@ -0,0 +1,265 @@
+import json
+import random
+import threading
+import time
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from relecov_core.core_config import (
+    ISKLIMS_GET_LABORATORY_PARAMETERS,
+    ISKLIMS_GET_SAMPLE_FIELDS,
+    ISKLIMS_GET_SAMPLE_INFORMATION,
+    ISKLIMS_GET_SAMPLE_PROJECT_FIELDS,
+    ISKLIMS_GET_STATS_DATA,
+    ISKLIMS_GET_SUMMARIZE_DATA,
+    ISKLIMS_POST_SAMPLE_DATA,
+    ISKLIMS_PUT_LABORATORY_PARAMETER,
+    ISKLIMS_REST_API,
+)
+
+# fields that are not defined in the sample project in iSkyLIMS
+LIMS_SAMPLE_FIELDS = [
+    "sample_name",
+    "laboratory",
+    "region",
+    "collectionSampleDate",
+    "sampleEntryDate",
+]
+
+
+class FakeIskylims:
+    """WSGI application that answers the iSkyLIMS requests sent by the
+    platform, using the sample values given at creation.
+    Each response is delayed latency seconds plus a random value up to
+    jitter. Requests fail with error_status for the names in fail_requests
+    and randomly with error_rate probability
+    """
+
+    def __init__(
+        self,
+        lims_samples,
+        latency=0,
+        jitter=0,
+        error_rate=0,
+        fail_requests=None,
+        error_status=500,
+        seed=None,
+    ):
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.request_count = {}
+        self.configure(latency, jitter, error_rate, fail_requests, error_status)
+        self.samples = {sample["sample_name"]: sample for sample in lims_samples}
+        self.project_fields = (
+            [key for key in lims_samples[0] if key not in LIMS_SAMPLE_FIELDS]
+            if lims_samples
+            else []
+        )
+        self.handlers = {
+            ISKLIMS_GET_LABORATORY_PARAMETERS[0]: self.laboratory_data,
+            ISKLIMS_PUT_LABORATORY_PARAMETER: self.update_lab,
+            ISKLIMS_GET_SAMPLE_FIELDS: self.sample_fields,
+            ISKLIMS_GET_SAMPLE_INFORMATION[0]: self.fetch_sample_information,
+            ISKLIMS_GET_SAMPLE_PROJECT_FIELDS[0]: self.sample_project_fields,
+            ISKLIMS_GET_SUMMARIZE_DATA: self.summarize_data,
+            ISKLIMS_GET_STATS_DATA: self.statistics_information,
+            ISKLIMS_POST_SAMPLE_DATA: self.create_sample_data,
+        }
+
+    def configure(
+        self, latency=0, jitter=0, error_rate=0, fail_requests=None, error_status=500
+    ):
+        """Change the latency and error injection while the server runs"""
+        with self.lock:
+            self.latency = latency
+            self.jitter = jitter
+            self.error_rate = error_rate
+            self.fail_requests = list(fail_requests or [])
+            self.error_status = error_status
+        return
+
+    def get_request_count(self):
+        with self.lock:
+            return dict(self.request_count)
+
+    def reset_request_count(self):
+        with self.lock:
+            self.request_count = {}
+        return
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        request = (
+            path[len(ISKLIMS_REST_API) :] if path.startswith(ISKLIMS_REST_API) else ""
+        )
+        params = {
+            key: values[0]
+            for key, values in parse_qs(environ.get("QUERY_STRING", "")).items()
+        }
+        # consume the body of PUT and POST requests
+        length = environ.get("CONTENT_LENGTH") or "0"
+        if length.isdigit() and int(length) > 0:
+            environ["wsgi.input"].read(int(length))
+        with self.lock:
+            self.request_count[request] = self.request_count.get(request, 0) + 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            inject_error = (
+                request in self.fail_requests or self.random.random() < self.error_rate
+            )
+            error_status = self.error_status
+        if delay > 0:
+            time.sleep(delay)
+        if request not in self.handlers:
+            status, data = 404, {"ERROR": "Request not defined"}
+        elif inject_error:
+            status, data = error_status, {"ERROR": "Injected error"}
+        else:
+            status, data = self.handlers[request](params)
+        start_response(
+            "%s %s" % (status, "OK" if status < 400 else "ERROR"),
+            [("Content-Type", "application/json")],
+        )
+        if status == 204:
+            return []
+        return [json.dumps(data).encode("utf-8")]
+
+    def laboratory_data(self, params):
+        lab_name = params.get("laboratory", "")
+        return 200, {
+            "labName": lab_name,
+            "labEmail": "contact@%s.es" % lab_name.replace(" ", "").lower(),
+            "labPhone": "910000000",
+            "labContactName": "Contact of %s" % lab_name,
+        }
+
+    def update_lab(self, params):
+        return 201, "Updated"
+
+    def create_sample_data(self, params):
+        return 201, "Created"
+
+    def sample_fields(self, params):
+        return 200, {
+            "Collection Sample Date": {
+                "field_name": "collectionSampleDate",
+                "ontology": "SNOMED:399445004",
+            },
+            "Sample Entry Date": {
+                "field_name": "sampleEntryDate",
+                "ontology": "SNOMED:281271004",
+            },
+        }
+
+    def sample_project_fields(self, params):
+        data = []
+        for field in self.project_fields:
+            options = sorted({s[field] for s in self.samples.values()})
+            if len(options) < 10:
+                data.append(
+                    {
+                        "sampleProjectFieldDescription": field,
+                        "sampleProjectFieldType": "Options List",
+                        "sampleProjectOptionList": [
+                            {"optionValue": option} for option in options
+                        ],
+                    }
+                )
+            else:
+                data.append(
+                    {
+                        "sampleProjectFieldDescription": field,
+                        "sampleProjectFieldType": "String",
+                        "sampleProjectOptionList": [],
+                    }
+                )
+        return 200, data
+
+    def fetch_sample_information(self, params):
+        if "sample" in params:
+            if params["sample"] not in self.samples:
+                return 204, {}
+            sample = self.samples[params["sample"]]
+            return 200, {
+                "Sample Name": sample["sample_name"],
+                "Laboratory": sample["laboratory"],
+                "Collection Sample Date": sample["collectionSampleDate"],
+                "Sample Entry Date": sample["sampleEntryDate"],
+                "Sample Project": "Relecov",
+                "Project values": {f: sample[f] for f in self.project_fields},
+            }
+        parameter = params.get("parameter", "")
+        # requests for project fields use "Sample name" as key
+        if "sample_project_name" in params:
+            name_key = "Sample name"
+        else:
+            name_key = "Sample Name"
+        return 200, [
+            {name_key: sample["sample_name"], parameter: sample.get(parameter, "")}
+            for sample in self.samples.values()
+        ]
+
+    def summarize_data(self, params):
+        data = {"region": {}, "laboratory": {}}
+        for sample in self.samples.values():
+            for key in data:
+                data[key][sample[key]] = data[key].get(sample[key], 0) + 1
+        return 200, data
+
+    def statistics_information(self, params):
+        if "project_field" not in params:
+            num_samples = len(self.samples)
+            return 200, {
+                "fields_norm": {f: 1 for f in self.project_fields},
+                "always_none": [],
+                "never_used": [],
+                "fields_value": {f: num_samples for f in self.project_fields},
+            }
+        fields = params["project_field"].split(",")
+        data = {}
+        for sample in self.samples.values():
+            if len(fields) == 1:
+                value = sample.get(fields[0], "")
+                data[value] = data.get(value, 0) + 1
+            else:
+                group = data.setdefault(sample.get(fields[0], ""), {})
+                value = sample.get(fields[1], "")
+                group[value] = group.get(value, 0) + 1
+        return 200, data
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """Handle each request in a thread, so that latency of one request does
+    not delay the concurrent ones
+    """
+
+    daemon_threads = True
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        return
+
+
+def create_fake_iskylims_server(app, host="127.0.0.1", port=0, quiet=True):
+    return make_server(
+        host,
+        port,
+        app,
+        server_class=ThreadingWSGIServer,
+        handler_class=QuietRequestHandler if quiet else WSGIRequestHandler,
+    )
+
+
+def start_fake_iskylims(lims_samples, host="127.0.0.1", port=0, **options):
+    """Start the fake iSkyLIMS in a thread. options are passed to
+    FakeIskylims to set latency and error injection. Return the server, to
+    call shutdown() when finish, and the url to use as ISKYLIMS_SERVER. The
+    application is available at server.get_app()
+    """
+    server = create_fake_iskylims_server(
+        FakeIskylims(lims_samples, **options), host, port
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, "http://%s:%s" % (host, server.server_port)
@@ -19,6 +19,10 @@ ERROR_SAMPLES_NOT_DEFINED_IN_FORM = (
     "Samples were not defined when loading data for batch "
 )
 ERROR_ANALYSIS_ALREADY_DEFINED = "Analysis is already defined."
+ERROR_ANALYSIS_DATE_NOT_INCLUDED = "Analysis date is not included in the request"
+ERROR_SAMPLE_STATE_NOT_DEFINED = "Sample state is not defined"
+ERROR_SAMPLE_ERROR_TYPE_NOT_DEFINED = "Error type is not defined"
+ERROR_SAMPLE_STATE_LIST_NOT_INCLUDED = "samples list is not included in the request"
 ERROR_NO_SAMPLES_ARE_ASSIGNED_TO_LAB = "There is no sample recorded for laboratory"
 ERROR_NOT_SAMPLES_HAVE_BEEN_DEFINED = "So far there are no samples defined"
 ERROR_NOT_SAMPLES_STATE_HAVE_BEEN_DEFINED = "Missing configuration for sample states"
@@ -49,11 +53,67 @@ ERROR_UNABLE_FETCH_SAMPLE_PROJECT_FIELDS = (
 )
 
 ERROR_MISSING_SAMPLE_DATA = "Missing data information for Sample"
+ERROR_SCHEMA_NAME_VERSION_NOT_DEFINED = "schema name and version is not defined"
+
+# Asynchronous ingestion of the bioinfo and variant requests
+ERROR_INGESTION_JOB_NOT_DEFINED = "Ingestion job is not defined"
+ERROR_INGESTION_TYPE_NOT_DEFINED = "Ingestion type is not defined"
+ERROR_IDEMPOTENCY_KEY_INVALID = "Idempotency-Key must have at most 80 characters"
+ERROR_IDEMPOTENCY_KEY_REUSED = (
+    "Idempotency-Key was already used for a request with different data"
+)
+# Seconds after which the lock of a sample is considered stale
+INGESTION_LOCK_TIMEOUT = 3600
+# Seconds to wait between checks of the ingestion queue
+INGESTION_POLL_INTERVAL = 2
+# Number of samples whose queued jobs are applied in each round
+INGESTION_BATCH_SIZE = 50
+
+# Number of rows sent in each bulk query when an analysis is upserted
+UPSERT_BATCH_SIZE = 500
+
+# API keys for pipeline clients. Scopes allowed for each key
+API_KEY_SCOPES = ["create_sample", "create_bioinfo", "create_variant", "update_state"]
+# Seconds that the user and the scopes of a verified key are kept in memory.
+# A revoked key or an inactive user is rejected at once in every process,
+# since both are checked in the database on each request
+API_KEY_CACHE_TTL = 300
+API_KEY_CACHE_SIZE = 1000
+ERROR_API_KEY_INVALID = "Api key is not valid or it was revoked"
+ERROR_API_KEY_SCOPE_NOT_ALLOWED = "Api key is not allowed to use this request"
+ERROR_API_KEY_SCOPE_NOT_DEFINED = "Api key scope is not defined"
+
+# Authorisation context of the user, kept in the session
+RELECOV_MANAGER_GROUP = "RelecovManager"
+AUTH_CONTEXT_SESSION_KEY = "auth_context"
+# Cache key with the version of the context of each user, changed when the
+# profile or the groups of the user are modified
+AUTH_CONTEXT_VERSION_KEY = "auth_context_version_%s"
+# Seconds that the context is kept in the session. It limits the time that
+# a change is not seen when the cache is not shared between processes
+AUTH_CONTEXT_SESSION_TTL = 300
+
+# Seconds that the gene interval index of a chromosome is kept in memory.
+# Genes added or deleted are seen at once, since the index is built again
+# when the max pk or the number of genes changes. A gene modified in place
+# in another process is seen when the index expires
+GENE_INDEX_TTL = 300
+
+# Seconds that the counts of bioinfo field utilization are updated only with
+# the new values. Then they are counted again, to include the values updated
+# or deleted in other processes
+BIOINFO_FIELDS_UTILIZATION_TTL = 3600
+
+# Result given for each sample when they are created in batch
+BATCH_SAMPLE_CREATED = "created"
+BATCH_SAMPLE_DUPLICATED = "duplicated"
+BATCH_SAMPLE_INVALID = "invalid"
 
 ERROR_ANNOTATION_ORGANISM_ALREADY_EXISTS = (
     "Annotation file for the organism already loaded"
 )
 ERROR_VARIANT_INFORMATION_NOT_DEFINED = "Variant field is not included in the request"
+ERROR_VARIANT_POSITION_NOT_VALID = "Variant position is not a valid number"
 ERROR_VARIANT_IN_SAMPLE_NOT_DEFINED = "So far there is no variants defined on database "
 
 HEADING_FOR_BASIC_SAMPLE_DATA = [
@@ -98,6 +158,7 @@ HEADING_FOR_VARIANT_TABLE_DISPLAY = [
     "hgvs_c",
     "hgvs_p",
     "hgvs_p_1_letter",
+    "gene",
 ]
 FIELD_FOR_GETTING_SAMPLE_ID = "Sample ID given for sequencing"
 
@@ -120,6 +181,11 @@ ISKLIMS_GET_STATS_DATA = "statisticsInformation"
 ISKLIMS_FETCH_SAMPLES_ON_CONDITION = ["fetchSampleInformation", "parameter"]
 ISKLIMS_POST_SAMPLE_DATA = "createSampleData"
 
+# Cache of the metadata form definitions
+METADATA_FORM_CACHE_PREFIX = "metadata_form"
+# Seconds that the sample fields fetched from iSkyLIMS are considered up to date
+METADATA_FORM_LIMS_FIELDS_INTERVAL = 3600
+
 # API requested information
 FIELDS_ON_SAMPLE_TABLE = [
     "user",
@@ -145,3 +211,23 @@ FIELDS_ON_ENA_TABLE = [
 ]
 FIELDS_ON_GISAID_TABLE = ["gisaid_id", "GISAID_accession", "virus_name"]
 FIELDS_ON_AUTHOR_TABLE = ["analysis_authors", "author_submitter", "authors"]
+
+# Request field with the accession of the sample for each public database
+ACCESSION_DATABASE_FIELDS = {
+    "gisaid": "gisaid_accession_id",
+    "ena": "ena_sample_accession",
+}
+# Number of accessions returned in each page of the accession list
+ACCESSION_LIST_PAGE_SIZE = 50
+ACCESSION_LIST_MAX_PAGE_SIZE = 500
+ERROR_ACCESSION_DATABASE_NOT_DEFINED = "Public database is not defined"
+
+# Number of serialised plotly figures kept in memory by each process
+PLOTLY_FIGURE_CACHE_SIZE = 128
+
+# Request metrics
+METRICS_HISTOGRAM_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+METRICS_QUERY_COUNT_BUCKETS = [1, 5, 10, 25, 50, 100, 250, 500, 1000]
+# Number of last values per view used to calculate the rolling quantiles
+METRICS_ROLLING_WINDOW = 500
+ERROR_METRICS_NOT_ALLOWED = "Not allowed to read the metrics"
@@ -0,0 +1,32 @@
+import os
+
+import plotly
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.files.storage import FileSystemStorage
+
+PLOTLY_JS_PREFIX = "plotly"
+PLOTLY_JS_FILE = "plotly.min.js"
+
+
+class PlotlyJsFinder(BaseFinder):
+    """Find the plotly.js file bundled with the installed plotly package, as
+    the static file plotly/plotly.min.js, so that pages do not depend on an
+    external server
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.storage = FileSystemStorage(
+            location=os.path.join(os.path.dirname(plotly.__file__), "package_data")
+        )
+        self.storage.prefix = PLOTLY_JS_PREFIX
+
+    def find(self, path, all=False):
+        if path != "%s/%s" % (PLOTLY_JS_PREFIX, PLOTLY_JS_FILE):
+            return []
+        match = self.storage.path(PLOTLY_JS_FILE)
+        if all:
+            return [match]
+        return match
+
+    def list(self, ignore_patterns):
+        yield PLOTLY_JS_FILE, self.storage
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from relecov_core.models import TemporalSampleStorage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the values of the metadata form stored with one row per field "
+        "in TemporalSampleStorage to one row per sample"
+    )
+
+    def handle(self, *args, **options):
+        legacy_rows = (
+            TemporalSampleStorage.objects.filter(sample_data__isnull=True)
+            .exclude(field=None)
+            .order_by("pk")
+            .values_list("pk", "user_id", "sample_name", "field", "value")
+        )
+        samples = {}
+        legacy_ids = []
+        for pk, user_id, sample_name, field, value in legacy_rows:
+            samples.setdefault((user_id, sample_name), {})[field] = value
+            legacy_ids.append(pk)
+        with transaction.atomic():
+            TemporalSampleStorage.objects.bulk_create(
+                [
+                    TemporalSampleStorage(
+                        user_id=user_id, sample_name=sample_name, sample_data=data
+                    )
+                    for (user_id, sample_name), data in samples.items()
+                ]
+            )
+            TemporalSampleStorage.objects.filter(pk__in=legacy_ids).delete()
+        self.stdout.write(
+            "%s rows moved to %s samples" % (len(legacy_ids), len(samples))
+        )
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# table and columns which are stored as integer in the model
+NUMERIC_COLUMNS = [
+    ["Variant", ["pos"]],
+    ["VariantInSample", ["dp", "ref_dp", "alt_dp"]],
+]
+
+
+def parse_integer_value(value):
+    """Return the value as integer, None if it is empty, or raise ValueError
+    when it is not a number
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value == "":
+        return None
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(value)
+    return int(number)
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the variant position and depth values stored as text before "
+        "migrating the columns to integer. Values which cannot be converted "
+        "are reported and, with --fix, set to NULL"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Normalise the values and set to NULL the invalid ones",
+        )
+
+    def handle(self, *args, **options):
+        quote = connection.ops.quote_name
+        invalid = 0
+        for table, columns in NUMERIC_COLUMNS:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, %s FROM %s"
+                    % (", ".join(quote(col) for col in columns), quote(table))
+                )
+                rows = cursor.fetchall()
+            updates = {col: [] for col in columns}
+            for row in rows:
+                for col, value in zip(columns, row[1:]):
+                    try:
+                        number = parse_integer_value(value)
+                    except ValueError:
+                        self.stdout.write(
+                            "%s id %s: invalid %s value '%s'"
+                            % (table, row[0], col, value)
+                        )
+                        invalid += 1
+                        number = None
+                    if number is None and value is None:
+                        continue
+                    if number is None or str(number) != str(value):
+                        updates[col].append([number, row[0]])
+            if not options["fix"]:
+                continue
+            with transaction.atomic(), connection.cursor() as cursor:
+                for col, values in updates.items():
+                    cursor.executemany(
+                        "UPDATE %s SET %s = %%s WHERE id = %%s"
+                        % (quote(table), quote(col)),
+                        values,
+                    )
+                    self.stdout.write(
+                        "%s.%s: %s values updated" % (table, col, len(values))
+                    )
+        self.stdout.write("%s invalid values found" % invalid)
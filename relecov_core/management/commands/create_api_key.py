@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from relecov_core.api.utils.api_key_handling import create_api_key
+from relecov_core.core_config import API_KEY_SCOPES
+
+
+class Command(BaseCommand):
+    help = (
+        "Create an api key for a pipeline. The key is printed only once, "
+        "since only its hash is stored"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User the requests are made for")
+        parser.add_argument("name", help="Name to identify the key")
+        parser.add_argument(
+            "--scopes",
+            default=",".join(API_KEY_SCOPES),
+            help="Comma separated list of allowed requests: %s"
+            % ", ".join(API_KEY_SCOPES),
+        )
+
+    def handle(self, *args, **options):
+        user_obj = User.objects.filter(username__exact=options["username"]).last()
+        if user_obj is None:
+            raise CommandError("User %s does not exist" % options["username"])
+        scopes = [scope.strip() for scope in options["scopes"].split(",") if scope]
+        result = create_api_key(user_obj, options["name"], scopes)
+        if "ERROR" in result:
+            raise CommandError(result["ERROR"])
+        self.stdout.write(result["key"])
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from relecov_core.api.utils.ingestion_handling import run_pending_ingestion_jobs
+from relecov_core.core_config import INGESTION_BATCH_SIZE, INGESTION_POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the bioinfo and variant requests queued by the API with the "
+        "async option"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Apply the queued jobs and exit instead of waiting for new ones",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of samples whose jobs are applied at the same time",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=INGESTION_BATCH_SIZE,
+            help="Number of samples taken from the queue in each round",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=int,
+            default=INGESTION_POLL_INTERVAL,
+            help="Seconds to wait when the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            executed = run_pending_ingestion_jobs(
+                options["workers"], options["batch_size"]
+            )
+            if executed > 0:
+                self.stdout.write("Executed %s ingestion jobs" % executed)
+            if options["once"]:
+                if executed == 0:
+                    return
+                continue
+            if executed == 0:
+                time.sleep(options["poll_interval"])
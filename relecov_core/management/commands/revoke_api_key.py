@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from relecov_core.api.utils.api_key_handling import revoke_api_key
+
+
+class Command(BaseCommand):
+    help = "Revoke the api key with the given prefix"
+
+    def add_arguments(self, parser):
+        parser.add_argument("key_prefix", help="Characters before the dot in the key")
+
+    def handle(self, *args, **options):
+        result = revoke_api_key(options["key_prefix"])
+        if "ERROR" in result:
+            raise CommandError(result["ERROR"])
+        self.stdout.write("Api key %s revoked" % result["SUCCESS"])
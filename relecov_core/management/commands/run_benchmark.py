@@ -0,0 +1,132 @@
+import platform
+import time
+from datetime import datetime
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from relecov_core.benchmark.cases import (
+    BENCHMARK_GROUPS,
+    run_benchmark,
+    write_benchmark_results,
+)
+from relecov_core.benchmark.dataset import generate_dataset, set_iskylims_server
+from relecov_core.benchmark.fake_iskylims import start_fake_iskylims
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a test database with a synthetic dataset and time the API, "
+        "pages, pre-processing jobs and dashboard views. iSkyLIMS requests "
+        "are answered by a local fake server"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--labs", type=int, default=10)
+        parser.add_argument("--samples-per-lab", type=int, default=100)
+        parser.add_argument("--variants-per-sample", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Number of runs for each case"
+        )
+        parser.add_argument(
+            "--group",
+            action="append",
+            choices=list(BENCHMARK_GROUPS),
+            help="Run only the cases of the group. Can be given more than once",
+        )
+        parser.add_argument(
+            "--lims-latency",
+            type=float,
+            default=0,
+            help="Seconds that the fake iSkyLIMS delays each response",
+        )
+        parser.add_argument(
+            "--lims-jitter",
+            type=float,
+            default=0,
+            help="Maximum random seconds added to the iSkyLIMS latency",
+        )
+        parser.add_argument(
+            "--lims-error-rate",
+            type=float,
+            default=0,
+            help="Probability, from 0 to 1, that an iSkyLIMS request fails",
+        )
+        parser.add_argument(
+            "--output",
+            default="benchmark_%s.json" % datetime.now().strftime("%Y%m%d_%H%M%S"),
+            help="JSON file where results are written",
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        lims_server = None
+        try:
+            cache.clear()
+            start = time.perf_counter()
+            dataset = generate_dataset(
+                options["labs"],
+                options["samples_per_lab"],
+                options["variants_per_sample"],
+                options["seed"],
+            )
+            generation_time = time.perf_counter() - start
+            self.stdout.write(
+                "Dataset generated in %.1f seconds: %s"
+                % (generation_time, dataset["summary"])
+            )
+            lims_server, lims_url = start_fake_iskylims(
+                dataset["lims_samples"],
+                latency=options["lims_latency"],
+                jitter=options["lims_jitter"],
+                error_rate=options["lims_error_rate"],
+                seed=options["seed"],
+            )
+            set_iskylims_server(lims_url)
+            results = run_benchmark(
+                dataset, options["repeat"], options["group"], lims_server.get_app()
+            )
+        finally:
+            if lims_server is not None:
+                lims_server.shutdown()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        write_benchmark_results(
+            options["output"],
+            {
+                "date": datetime.now(),
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "options": {
+                    key: options[key]
+                    for key in [
+                        "labs",
+                        "samples_per_lab",
+                        "variants_per_sample",
+                        "seed",
+                        "repeat",
+                        "lims_latency",
+                        "lims_jitter",
+                        "lims_error_rate",
+                    ]
+                },
+                "dataset": dataset["summary"],
+                "generation_time": generation_time,
+                "cases": results,
+            },
+        )
+        for result in results:
+            if "error" in result:
+                self.stdout.write("%-50s ERROR %s" % (result["name"], result["error"]))
+            else:
+                self.stdout.write(
+                    "%-50s median %.4f s  queries %s"
+                    % (result["name"], result["median"], max(result["queries"]))
+                )
+        self.stdout.write("Results written to %s" % options["output"])
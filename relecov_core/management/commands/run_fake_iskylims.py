@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand
+
+from relecov_core.benchmark.dataset import (
+    generate_lims_samples,
+    get_lims_samples_from_database,
+    set_iskylims_server,
+)
+from relecov_core.benchmark.fake_iskylims import (
+    FakeIskylims,
+    create_fake_iskylims_server,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a stand-in iSkyLIMS server which answers the requests sent by "
+        "the platform from generated sample values, with configurable "
+        "latency and error injection"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--from-database",
+            action="store_true",
+            help="Generate the values for the samples stored in database",
+        )
+        parser.add_argument("--labs", type=int, default=10)
+        parser.add_argument("--samples-per-lab", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--latency", type=float, default=0, help="Seconds to delay each response"
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0,
+            help="Maximum random seconds added to the latency",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="Probability, from 0 to 1, that a request fails",
+        )
+        parser.add_argument(
+            "--fail-request",
+            action="append",
+            help="Name of the request, e.g. statisticsInformation, that always "
+            "fails. Can be given more than once",
+        )
+        parser.add_argument("--error-status", type=int, default=500)
+        parser.add_argument(
+            "--set-config",
+            action="store_true",
+            help="Set ISKYLIMS_SERVER configuration to this server",
+        )
+        parser.add_argument(
+            "--verbose-log", action="store_true", help="Log every request"
+        )
+
+    def handle(self, *args, **options):
+        if options["from_database"]:
+            lims_samples = get_lims_samples_from_database(options["seed"])
+        else:
+            lims_samples = generate_lims_samples(
+                options["labs"], options["samples_per_lab"], options["seed"]
+            )
+        app = FakeIskylims(
+            lims_samples,
+            latency=options["latency"],
+            jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            fail_requests=options["fail_request"],
+            error_status=options["error_status"],
+            seed=options["seed"],
+        )
+        server = create_fake_iskylims_server(
+            app, options["host"], options["port"], not options["verbose_log"]
+        )
+        url = "http://%s:%s" % (options["host"], server.server_port)
+        if options["set_config"]:
+            set_iskylims_server(url)
+        self.stdout.write(
+            "Fake iSkyLIMS serving %s samples at %s" % (len(lims_samples), url)
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        self.stdout.write("Requests received: %s" % app.get_request_count())
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from relecov_core.core_config import ACCESSION_DATABASE_FIELDS, UPSERT_BATCH_SIZE
+from relecov_core.models import PublicDatabaseValues, SampleAccession
+from relecov_core.utils.handling_public_database import is_valid_accession
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the sample accessions from the public database values stored "
+        "before they were defined"
+    )
+
+    def handle(self, *args, **options):
+        created = 0
+        for database_type, field in ACCESSION_DATABASE_FIELDS.items():
+            stored_ids = set(
+                SampleAccession.objects.filter(
+                    database_type__exact=database_type
+                ).values_list("sampleID_id", flat=True)
+            )
+            value_rows = (
+                PublicDatabaseValues.objects.filter(
+                    public_database_fieldID__property_name__exact=field,
+                    sampleID__isnull=False,
+                )
+                .order_by("pk")
+                .values_list("sampleID_id", "value")
+            )
+            accession_objs = []
+            for sample_id, value in value_rows.iterator():
+                if sample_id in stored_ids or not is_valid_accession(
+                    database_type, value
+                ):
+                    continue
+                stored_ids.add(sample_id)
+                accession_objs.append(
+                    SampleAccession(
+                        sampleID_id=sample_id,
+                        database_type=database_type,
+                        accession=value,
+                    )
+                )
+            SampleAccession.objects.bulk_create(
+                accession_objs, batch_size=UPSERT_BATCH_SIZE
+            )
+            created += len(accession_objs)
+        self.stdout.write("%s sample accessions created" % created)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from relecov_core.api.utils.variant_handling import get_variant_annotation_key
+from relecov_core.core_config import UPSERT_BATCH_SIZE
+from relecov_core.models import VariantAnnotation
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the annotation_key column of the variant annotations stored "
+        "before it was defined"
+    )
+
+    def handle(self, *args, **options):
+        updated = 0
+        while True:
+            v_ann_objs = list(
+                VariantAnnotation.objects.filter(annotation_key=None)
+                .only(
+                    "variantID_id",
+                    "geneID_id",
+                    "effectID_id",
+                    "hgvs_c",
+                    "hgvs_p",
+                )
+                .order_by("pk")[:UPSERT_BATCH_SIZE]
+            )
+            if len(v_ann_objs) == 0:
+                break
+            for v_ann_obj in v_ann_objs:
+                v_ann_obj.annotation_key = get_variant_annotation_key(
+                    v_ann_obj.variantID_id_id,
+                    v_ann_obj.geneID_id_id,
+                    v_ann_obj.effectID_id_id,
+                    v_ann_obj.hgvs_c,
+                    v_ann_obj.hgvs_p,
+                )
+            VariantAnnotation.objects.bulk_update(v_ann_objs, ["annotation_key"])
+            updated += len(v_ann_objs)
+        self.stdout.write("Annotation key set for %s variant annotations" % updated)
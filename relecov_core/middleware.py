@@ -0,0 +1,58 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from relecov_core.utils.auth_context import get_auth_context
+
+from relecov_core.utils.request_metrics import (
+    end_request_metrics,
+    get_server_timing,
+    record_request,
+    sql_timer,
+    start_request_metrics,
+)
+
+
+class RequestMetricsMiddleware:
+    """Record for each request the number of SQL queries, the time spent on
+    them, the iSkyLIMS requests and the wall time. Values are added to the
+    Server-Timing header and to the in-memory histograms of the view
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        start_request_metrics()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sql_timer))
+                response = self.get_response(request)
+        finally:
+            values = end_request_metrics()
+        wall_time = time.perf_counter() - start
+        if request.resolver_match is not None:
+            view_name = request.resolver_match.func.__name__
+        else:
+            view_name = "unresolved"
+        record_request(view_name, values, wall_time)
+        response["Server-Timing"] = get_server_timing(values, wall_time)
+        return response
+
+
+class AuthContextMiddleware:
+    """Set request.auth_context with the permissions of the user. It is
+    created the first time it is used in the request. Must be placed after
+    the authentication middleware
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.auth_context = SimpleLazyObject(lambda: get_auth_context(request))
+        return self.get_response(request)
@@ -1,9 +1,19 @@
-from django.db import models
+import time
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from relecov_core.core_config import SCHEMAS_UPLOAD_FOLDER
+from relecov_core.core_config import (
+    AUTH_CONTEXT_VERSION_KEY,
+    GENE_INDEX_TTL,
+    SCHEMAS_UPLOAD_FOLDER,
+)
+from relecov_core.utils.gene_interval_index import GeneIntervalIndex
 
 
 class Profile(models.Model):
@@ -31,6 +41,28 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
     instance.profile.save()
 
 
+def change_auth_context_version(user_id):
+    """Make the authorisation context stored in the sessions of the user
+    to be created again
+    """
+    cache.set(AUTH_CONTEXT_VERSION_KEY % user_id, time.time_ns(), None)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def clear_auth_context(sender, instance, **kwargs):
+    change_auth_context_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def clear_auth_context_on_group_change(sender, instance, reverse, pk_set, **kwargs):
+    if reverse:
+        # groups were changed from the group side, pk_set has the users
+        for user_id in pk_set or []:
+            change_auth_context_version(user_id)
+    else:
+        change_auth_context_version(instance.pk)
+
+
 class BioinfoMetadataFile(models.Model):
     title = models.CharField(max_length=200)
     file_path = models.CharField(max_length=200)
@@ -301,6 +333,13 @@ class MetadataVisualization(models.Model):
 
 
 class BioinfoAnalysisFieldManager(models.Manager):
+    # schema pk -> value counts per field, updated with the values stored
+    # since the last call and cleared when the fields or the values change
+    fields_utilization = {}
+
+    def clear_fields_utilization(self):
+        self.fields_utilization.clear()
+
     def create_new_field(self, data):
         new_field = self.create(
             property_name=data["property_name"],
@@ -338,6 +377,16 @@ class BioinfoAnalysisField(models.Model):
     objects = BioinfoAnalysisFieldManager()
 
 
+@receiver([post_save, post_delete], sender=BioinfoAnalysisField)
+def clear_fields_utilization(sender, **kwargs):
+    BioinfoAnalysisField.objects.clear_fields_utilization()
+
+
+@receiver(m2m_changed, sender=BioinfoAnalysisField.schemaID.through)
+def clear_fields_utilization_on_schema_change(sender, **kwargs):
+    BioinfoAnalysisField.objects.clear_fields_utilization()
+
+
 class BioinfoAnalysisValueManager(models.Manager):
     def create_new_value(self, data):
         new_value = self.create(
@@ -353,6 +402,8 @@ class BioinfoAnalysisValue(models.Model):
     bioinfo_analysis_fieldID = models.ForeignKey(
         BioinfoAnalysisField, on_delete=models.CASCADE
     )
+    # analysis the value belongs to. Null for values stored before it existed
+    analysis_date = models.CharField(max_length=100, null=True, blank=True)
     generated_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
 
     class Meta:
@@ -424,6 +475,8 @@ class LineageFields(models.Model):
 class LineageValues(models.Model):
     lineage_fieldID = models.ForeignKey(LineageFields, on_delete=models.CASCADE)
     value = models.CharField(max_length=240, null=True, blank=True)
+    # analysis the value belongs to. Null for values stored before it existed
+    analysis_date = models.CharField(max_length=100, null=True, blank=True)
     generated_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
 
     class Meta:
@@ -559,6 +612,42 @@ class OrganismAnnotation(models.Model):
 
 
 class GeneManager(models.Manager):
+    # chromosome pk -> (version, build time, GeneIntervalIndex). The version
+    # is read from the database, so that genes added or deleted in any
+    # process are seen. Genes modified in place are seen when the index
+    # expires after GENE_INDEX_TTL seconds
+    gene_indexes = {}
+
+    def get_gene_index_version(self, chromosome_id):
+        genes = self.filter(chromosomeID_id=chromosome_id).aggregate(
+            Max("pk"), Count("pk")
+        )
+        return (genes["pk__max"], genes["pk__count"])
+
+    def get_gene_index(self, chromosome_id):
+        """Return the interval index of the genes defined for the chromosome,
+        built from database again when the genes version changes or the
+        index expires
+        """
+        chromosome_id = int(chromosome_id)
+        version = self.get_gene_index_version(chromosome_id)
+        now = time.monotonic()
+        cached = self.gene_indexes.get(chromosome_id)
+        if cached is None or cached[0] != version or cached[1] + GENE_INDEX_TTL < now:
+            self.gene_indexes[chromosome_id] = (
+                version,
+                now,
+                GeneIntervalIndex(
+                    self.filter(chromosomeID_id=chromosome_id).values_list(
+                        "gene_name", "gene_start", "gene_end"
+                    )
+                ),
+            )
+        return self.gene_indexes[chromosome_id][2]
+
+    def clear_gene_indexes(self):
+        self.gene_indexes.clear()
+
     def create_new_gene(self, data):
         new_gene = self.create(
             gene_name=data["gene_name"],
@@ -598,6 +687,23 @@ class Gene(models.Model):
     objects = GeneManager()
 
 
+@receiver([post_save, post_delete], sender=Gene)
+def clear_gene_indexes(sender, **kwargs):
+    Gene.objects.clear_gene_indexes()
+
+
+class SampleStateManager(models.Manager):
+    # state name -> pk. States are only defined at installation, so the ids
+    # are kept for the life of the process and cleared when a state changes
+    state_ids = {}
+
+    def get_state_id(self, state):
+        """Return the id of the state or None if it is not defined"""
+        if state not in self.state_ids:
+            self.state_ids.update(self.order_by("pk").values_list("state", "pk"))
+        return self.state_ids.get(state)
+
+
 class SampleState(models.Model):
     state = models.CharField(max_length=80)
     display_string = models.CharField(max_length=80, null=True, blank=True)
@@ -618,6 +724,24 @@ class SampleState(models.Model):
     def get_state_display_string(self):
         return "%s" % (self.display_string)
 
+    objects = SampleStateManager()
+
+
+class ErrorManager(models.Manager):
+    # error name -> pk, cleared when an error changes
+    error_ids = {}
+
+    def get_error_id(self, error_name):
+        """Return the id of the error or None if it is not defined"""
+        if error_name not in self.error_ids:
+            self.error_ids.update(self.order_by("pk").values_list("error_name", "pk"))
+        return self.error_ids.get(error_name)
+
+
+@receiver([post_save, post_delete], sender=SampleState)
+def clear_state_ids(sender, **kwargs):
+    SampleStateManager.state_ids.clear()
+
 
 class Error(models.Model):
     error_name = models.CharField(max_length=100)
@@ -643,8 +767,28 @@ class Error(models.Model):
     def get_description(self):
         return "%s" % (self.description)
 
+    objects = ErrorManager()
+
+
+@receiver([post_save, post_delete], sender=Error)
+def clear_error_ids(sender, **kwargs):
+    ErrorManager.error_ids.clear()
+
 
 class SampleManager(models.Manager):
+    def visible_to(self, auth_context):
+        """Return the samples that the user of the authorisation context is
+        allowed to see. The laboratory filter is applied in the query
+        """
+        if auth_context.is_manager:
+            return self.all()
+        if len(auth_context.lab_names) == 0:
+            return self.none()
+        lab_filter = Q()
+        for lab_name in auth_context.lab_names:
+            lab_filter |= Q(collecting_institution__iexact=lab_name)
+        return self.filter(lab_filter)
+
     def create_new_sample(self, data):
         state = SampleState.objects.filter(state__exact=data["state"]).last()
         new_sample = self.create(
@@ -684,6 +828,8 @@ class Sample(models.Model):
     r1_fastq_filepath = models.CharField(max_length=120, null=True, blank=True)
     r2_fastq_filepath = models.CharField(max_length=120, null=True, blank=True)
     sequencing_date = models.DateTimeField(auto_now_add=False, null=True, blank=True)
+    # date of the last change of state, stored with the current state
+    state_date = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -729,6 +875,11 @@ class Sample(models.Model):
             return "%s" % (self.state.get_state())
         return None
 
+    def get_state_date(self):
+        if self.state_date:
+            return self.state_date.strftime("%d-%B-%Y")
+        return ""
+
     def get_user(self):
         return "%s" % (self.user)
 
@@ -767,10 +918,15 @@ class Sample(models.Model):
         return data
 
     def update_state(self, state):
-        if not SampleState.objects.filter(state__exact=state).exists():
+        """Set the new state writing only the state columns. The change is
+        not added to DateUpdateState
+        """
+        state_id = SampleState.objects.get_state_id(state)
+        if state_id is None:
             return False
-        self.state = SampleState.objects.filter(state__exact=state).last()
-        self.save()
+        self.state_id = state_id
+        self.state_date = timezone.now()
+        self.save(update_fields=["state", "state_date"])
         return self
 
     objects = SampleManager()
@@ -854,6 +1010,44 @@ class PublicDatabaseValues(models.Model):
         return "%s" % (self.pk)
 
 
+class SampleAccessionManager(models.Manager):
+    def create_new_accession(self, data):
+        new_accession = self.create(
+            sampleID=data["sampleID"],
+            database_type=data["database_type"],
+            accession=data["accession"],
+        )
+        return new_accession
+
+
+class SampleAccession(models.Model):
+    """Accession of the sample in a public database ("gisaid" or "ena"),
+    stored when the sample is uploaded, so that the statistics do not need
+    to search the public database values
+    """
+
+    sampleID = models.ForeignKey(Sample, on_delete=models.CASCADE)
+    database_type = models.CharField(max_length=20)
+    accession = models.CharField(max_length=240)
+    generated_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "SampleAccession"
+        unique_together = ["sampleID", "database_type"]
+        index_together = ["database_type", "accession"]
+
+    def __str__(self):
+        return "%s" % (self.accession)
+
+    def get_accession(self):
+        return "%s" % (self.accession)
+
+    def get_database_type(self):
+        return "%s" % (self.database_type)
+
+    objects = SampleAccessionManager()
+
+
 class DateUpdateState(models.Model):
     stateID = models.ForeignKey(SampleState, on_delete=models.CASCADE)
     sampleID = models.ForeignKey(Sample, on_delete=models.CASCADE)
@@ -861,6 +1055,7 @@ class DateUpdateState(models.Model):
 
     class Meta:
         db_table = "DateUpdateState"
+        index_together = ["sampleID", "stateID"]
 
     def __str__(self):
         return "%s_%s" % (self.stateID, self.sampleID)
@@ -890,11 +1085,13 @@ class Variant(models.Model):
         Filter, on_delete=models.CASCADE, null=True, blank=True
     )
     ref = models.CharField(max_length=100, null=True, blank=True)
-    pos = models.CharField(max_length=60, null=True, blank=True)
+    pos = models.IntegerField(null=True, blank=True)
     alt = models.CharField(max_length=100, null=True, blank=True)
 
     class Meta:
         db_table = "Variant"
+        # range scans of a genomic window
+        index_together = ["chromosomeID_id", "pos"]
 
     def __str__(self):
         return "%s_%s" % (self.pos, self.alt)
@@ -906,7 +1103,7 @@ class Variant(models.Model):
         return "%s" % (self.ref)
 
     def get_pos(self):
-        return "%s" % (self.pos)
+        return self.pos
 
     def get_chrom(self):
         return "%s" % (self.chrom)
@@ -926,9 +1123,9 @@ class VariantInSample(models.Model):
         Variant, on_delete=models.CASCADE, null=True, blank=True
     )
     analysis_date = models.CharField(max_length=100, null=True, blank=True)
-    dp = models.CharField(max_length=10, null=True, blank=True)
-    ref_dp = models.CharField(max_length=10, null=True, blank=True)
-    alt_dp = models.CharField(max_length=10, null=True, blank=True)
+    dp = models.IntegerField(null=True, blank=True)
+    ref_dp = models.IntegerField(null=True, blank=True)
+    alt_dp = models.IntegerField(null=True, blank=True)
     af = models.FloatField(max_length=6, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=("created at"))
 
@@ -958,13 +1155,13 @@ class VariantInSample(models.Model):
         return self.variantID_id.get_pos()
 
     def get_dp(self):
-        return "%s" % (self.dp)
+        return self.dp
 
     def get_ref_dp(self):
-        return "%s" % (self.ref_dp)
+        return self.ref_dp
 
     def get_alt_dp(self):
-        return "%s" % (self.alt_dp)
+        return self.alt_dp
 
     def get_af(self):
         return "%s" % (self.af)
@@ -997,6 +1194,11 @@ class VariantAnnotation(models.Model):
     hgvs_c = models.CharField(max_length=60)
     hgvs_p = models.CharField(max_length=60)
     hgvs_p_1_letter = models.CharField(max_length=100)
+    # hash of variant, gene, effect, hgvs_c and hgvs_p which identifies the
+    # annotation. See get_variant_annotation_key
+    annotation_key = models.CharField(
+        max_length=64, null=True, blank=True, db_index=True
+    )
 
     class Meta:
         db_table = "VariantAnnotation"
@@ -1022,34 +1224,47 @@ class VariantAnnotation(models.Model):
 
 
 class TemporalSampleStorageManager(models.Manager):
-    def save_temp_data(self, data):
-        new_t_data = self.create(
-            sample_name=data["sample_name"],
-            field=data["field"],
-            value=data["value"],
-            user=data["user"],
-        )
-        return new_t_data
+    def save_temp_samples(self, user_obj, samples):
+        """Store one row for each sample with the values of the form. Rows
+        previously stored by the user for the same samples are replaced
+        """
+        with transaction.atomic():
+            self.filter(user=user_obj, sample_name__in=list(samples)).delete()
+            new_t_objs = self.bulk_create(
+                [
+                    self.model(
+                        user=user_obj, sample_name=sample_name, sample_data=sample_data
+                    )
+                    for sample_name, sample_data in samples.items()
+                ]
+            )
+        return new_t_objs
 
 
 class TemporalSampleStorage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
     sample_name = models.CharField(max_length=100, null=True)
-    field = models.CharField(max_length=100, null=True)
-    value = models.CharField(max_length=100, null=True)
+    # values filled in the metadata form for the sample, keyed by label
+    sample_data = models.JSONField(null=True, blank=True)
+    # one row per field was stored before sample_data existed. These rows
+    # are moved to sample_data with the convert_temporal_sample_storage
+    # command
+    field = models.CharField(max_length=100, null=True, blank=True)
+    value = models.CharField(max_length=100, null=True, blank=True)
     generated_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = "TemporalSampleStorage"
+        index_together = ["user", "sample_name"]
 
     def __str__(self):
-        return "%s,%s" % (self.sample_name, self.field)
+        return "%s" % (self.sample_name)
 
     def get_sample_name(self):
         return "%s" % (self.sample_name)
 
     def get_temp_values(self):
-        return {self.field: self.value}
+        return dict(self.sample_data)
 
     def update_sent_status(self, value):
         self.sent = value
@@ -1059,6 +1274,149 @@ class TemporalSampleStorage(models.Model):
     objects = TemporalSampleStorageManager()
 
 
+class IngestionJobManager(models.Manager):
+    def create_new_job(self, data):
+        return self.create(
+            user=data["user"],
+            job_type=data["job_type"],
+            sample_name=data["sample_name"],
+            idempotency_key=data["idempotency_key"],
+            payload=data["payload"],
+            state="queued",
+        )
+
+
+class IngestionJob(models.Model):
+    """Request sent to the API with the async option, waiting to be applied
+    by the ingestion worker
+    """
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    job_type = models.CharField(max_length=20)
+    sample_name = models.CharField(max_length=80, db_index=True)
+    idempotency_key = models.CharField(max_length=80, null=True, blank=True)
+    payload = models.JSONField()
+    state = models.CharField(max_length=20, db_index=True)
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "IngestionJob"
+        unique_together = ["user", "idempotency_key"]
+
+    def __str__(self):
+        return "%s_%s_%s" % (self.job_type, self.sample_name, self.state)
+
+    def get_job_type(self):
+        return "%s" % (self.job_type)
+
+    def get_sample_name(self):
+        return "%s" % (self.sample_name)
+
+    def get_state(self):
+        return "%s" % (self.state)
+
+    def get_job_info(self):
+        return {
+            "job_id": self.pk,
+            "job_type": self.job_type,
+            "sample_name": self.sample_name,
+            "state": self.state,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    objects = IngestionJobManager()
+
+
+class IngestionLock(models.Model):
+    """One row per sample while its queued jobs are applied. The unique
+    constraint keeps the jobs of a sample in a single worker, so they are
+    applied in the order they were received
+    """
+
+    sample_name = models.CharField(max_length=80, unique=True)
+    locked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "IngestionLock"
+
+    def __str__(self):
+        return "%s" % (self.sample_name)
+
+
+class ApiKeyManager(models.Manager):
+    # key hash -> (expiration time, user, key information) of the verified
+    # keys, cleared when a key or a user changes in this process
+    verified_keys = {}
+
+    def clear_verified_keys(self):
+        self.verified_keys.clear()
+
+    def create_new_api_key(self, data):
+        return self.create(
+            user=data["user"],
+            name=data["name"],
+            key_prefix=data["key_prefix"],
+            key_hash=data["key_hash"],
+            scopes=data["scopes"],
+        )
+
+
+class ApiKey(models.Model):
+    """Key used by pipelines to authenticate in the API. Only the keyed
+    hash of the key is stored. The prefix is kept in clear to show which
+    key is used
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    name = models.CharField(max_length=80)
+    key_prefix = models.CharField(max_length=12, unique=True)
+    key_hash = models.CharField(max_length=64, unique=True)
+    scopes = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "ApiKey"
+
+    def __str__(self):
+        return "%s_%s" % (self.name, self.key_prefix)
+
+    def get_key_prefix(self):
+        return "%s" % (self.key_prefix)
+
+    def get_scopes(self):
+        return list(self.scopes)
+
+    def is_revoked(self):
+        return self.revoked_at is not None
+
+    def revoke(self):
+        self.revoked_at = timezone.now()
+        self.save()
+        return
+
+    objects = ApiKeyManager()
+
+
+@receiver([post_save, post_delete], sender=ApiKey)
+def clear_verified_api_keys(sender, **kwargs):
+    ApiKey.objects.clear_verified_keys()
+
+
+@receiver([post_save, post_delete], sender=User)
+def clear_verified_api_keys_on_user_change(sender, update_fields=None, **kwargs):
+    # the last login is updated on every login and does not change the keys
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    ApiKey.objects.clear_verified_keys()
+
+
 class ConfigSettingManager(models.Manager):
     def create_config_setting(self, configuration_name, configuration_value):
         new_config_settings = self.create(
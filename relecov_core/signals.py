@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent by the API after new data is stored in database. The "event" argument
+# is one of "sample", "bioinfo" or "variant"
+ingestion_completed = Signal()
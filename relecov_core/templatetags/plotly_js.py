@@ -0,0 +1,24 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.safestring import mark_safe
+from plotly.offline import get_plotlyjs_version
+
+from relecov_core.finders import PLOTLY_JS_FILE, PLOTLY_JS_PREFIX
+
+register = template.Library()
+
+
+@register.simple_tag
+def plotly_js_script():
+    """Script tag to load once per page the plotly.js file bundled with the
+    installed plotly package, served as a static file by PlotlyJsFinder.
+    The version is added to the url so that browsers fetch the new file
+    when plotly is upgraded. Figures are created without plotly.js
+    """
+    return mark_safe(
+        '<script src="%s?v=%s" charset="utf-8"></script>'
+        % (
+            static("%s/%s" % (PLOTLY_JS_PREFIX, PLOTLY_JS_FILE)),
+            get_plotlyjs_version(),
+        )
+    )
@@ -1 +1,86 @@
-# from django.test import TestCase
+import time
+
+from django.test import TestCase
+
+from relecov_core.core_config import (
+    ALLOWED_EMPTY_FIELDS_IN_METADATA_SAMPLE_FORM,
+    FIELD_FOR_GETTING_SAMPLE_ID,
+)
+from relecov_core.models import Sample, SampleState
+from relecov_core.utils.handling_samples import validate_input_samples
+
+# rows submitted in a full plate of the metadata form
+FORM_ROWS = 384
+# seconds allowed to validate the form rows
+FORM_VALIDATION_TIME = 1
+
+
+class ValidateInputSamplesTest(TestCase):
+    """Check the rows of the metadata form. A quarter of the rows are samples
+    already recorded, sent with a different case, and some of the others
+    have an empty required value
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        state_obj = SampleState.objects.create(state="Defined")
+        Sample.objects.bulk_create(
+            [
+                Sample(
+                    state=state_obj,
+                    sample_unique_id="AAA-%04d" % idx,
+                    sequencing_sample_id="SEQ-%04d" % idx,
+                )
+                for idx in range(FORM_ROWS // 4)
+            ]
+        )
+
+    def setUp(self):
+        self.heading = (
+            [FIELD_FOR_GETTING_SAMPLE_ID]
+            + ALLOWED_EMPTY_FIELDS_IN_METADATA_SAMPLE_FORM
+            + ["Form field %s" % idx for idx in range(35)]
+        )
+        self.recorded_rows = []
+        self.incomplete_rows = []
+        self.rows = []
+        for idx in range(FORM_ROWS):
+            if idx % 4 == 0:
+                sample_name = "seq-%04d" % (idx // 4)
+            else:
+                sample_name = "FORM-%04d" % idx
+            row = [sample_name] + ["value %s" % col for col in range(35)]
+            # fields which can be empty are not reported as incomplete
+            row[1:1] = [""] * len(ALLOWED_EMPTY_FIELDS_IN_METADATA_SAMPLE_FORM)
+            if idx % 12 == 1:
+                row[-1] = ""
+                self.incomplete_rows.append(row)
+            if idx % 4 == 0:
+                self.recorded_rows.append(sample_name)
+            self.rows.append(row)
+        # an empty row of the form is skipped
+        self.rows.append([""] * len(self.heading))
+
+    def test_recorded_samples_are_checked_in_one_query(self):
+        with self.assertNumQueries(1):
+            validate_input_samples(self.rows, self.heading)
+
+    def test_recorded_samples_are_case_insensitive(self):
+        result = validate_input_samples(self.rows, self.heading)
+        self.assertEqual(result["s_already_record"], self.recorded_rows)
+
+    def test_all_incomplete_rows_are_reported(self):
+        result = validate_input_samples(self.rows, self.heading)
+        self.assertEqual(result["s_incomplete"], self.incomplete_rows)
+        self.assertEqual(
+            len(result["save_samples"]),
+            FORM_ROWS - len(self.recorded_rows) - len(self.incomplete_rows),
+        )
+        self.assertEqual(
+            result["save_samples"][0][FIELD_FOR_GETTING_SAMPLE_ID], "FORM-0002"
+        )
+
+    def test_validation_time(self):
+        start = time.perf_counter()
+        validate_input_samples(self.rows, self.heading)
+        self.assertLess(time.perf_counter() - start, FORM_VALIDATION_TIME)
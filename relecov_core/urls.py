@@ -5,6 +5,11 @@ from django.conf.urls.static import static
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path(
+        "accessionList/<slug:database_type>",
+        views.accession_list,
+        name="accession_list",
+    ),
     path(
         "annotationDisplay=<int:annot_id>",
         views.annotation_display,
@@ -19,6 +24,7 @@ urlpatterns = [
     path("intranet/", views.intranet, name="intranet"),
     path("laboratoryContact/", views.laboratory_contact, name="laboratory_contact"),
     path("metadataForm", views.metadata_form, name="metadataForm"),
+    path("metrics", views.metrics, name="metrics"),
     path(
         "metadataVisualization/",
         views.metadata_visualization,
@@ -0,0 +1,77 @@
+import time
+
+from django.core.cache import cache
+
+from relecov_core.core_config import (
+    AUTH_CONTEXT_SESSION_KEY,
+    AUTH_CONTEXT_SESSION_TTL,
+    AUTH_CONTEXT_VERSION_KEY,
+    RELECOV_MANAGER_GROUP,
+)
+from relecov_core.models import Profile
+
+
+class AuthContext:
+    """Permissions of the user in the request. Managers are allowed to see
+    the samples of all laboratories, other users only the samples of the
+    laboratories in their profile
+    """
+
+    def __init__(self, user_id=None, is_manager=False, lab_names=None):
+        self.user_id = user_id
+        self.is_manager = is_manager
+        self.lab_names = lab_names or []
+
+    def get_lab_name(self):
+        """Return the laboratory of the user, or empty string if the profile
+        does not define it
+        """
+        return self.lab_names[0] if len(self.lab_names) > 0 else ""
+
+    def is_allowed_lab(self, lab_name):
+        if self.is_manager:
+            return True
+        return str(lab_name).lower() in [lab.lower() for lab in self.lab_names]
+
+
+def get_auth_context_version(user_id):
+    return cache.get(AUTH_CONTEXT_VERSION_KEY % user_id)
+
+
+def build_auth_context(user_obj):
+    """Fetch from database the groups and laboratory of the user"""
+    is_manager = user_obj.groups.filter(name__exact=RELECOV_MANAGER_GROUP).exists()
+    lab_names = list(
+        Profile.objects.filter(user=user_obj)
+        .exclude(laboratory=None)
+        .exclude(laboratory="")
+        .values_list("laboratory", flat=True)
+    )
+    return AuthContext(user_obj.pk, is_manager, lab_names)
+
+
+def get_auth_context(request):
+    """Return the authorisation context of the request user. The context is
+    kept in the session until it expires or the profile or groups of the
+    user change
+    """
+    if not request.user.is_authenticated:
+        return AuthContext()
+    version = get_auth_context_version(request.user.pk)
+    stored = request.session.get(AUTH_CONTEXT_SESSION_KEY)
+    if (
+        stored is not None
+        and stored["user_id"] == request.user.pk
+        and stored["version"] == version
+        and stored["expires"] > time.time()
+    ):
+        return AuthContext(stored["user_id"], stored["is_manager"], stored["lab_names"])
+    auth_context = build_auth_context(request.user)
+    request.session[AUTH_CONTEXT_SESSION_KEY] = {
+        "user_id": auth_context.user_id,
+        "is_manager": auth_context.is_manager,
+        "lab_names": auth_context.lab_names,
+        "version": version,
+        "expires": time.time() + AUTH_CONTEXT_SESSION_TTL,
+    }
+    return auth_context
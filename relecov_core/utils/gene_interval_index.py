@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class GeneIntervalIndex:
+    """Genes of a chromosome kept as sorted arrays of start and end
+    positions, to find the gene of any number of positions with
+    searchsorted instead of querying the database
+    """
+
+    def __init__(self, genes):
+        """genes is a list of (gene_name, gene_start, gene_end). When genes
+        overlap, the one starting later is preferred, and for the same start
+        the shorter one
+        """
+        genes = sorted(genes, key=lambda gene: (gene[1], -gene[2]))
+        self.names = np.array([gene[0] for gene in genes], dtype=object)
+        self.starts = np.array([gene[1] for gene in genes], dtype=np.int64)
+        self.ends = np.array([gene[2] for gene in genes], dtype=np.int64)
+        # largest end of the genes up to each index, to stop looking back
+        # for an enclosing gene when none of the previous ones reaches the
+        # position
+        self.max_ends = (
+            np.maximum.accumulate(self.ends) if len(genes) > 0 else self.ends
+        )
+        self.domains = [
+            {"name": name, "coord": "%s-%s" % (start, end)}
+            for name, start, end in genes
+        ]
+
+    def get_domains(self):
+        """Return the gene names and coordinates used by the needle plot"""
+        return [dict(domain) for domain in self.domains]
+
+    def get_genes(self, positions):
+        """Return an array with the gene name of each position, None for the
+        positions outside of any gene or not defined
+        """
+        positions = list(positions)
+        defined = np.array([pos is not None for pos in positions], dtype=bool)
+        genes = np.full(len(positions), None, dtype=object)
+        positions = np.array(
+            [pos if pos is not None else 0 for pos in positions], dtype=np.int64
+        )
+        idx = np.searchsorted(self.starts, positions, side="right") - 1
+        idx[~defined] = -1
+        pending = np.flatnonzero(idx >= 0)
+        while len(pending) > 0:
+            candidates = idx[pending]
+            found = self.ends[candidates] >= positions[pending]
+            genes[pending[found]] = self.names[candidates[found]]
+            # a gene starting before the candidate can still contain the
+            # position
+            pending = pending[~found]
+            idx[pending] -= 1
+            candidates = idx[pending]
+            pending = pending[
+                (candidates >= 0)
+                & (self.max_ends[np.maximum(candidates, 0)] >= positions[pending])
+            ]
+        return genes
@@ -107,7 +107,7 @@ def stored_gff(gff_parsed, user):
     if not Chromosome.objects.filter(chromosome__iexact=organism).exists():
         chromosome_obj = Chromosome.objects.create_new_chromosome(organism)
     else:
-        chromosome_obj = Chromosome.objects.filter(chromosome__iexact=organism)
+        chromosome_obj = Chromosome.objects.filter(chromosome__iexact=organism).last()
     gff_parsed["user"] = user
     gff_parsed["chromosomeID"] = chromosome_obj
     OrganismAnnotation.objects.create_new_annotation(gff_parsed)
@@ -116,4 +116,6 @@ def stored_gff(gff_parsed, user):
         gene["user"] = user
         gene["chromosomeID"] = chromosome_obj
         Gene.objects.create_new_gene(gene)
+    # the index could be built while the genes were being stored
+    Gene.objects.clear_gene_indexes()
     return
@@ -1,3 +1,9 @@
+import threading
+import time
+
+from django.db.models import Count, Max, Q
+
+from relecov_core.core_config import BIOINFO_FIELDS_UTILIZATION_TTL
 from relecov_core.models import (
     BioinfoAnalysisField,
     BioinfoAnalysisValue,
@@ -12,6 +18,8 @@ from relecov_core.utils.handling_samples import (
 
 from relecov_core.utils.schema_handling import get_default_schema
 
+_fields_utilization_lock = threading.Lock()
+
 
 def get_bio_analysis_stats_from_lab(lab_name=None):
     """Get the number of samples that are analized and compare with the number
@@ -69,6 +77,64 @@ def get_bioinfo_analysis_data_from_sample(sample_id):
     return a_data
 
 
+def count_fields_values(schema_obj, from_value_id=0):
+    """Count, in a single query grouped by field, the values of the schema
+    fields and the values that are not empty. Only the values with an id
+    greater than from_value_id are counted.
+    Return the counts per field id and the greatest counted value id
+    """
+    value_counts = (
+        BioinfoAnalysisValue.objects.filter(
+            bioinfo_analysis_fieldID__schemaID=schema_obj, pk__gt=from_value_id
+        )
+        .values("bioinfo_analysis_fieldID")
+        .annotate(
+            total=Count("pk"),
+            not_empty=Count("pk", filter=~Q(value__in=["None", ""])),
+            last_value_id=Max("pk"),
+        )
+        .order_by()
+    )
+    counts = {}
+    last_value_id = from_value_id
+    for value_count in value_counts:
+        counts[value_count["bioinfo_analysis_fieldID"]] = [
+            value_count["total"],
+            value_count["not_empty"],
+        ]
+        last_value_id = max(last_value_id, value_count["last_value_id"])
+    return counts, last_value_id
+
+
+def get_fields_values_count(schema_obj):
+    """Return the number of values and not empty values for each field of
+    the schema. Counts are kept in memory per schema, and only the values
+    stored since the previous call are counted
+    """
+    now = time.monotonic()
+    with _fields_utilization_lock:
+        cached = BioinfoAnalysisField.objects.fields_utilization.get(schema_obj.pk)
+        if cached is None or cached["expires"] <= now:
+            counts, last_value_id = count_fields_values(schema_obj)
+            cached = {
+                "expires": now + BIOINFO_FIELDS_UTILIZATION_TTL,
+                "last_value_id": last_value_id,
+                "counts": counts,
+            }
+            BioinfoAnalysisField.objects.fields_utilization[schema_obj.pk] = cached
+            return dict(counts)
+        new_counts, cached["last_value_id"] = count_fields_values(
+            schema_obj, cached["last_value_id"]
+        )
+        for field_id, (total, not_empty) in new_counts.items():
+            field_counts = cached["counts"].setdefault(field_id, [0, 0])
+            cached["counts"][field_id] = [
+                field_counts[0] + total,
+                field_counts[1] + not_empty,
+            ]
+        return dict(cached["counts"])
+
+
 def get_bioinfo_analyis_fields_utilization(schema_obj=None):
     """Get the level of utilization for the bioinfo analysis fields.
     If schema is not given, the function get the latest default schema
@@ -78,7 +144,12 @@ def get_bioinfo_analyis_fields_utilization(schema_obj=None):
         schema_obj = get_default_schema()
 
     # get field names
-    if not BioinfoAnalysisField.objects.filter(schemaID=schema_obj).exists():
+    b_fields = list(
+        BioinfoAnalysisField.objects.filter(schemaID=schema_obj).values_list(
+            "pk", "label_name"
+        )
+    )
+    if len(b_fields) == 0:
         return b_data
 
     num_samples_in_sch = get_samples_count_per_schema(schema_obj.get_schema_name())
@@ -90,30 +161,18 @@ def get_bioinfo_analyis_fields_utilization(schema_obj=None):
         "fields_norm": {},
         "fields_value": {},
     }
-    b_field_objs = BioinfoAnalysisField.objects.filter(schemaID=schema_obj)
-    for b_field_obj in b_field_objs:
-        f_name = b_field_obj.get_label()
-        if not BioinfoAnalysisValue.objects.filter(
-            bioinfo_analysis_fieldID=b_field_obj
-        ).exists():
+    values_count = get_fields_values_count(schema_obj)
+    for field_id, f_name in b_fields:
+        if field_id not in values_count:
             b_data["never_used"].append(f_name)
             b_data["fields_value"][f_name] = 0
             continue
-        # b_data[schema_name][f_name] = [count]
-        count_not_empty = (
-            BioinfoAnalysisValue.objects.filter(bioinfo_analysis_fieldID=b_field_obj)
-            .exclude(value__in=["None", ""])
-            .count()
-        )
+        count_not_empty = values_count[field_id][1]
         b_data["fields_value"][f_name] = count_not_empty
         if count_not_empty == 0:
             b_data["always_none"].append(f_name)
             continue
-
-        try:
-            b_data["fields_norm"][f_name] = count_not_empty / num_samples_in_sch
-        except ZeroDivisionError:
-            b_data["fields_norm"][f_name] = 0
-    b_data["num_fields"] = len(b_field_objs)
+        b_data["fields_norm"][f_name] = count_not_empty / num_samples_in_sch
+    b_data["num_fields"] = len(b_fields)
 
     return b_data
@@ -30,11 +30,12 @@ def get_all_defined_labs():
 
 
 def get_lab_name_from_user(user_obj):
-    """Get the laboratory name for the user"""
-    if Profile.objects.filter(user=user_obj).exists():
-        profile_obj = Profile.objects.filter(user=user_obj).last()
-        return profile_obj.get_lab_name()
-    else:
+    """Get the laboratory name for the user. The profile is kept in the user
+    instance, so it is fetched once per request
+    """
+    try:
+        return user_obj.profile.get_lab_name()
+    except Profile.DoesNotExist:
         return ""
 
 
@@ -1,26 +1,131 @@
-from relecov_core.models import PublicDatabaseValues
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Lower
+
+from relecov_core.core_config import (
+    ACCESSION_DATABASE_FIELDS,
+    ACCESSION_LIST_PAGE_SIZE,
+    ERROR_ACCESSION_DATABASE_NOT_DEFINED,
+)
+from relecov_core.models import PublicDatabaseValues, Sample, SampleAccession
 from relecov_core.utils.plotly_graphics import pie_graphic
 
 
-def get_public_accession_from_sample_lab(p_field, sample_objs=None):
-    """Get the list of the accesion values with their sample.
-    If not samples are given it gets the information for all samples
+def is_valid_accession(database_type, accession):
+    """Check if the value is an accession of the public database. GISAID
+    accessions must contain "EPI_ISL" and ENA accessions must be given
     """
-    if sample_objs is None:
-        return PublicDatabaseValues.objects.filter(
-            public_database_fieldID__property_name__exact=p_field,
-            value__icontains="EPI_ISL",
-        ).values_list(
+    if not isinstance(accession, str):
+        return False
+    if database_type == "gisaid":
+        return "EPI_ISL" in accession
+    return accession not in ["Not Provided", ""]
+
+
+def get_sample_accessions(split_data):
+    """Return a dictionary with the accession included in the request for
+    each public database
+    """
+    accessions = {}
+    for database_type, field in ACCESSION_DATABASE_FIELDS.items():
+        accession = split_data.get(database_type, {}).get(field, "")
+        if is_valid_accession(database_type, accession):
+            accessions[database_type] = accession
+    return accessions
+
+
+def store_sample_accessions(sample_obj, accessions):
+    """Store the accessions of the sample returned by get_sample_accessions"""
+    for database_type, accession in accessions.items():
+        SampleAccession.objects.create_new_accession(
+            {
+                "sampleID": sample_obj,
+                "database_type": database_type,
+                "accession": accession,
+            }
+        )
+    return
+
+
+def get_percentage(value, total):
+    if total == 0:
+        return 0
+    return round(value * 100 / total, 2)
+
+
+def get_accession_stats(auth_context):
+    """Count, for each laboratory that the user is allowed to see, the
+    number of samples and the number of samples with accession in each
+    public database, using grouped queries. Return the counts and the
+    percentages per laboratory and for all of them
+    """
+    accession_counts = {
+        database_type: Count(
+            "sampleaccession",
+            filter=Q(sampleaccession__database_type__exact=database_type),
+        )
+        for database_type in ACCESSION_DATABASE_FIELDS
+    }
+    lab_rows = (
+        Sample.objects.visible_to(auth_context)
+        .annotate(lab=Lower("collecting_institution"))
+        .values("lab")
+        .annotate(
+            lab_name=Max("collecting_institution"),
+            samples=Count("pk", distinct=True),
+            **accession_counts
+        )
+        .order_by("lab")
+    )
+    total = {"samples": 0}
+    total.update({database_type: 0 for database_type in ACCESSION_DATABASE_FIELDS})
+    labs = []
+    for row in lab_rows:
+        lab = {"lab_name": row["lab_name"], "samples": row["samples"]}
+        total["samples"] += row["samples"]
+        for database_type in ACCESSION_DATABASE_FIELDS:
+            lab[database_type] = row[database_type]
+            lab[database_type + "_percentage"] = get_percentage(
+                row[database_type], row["samples"]
+            )
+            total[database_type] += row[database_type]
+        labs.append(lab)
+    for database_type in ACCESSION_DATABASE_FIELDS:
+        total[database_type + "_percentage"] = get_percentage(
+            total[database_type], total["samples"]
+        )
+    return {"labs": labs, "total": total}
+
+
+def get_accession_list(
+    auth_context, database_type, page=1, page_size=ACCESSION_LIST_PAGE_SIZE, lab=None
+):
+    """Return a page of the laboratory, sample name and accession of the
+    samples uploaded to the public database, for the samples that the user
+    is allowed to see. If lab is given only its samples are returned
+    """
+    if database_type not in ACCESSION_DATABASE_FIELDS:
+        return {"ERROR": ERROR_ACCESSION_DATABASE_NOT_DEFINED}
+    acc_objs = SampleAccession.objects.filter(database_type__exact=database_type)
+    if not auth_context.is_manager:
+        acc_objs = acc_objs.filter(sampleID__in=Sample.objects.visible_to(auth_context))
+    if lab:
+        acc_objs = acc_objs.filter(sampleID__collecting_institution__iexact=lab)
+    paginator = Paginator(
+        acc_objs.order_by("pk").values_list(
             "sampleID__collecting_institution",
             "sampleID__sequencing_sample_id",
-            "value",
-        )
-    else:
-        return PublicDatabaseValues.objects.filter(
-            sampleID__in=sample_objs,
-            public_database_fieldID__property_name__exact=p_field,
-            value__icontains="EPI_ISL",
-        ).values_list("sampleID__sequencing_sample_id", "value")
+            "accession",
+        ),
+        page_size,
+    )
+    page_obj = paginator.get_page(page)
+    return {
+        "count": paginator.count,
+        "num_pages": paginator.num_pages,
+        "page": page_obj.number,
+        "accessions": [list(row) for row in page_obj.object_list],
+    }
 
 
 def percentage_graphic(len_sample, len_acc, title):
@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from relecov_core.core_config import (
+    ERROR_MISSING_SAMPLE_DATA,
+    ERROR_SAMPLE_ERROR_TYPE_NOT_DEFINED,
+    ERROR_SAMPLE_NAME_NOT_INCLUDED,
+    ERROR_SAMPLE_NOT_DEFINED,
+    ERROR_SAMPLE_STATE_NOT_DEFINED,
+)
+from relecov_core.models import DateUpdateState, Error, Sample, SampleState
+
+# Maximum number of ids sent in a single "IN" condition
+STATE_UPDATE_BATCH_SIZE = 1000
+
+
+def apply_state_transitions(transitions):
+    """Apply the list of (sample_id, state_id, error_id) transitions. Every
+    transition is logged in DateUpdateState with a single insert and each
+    sample gets the state of its last transition, updating only the state
+    columns with one query per different state. error_id is only set when
+    is not None. Return the number of updated samples
+    """
+    now = timezone.now()
+    last_transition = {}
+    for sample_id, state_id, error_id in transitions:
+        last_transition[sample_id] = (state_id, error_id)
+    sample_groups = {}
+    for sample_id, state_error in last_transition.items():
+        sample_groups.setdefault(state_error, []).append(sample_id)
+
+    with transaction.atomic():
+        for (state_id, error_id), sample_ids in sample_groups.items():
+            values = {"state_id": state_id, "state_date": now}
+            if error_id is not None:
+                values["error_type_id"] = error_id
+            for idx in range(0, len(sample_ids), STATE_UPDATE_BATCH_SIZE):
+                Sample.objects.filter(
+                    pk__in=sample_ids[idx : idx + STATE_UPDATE_BATCH_SIZE]
+                ).update(**values)
+        DateUpdateState.objects.bulk_create(
+            [
+                DateUpdateState(sampleID_id=sample_id, stateID_id=state_id)
+                for sample_id, state_id, _ in transitions
+            ],
+            batch_size=STATE_UPDATE_BATCH_SIZE,
+        )
+    return len(last_transition)
+
+
+def record_sample_states(sample_id, states):
+    """Change the sample through the list of states, in the given order,
+    logging each of them. The sample ends in the last state
+    """
+    transitions = []
+    for state in states:
+        state_id = SampleState.objects.get_state_id(state)
+        if state_id is None:
+            return {"ERROR": ERROR_SAMPLE_STATE_NOT_DEFINED, "state": state}
+        transitions.append((int(sample_id), state_id, None))
+    apply_state_transitions(transitions)
+    return {"SUCCESS": len(transitions)}
+
+
+def update_sample_states(entries):
+    """Apply the state changes requested by the pipeline. entries is a list
+    of dictionaries with sample_name, state and, optionally, error_type,
+    which is only stored for the error states. Sample names are matched
+    case-insensitively, as for a single sample, and their ids are fetched
+    in a single query. If any entry is not valid no change is done and the
+    list of invalid entries is returned
+    """
+    invalid_entries = []
+    valid_entries = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            invalid_entries.append({"entry": entry, "ERROR": ERROR_MISSING_SAMPLE_DATA})
+        elif not isinstance(entry.get("sample_name"), (str, int)):
+            invalid_entries.append(
+                {"entry": entry, "ERROR": ERROR_SAMPLE_NAME_NOT_INCLUDED}
+            )
+        elif not isinstance(entry.get("state"), str):
+            invalid_entries.append(
+                {"entry": entry, "ERROR": ERROR_SAMPLE_STATE_NOT_DEFINED}
+            )
+        else:
+            valid_entries.append([str(entry["sample_name"]).lower(), entry])
+    sample_names = list({sample_name for sample_name, _ in valid_entries})
+    sample_ids = {}
+    for idx in range(0, len(sample_names), STATE_UPDATE_BATCH_SIZE):
+        # the last sample is used when the name is repeated, as for a
+        # single sample
+        sample_ids.update(
+            Sample.objects.annotate(sample_name=Lower("sequencing_sample_id"))
+            .filter(sample_name__in=sample_names[idx : idx + STATE_UPDATE_BATCH_SIZE])
+            .order_by("pk")
+            .values_list("sample_name", "pk")
+        )
+    transitions = []
+    for sample_name, entry in valid_entries:
+        state = entry["state"]
+        if sample_name not in sample_ids:
+            invalid_entries.append({"entry": entry, "ERROR": ERROR_SAMPLE_NOT_DEFINED})
+            continue
+        state_id = SampleState.objects.get_state_id(state)
+        if state_id is None:
+            invalid_entries.append(
+                {"entry": entry, "ERROR": ERROR_SAMPLE_STATE_NOT_DEFINED}
+            )
+            continue
+        error_id = None
+        if entry.get("error_type") and "Error" in state:
+            error_type = entry["error_type"]
+            if isinstance(error_type, str):
+                error_id = Error.objects.get_error_id(error_type)
+            if error_id is None:
+                invalid_entries.append(
+                    {"entry": entry, "ERROR": ERROR_SAMPLE_ERROR_TYPE_NOT_DEFINED}
+                )
+                continue
+        transitions.append((sample_ids[sample_name], state_id, error_id))
+    if len(invalid_entries) > 0:
+        return {"ERROR": invalid_entries}
+    return {"SUCCESS": apply_state_transitions(transitions)}
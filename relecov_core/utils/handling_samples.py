@@ -1,11 +1,15 @@
 import json
 import os
 import shutil
+import time
 from collections import OrderedDict
 from datetime import datetime
 import pandas as pd
-from django.contrib.auth.models import Group, User
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.files.storage import FileSystemStorage
+from django.db.models import Count, Max
+from django.db.models.functions import Lower
 from django.conf import settings
 from relecov_tools.utils import write_to_excel_file
 
@@ -24,6 +28,8 @@ from relecov_core.core_config import (
     FIELD_FOR_GETTING_SAMPLE_ID,
     HEADING_FOR_BASIC_SAMPLE_DATA,
     HEADING_FOR_FASTQ_SAMPLE_DATA,
+    METADATA_FORM_CACHE_PREFIX,
+    METADATA_FORM_LIMS_FIELDS_INTERVAL,
 )
 
 
@@ -55,42 +61,39 @@ from relecov_core.utils.generic_functions import get_configuration_value
 from relecov_core.utils.plotly_dash_graphics import dash_bar_lab
 
 
-def analyze_input_samples(request):
+def validate_input_samples(s_json_data, heading_in_form):
+    """Check the rows of the metadata form. Rows for samples already
+    recorded, matched with a single case insensitive query, and rows with
+    empty values in required columns are reported. All rows are checked,
+    so every incomplete row is returned at once
+    """
     result = {}
     save_samples = []
     s_already_record = []
     s_incomplete = []
-    s_json_data = json.loads(request.POST["table_data"])
-    heading_in_form = request.POST["heading"].split(",")
-    user_lab = Profile.objects.filter(user=request.user).last().get_lab_name()
-    submmit_institution = get_configuration_value("SUBMITTING_INSTITUTION")
     # Select the sample field that will be used in Sample class
     idx_sample = heading_in_form.index(FIELD_FOR_GETTING_SAMPLE_ID)
-    allowed_empty_index = []
-    for item in ALLOWED_EMPTY_FIELDS_IN_METADATA_SAMPLE_FORM:
-        allowed_empty_index.append(heading_in_form.index(item))
-
+    allowed_empty = set(ALLOWED_EMPTY_FIELDS_IN_METADATA_SAMPLE_FORM)
+    required_index = [
+        idx for idx, field in enumerate(heading_in_form) if field not in allowed_empty
+    ]
+    sample_names = {row[idx_sample].lower() for row in s_json_data} - {""}
+    recorded_names = set(
+        Sample.objects.annotate(sample_name=Lower("sequencing_sample_id"))
+        .filter(sample_name__in=sample_names)
+        .values_list("sample_name", flat=True)
+    )
     for row in s_json_data:
-        row_data = {}
-        incompleted = False
         sample_name = row[idx_sample]
         if sample_name == "":
             continue
-        if Sample.objects.filter(sequencing_sample_id__iexact=sample_name).exists():
+        if sample_name.lower() in recorded_names:
             s_already_record.append(sample_name)
             continue
-        for idx in range(len(heading_in_form)):
-
-            if row[idx] == "" and idx not in allowed_empty_index:
-                s_incomplete.append(row)
-                incompleted = True
-                break
-            row_data[heading_in_form[idx]] = row[idx]
-        if incompleted:
-            break
-        row_data["Originating Laboratory"] = user_lab
-        row_data["Submitting Institution"] = submmit_institution
-        save_samples.append(row_data)
+        if any(row[idx] == "" for idx in required_index):
+            s_incomplete.append(row)
+            continue
+        save_samples.append(dict(zip(heading_in_form, row)))
     if len(save_samples) > 0:
         result["save_samples"] = save_samples
     if len(s_incomplete) > 0:
@@ -100,6 +103,19 @@ def analyze_input_samples(request):
     return result
 
 
+def analyze_input_samples(request):
+    s_json_data = json.loads(request.POST["table_data"])
+    heading_in_form = request.POST["heading"].split(",")
+    result = validate_input_samples(s_json_data, heading_in_form)
+    if "save_samples" in result:
+        user_lab = request.auth_context.get_lab_name()
+        submmit_institution = get_configuration_value("SUBMITTING_INSTITUTION")
+        for row_data in result["save_samples"]:
+            row_data["Originating Laboratory"] = user_lab
+            row_data["Submitting Institution"] = submmit_institution
+    return result
+
+
 def assign_samples_to_new_user(data):
     """Assign all samples from a laboratory to a new userID"""
     user_obj = User.objects.filter(pk__exact=data["userName"])
@@ -131,9 +147,44 @@ def check_if_empty_data(data):
     return False
 
 
-def create_form_for_batch(schema_obj, user_obj):
-    """Collect information for creating for batch from. This form is displayed
-    only if previously was defined sample in sample form
+def get_metadata_form_version(schema_obj):
+    """Return the version of the metadata form definitions of the schema.
+    It changes when the metadata visualization is stored or deleted, and
+    each time the interval for the fields fetched from iSkyLIMS expires
+    """
+    m_vis = MetadataVisualization.objects.aggregate(Max("pk"), Count("pk"))
+    return "%s_%s_%s_%s" % (
+        schema_obj.pk,
+        m_vis["pk__max"],
+        m_vis["pk__count"],
+        int(time.time() // METADATA_FORM_LIMS_FIELDS_INTERVAL),
+    )
+
+
+def get_cached_form_definition(name, schema_obj, build_function):
+    """Return the form definition created by build_function for the schema.
+    Definitions are stored in the django cache for the current version of
+    the metadata form, so that the iSkyLIMS requests are only sent when the
+    version changes. Errors are not stored
+    """
+    cache_key = "%s_%s_%s" % (
+        METADATA_FORM_CACHE_PREFIX,
+        name,
+        get_metadata_form_version(schema_obj),
+    )
+    form_definition = cache.get(cache_key)
+    if form_definition is None:
+        form_definition = build_function(schema_obj)
+        if "ERROR" in form_definition:
+            return form_definition
+        cache.set(cache_key, form_definition, METADATA_FORM_LIMS_FIELDS_INTERVAL)
+    return form_definition
+
+
+def get_lims_sample_fields(schema_obj):
+    """Fetch from iSkyLIMS the sample fields and the sample project fields
+    of the schema. The sample project fields are returned with the label as
+    key, and the format and the option list as values
     """
     schema_name = schema_obj.get_schema_name()
     try:
@@ -142,12 +193,18 @@ def create_form_for_batch(schema_obj, user_obj):
         return {"ERROR": ERROR_ISKYLIMS_NOT_REACHEABLE}
     if "ERROR" in iskylims_sample_raw:
         return iskylims_sample_raw
+
     # Remove the characters "schema" if exist in the name of the schema
     if "schema" in schema_name:
         schema_name = schema_name.replace("schema", "").strip()
     i_sam_proj_raw = get_sample_project_fields_data(schema_name)
+    if "ERROR" in i_sam_proj_raw:
+        return {
+            "ERROR": ERROR_UNABLE_FETCH_SAMPLE_PROJECT_FIELDS + "for " + schema_name
+        }
     i_sam_proj_data = {}
-    # Create the structure from the sample project fields get from iSkyLIMS
+    # Format the information from sample Project to have label as key
+    # format of the field and the option list in aa list
     for item in i_sam_proj_raw:
         key = item["sampleProjectFieldDescription"]
         i_sam_proj_data[key] = {}
@@ -156,13 +213,25 @@ def create_form_for_batch(schema_obj, user_obj):
             i_sam_proj_data[key]["options"] = []
             for opt in item["sampleProjectOptionList"]:
                 i_sam_proj_data[key]["options"].append(opt["optionValue"])
+    return {"sample_fields": iskylims_sample_raw, "project_fields": i_sam_proj_data}
+
+
+def build_form_for_batch(schema_obj):
+    """Collect the fields of the batch form with the format and options
+    defined in iSkyLIMS
+    """
+    lims_fields = get_cached_form_definition(
+        "lims_fields", schema_obj, get_lims_sample_fields
+    )
+    if "ERROR" in lims_fields:
+        return lims_fields
+    i_sam_proj_data = lims_fields["project_fields"]
     if not MetadataVisualization.objects.filter(fill_mode="sample").exists():
         return {"ERROR": ERROR_FIELDS_FOR_METADATA_ARE_NOT_DEFINED}
     m_batch_objs = MetadataVisualization.objects.filter(fill_mode="batch").order_by(
         "order"
     )
 
-    m_batch_form = {}
     field_data = {}
     for m_batch_obj in m_batch_objs:
         label = m_batch_obj.get_label()
@@ -174,19 +243,28 @@ def create_form_for_batch(schema_obj, user_obj):
                 field_data[label]["options"] = i_sam_proj_data[label]["options"]
         else:
             print("The field not be recorded in iSkyLIMS", label)
+    return {"fields": field_data}
+
 
-    m_batch_form["fields"] = field_data
+def create_form_for_batch(schema_obj, user_obj):
+    """Collect information for creating for batch from. This form is displayed
+    only if previously was defined sample in sample form
+    """
+    batch_form = get_cached_form_definition("batch", schema_obj, build_form_for_batch)
+    if "ERROR" in batch_form:
+        return batch_form
+    m_batch_form = {}
+    m_batch_form["fields"] = batch_form["fields"]
     m_batch_form["username"] = user_obj.username
     m_batch_form["lab_name"] = get_lab_name_from_user(user_obj)
 
     return m_batch_form
 
 
-def create_form_for_sample(schema_obj):
+def build_form_for_sample(schema_obj):
     """Collect information from iSkyLIMS and from metadata table to
     create the metadata form for filling sample data
     """
-    # schema_name = schema_obj.get_schema_name()
     m_form = OrderedDict()
     f_data = {}
     l_iskylims = []  # variable name in iSkyLIMS
@@ -196,46 +274,23 @@ def create_form_for_sample(schema_obj):
     m_sam_objs = MetadataVisualization.objects.filter(fill_mode="sample").order_by(
         "order"
     )
-    # schema_obj = m_sam_objs[0].get_schema_obj()
-    schema_name = schema_obj.get_schema_name()
     # Get the properties in schema for mapping
-    s_prop_objs = SchemaProperties.objects.filter(schemaID=schema_obj)
     s_prop_dict = {}
-    for s_prop_obj in s_prop_objs:
-        if s_prop_obj.get_ontology() == "0":
+    for ontology, label, s_format in SchemaProperties.objects.filter(
+        schemaID=schema_obj
+    ).values_list("ontology", "label", "format"):
+        if str(ontology) == "0":
             continue
-        s_prop_dict[s_prop_obj.get_ontology()] = {
-            "label": s_prop_obj.get_label(),
-            "format": s_prop_obj.get_format(),
-        }
+        s_prop_dict[str(ontology)] = {"label": str(label), "format": str(s_format)}
 
     # get the sample fields and sample project fields from iSkyLIMS
-    try:
-        iskylims_sample_raw = get_sample_fields_data()
-    except AttributeError:
-        return {"ERROR": ERROR_ISKYLIMS_NOT_REACHEABLE}
-    if "ERROR" in iskylims_sample_raw:
-        return iskylims_sample_raw
-
-    # Remove the characters "schema" if exist in the name of the schema
-    if "schema" in schema_name:
-        schema_name = schema_name.replace("schema", "").strip()
-    i_sam_proj_raw = get_sample_project_fields_data(schema_name)
-    if "ERROR" in i_sam_proj_raw:
-        return {
-            "ERROR": ERROR_UNABLE_FETCH_SAMPLE_PROJECT_FIELDS + "for " + schema_name
-        }
-    i_sam_proj_data = {}
-    # Format the information from sample Project to have label as key
-    # format of the field and the option list in aa list
-    for item in i_sam_proj_raw:
-        key = item["sampleProjectFieldDescription"]
-        i_sam_proj_data[key] = {}
-        i_sam_proj_data[key]["format"] = item["sampleProjectFieldType"]
-        if item["sampleProjectFieldType"] == "Options List":
-            i_sam_proj_data[key]["options"] = []
-            for opt in item["sampleProjectOptionList"]:
-                i_sam_proj_data[key]["options"].append(opt["optionValue"])
+    lims_fields = get_cached_form_definition(
+        "lims_fields", schema_obj, get_lims_sample_fields
+    )
+    if "ERROR" in lims_fields:
+        return lims_fields
+    iskylims_sample_raw = lims_fields["sample_fields"]
+    i_sam_proj_data = lims_fields["project_fields"]
     # Map fields using ontology
     iskylims_sample_data = {}
     for key, values in iskylims_sample_raw.items():
@@ -281,6 +336,13 @@ def create_form_for_sample(schema_obj):
     return f_data
 
 
+def create_form_for_sample(schema_obj):
+    """Return the metadata form for filling sample data, which is created
+    once for each version of the metadata form
+    """
+    return get_cached_form_definition("sample", schema_obj, build_form_for_sample)
+
+
 def create_metadata_form(schema_obj, user_obj):
     """Collect information from iSkyLIMS and from metadata table to
     create the user metadata fom
@@ -404,19 +466,18 @@ def get_public_database_fields(schema_obj, db_type):
     return None
 
 
-def get_sample_display_data(sample_id, user):
+def get_sample_display_data(sample_id, auth_context):
     """Check if user is allowed to see the data and if true collect all info
     from sample to display
     """
-    sample_obj = get_sample_obj_from_id(sample_id)
-    if sample_obj is None:
-        return {"ERROR": ERROR_SAMPLE_DOES_NOT_EXIST}
     # Allow to see information obut sample to relecovManager
-    group = Group.objects.get(name="RelecovManager")
-    if group not in user.groups.all():
-        lab_name = sample_obj.get_collecting_institution()
-        if not Profile.objects.filter(user=user, laboratory__iexact=lab_name).exists():
+    sample_obj = (
+        Sample.objects.visible_to(auth_context).filter(pk__exact=sample_id).last()
+    )
+    if sample_obj is None:
+        if Sample.objects.filter(pk__exact=sample_id).exists():
             return {"ERROR": ERROR_NOT_ALLOWED_TO_SEE_THE_SAMPLE}
+        return {"ERROR": ERROR_SAMPLE_DOES_NOT_EXIST}
 
     s_data = {}
     s_data["basic"] = list(
@@ -539,22 +600,21 @@ def get_sample_objs_per_lab(lab_name):
     return Sample.objects.filter(collecting_institution__iexact=lab_name)
 
 
-def get_search_data(user_obj):
+def get_search_data(auth_context):
     """Fetch data to show in form"""
     s_data = {}
-    if Sample.objects.count() == 0:
+    if not Sample.objects.visible_to(auth_context).exists():
         return {"ERROR": ERROR_NOT_SAMPLES_HAVE_BEEN_DEFINED}
     s_data["s_state"] = SampleState.objects.all().values_list("pk", "display_string")
     # Allow to search information from any laboratoryr
-    group = Group.objects.get(name="RelecovManager")
-    if group in user_obj.groups.all():
+    if auth_context.is_manager:
         def_labs = get_all_defined_labs()
         if "ERROR" in def_labs:
             s_data["labs"] = ["", ""]
         else:
             s_data["labs"] = def_labs
     else:
-        s_data["labs"] = get_lab_name_from_user(user_obj)
+        s_data["labs"] = auth_context.get_lab_name()
 
     return s_data
 
@@ -568,13 +628,34 @@ def get_user_id_from_collecting_institution(lab):
     return None
 
 
+def get_lab_user_map():
+    """Return a dictionary with the user id assigned to each laboratory,
+    keyed by the laboratory name in lower case. As in
+    get_user_id_from_collecting_institution, the last defined profile wins
+    """
+    lab_users = {}
+    for lab, user_id in (
+        Profile.objects.exclude(laboratory=None)
+        .order_by("pk")
+        .values_list("laboratory", "user")
+    ):
+        lab_users[lab.lower()] = user_id
+    return lab_users
+
+
 def join_sample_and_batch(b_data, user_obj, schema_obj):
     """Get the sample information stored on temporary tables and join with the
     batch data.
     """
     join_data = []
-    sample_dict = {}
-    if not TemporalSampleStorage.objects.filter(user=user_obj).exists():
+    # rows stored one per field, before the sample_data column, are not
+    # read until they are converted
+    sample_dict = dict(
+        TemporalSampleStorage.objects.filter(user=user_obj, sample_data__isnull=False)
+        .order_by("pk")
+        .values_list("sample_name", "sample_data")
+    )
+    if len(sample_dict) == 0:
         return {"ERROR": ERROR_SAMPLES_NOT_DEFINED_IN_FORM}
     field_list = list(
         MetadataVisualization.objects.filter(schemaID=schema_obj)
@@ -582,12 +663,6 @@ def join_sample_and_batch(b_data, user_obj, schema_obj):
         .values_list("label_name", flat=True)
     )
     join_data.append(field_list)
-    t_sample_objs = TemporalSampleStorage.objects.filter(user=user_obj)
-    for t_sample_obj in t_sample_objs:
-        s_name = t_sample_obj.get_sample_name()
-        if s_name not in sample_dict:
-            sample_dict[s_name] = {}
-        sample_dict[s_name].update(t_sample_obj.get_temp_values())
 
     for key in sample_dict.keys():
         row_data = []
@@ -646,9 +721,9 @@ def get_sample_pre_recorded(user_obj):
     batch information for those samples
     """
     return list(
-        TemporalSampleStorage.objects.filter(
-            user=user_obj, field__exact="Sample ID given for sequencing"
-        ).values_list("value", flat=True)
+        TemporalSampleStorage.objects.filter(user=user_obj, sample_data__isnull=False)
+        .order_by("pk")
+        .values_list("sample_name", flat=True)
     )
 
 
@@ -685,7 +760,9 @@ def increase_unique_value(old_unique_number):
 
 def pending_samples_in_metadata_form(user_obj):
     """Check if there are samples waiting to be completed for the metadata form"""
-    if TemporalSampleStorage.objects.filter(user=user_obj).exists():
+    if TemporalSampleStorage.objects.filter(
+        user=user_obj, sample_data__isnull=False
+    ).exists():
         return True
     return False
 
@@ -700,10 +777,12 @@ def save_excel_form_in_samba_folder(m_file, user_name):
     return
 
 
-def search_samples(sample_name, lab_name, sample_state, s_date, user):
-    """Search the samples that match with the query conditions"""
+def search_samples(sample_name, lab_name, sample_state, s_date, auth_context):
+    """Search the samples that match with the query conditions, among the
+    samples that the user is allowed to see
+    """
     sample_list = []
-    sample_objs = Sample.objects.all()
+    sample_objs = Sample.objects.visible_to(auth_context)
     if lab_name != "":
         sample_objs = sample_objs.filter(collecting_institution__iexact=lab_name)
     if sample_name != "":
@@ -741,17 +820,10 @@ def search_samples(sample_name, lab_name, sample_state, s_date, user):
 
 def save_temp_sample_data(samples, user_obj):
     """Store the valid sample into the temporary table"""
-    sample_saved_list = []
-    for sample in samples:
-        for item, value in sample.items():
-            data = {"sample_name": sample[FIELD_FOR_GETTING_SAMPLE_ID]}
-            data["field"] = item
-            data["value"] = value
-            data["user"] = user_obj
-            TemporalSampleStorage.objects.save_temp_data(data)
-        # Include Originating Laboratory and Submitting Institution
-
-        sample_saved_list.append(sample[FIELD_FOR_GETTING_SAMPLE_ID])
+    TemporalSampleStorage.objects.save_temp_samples(
+        user_obj,
+        {sample[FIELD_FOR_GETTING_SAMPLE_ID]: sample for sample in samples},
+    )
     return
 
 
@@ -68,8 +68,13 @@ def get_variant_data_from_sample(sample_id):
     variant_data = []
     if VariantInSample.objects.filter(sampleID_id=sample_obj).exists():
         data["heading"] = HEADING_FOR_VARIANT_TABLE_DISPLAY
-        v_in_s_objs = VariantInSample.objects.filter(sampleID_id=sample_obj)
-        for v_in_s_obj in v_in_s_objs:
+        v_in_s_objs = VariantInSample.objects.filter(
+            sampleID_id=sample_obj
+        ).select_related("variantID_id__chromosomeID_id")
+        genes = get_genes_from_variants(
+            [v_in_s_obj.get_variantID_obj() for v_in_s_obj in v_in_s_objs]
+        )
+        for v_in_s_obj, gene in zip(v_in_s_objs, genes):
             # DP,REF_DP,ALT_DP,AF
             v_in_s_data = v_in_s_obj.get_variant_in_sample_data()
             v_obj = v_in_s_obj.get_variantID_obj()
@@ -94,7 +99,7 @@ def get_variant_data_from_sample(sample_id):
             else:
                 v_ann_data_p = v_ann_objs[0].get_variant_annot_data()
 
-            variant_data.append(v_data + v_in_s_data + v_ann_data_p)
+            variant_data.append(v_data + v_in_s_data + v_ann_data_p + [gene or ""])
     data["variant_data"] = variant_data
     return data
 
@@ -148,17 +153,38 @@ def get_gene_list(chromosome_obj):
 
 def get_domains_and_coordenates(chromosome_obj):
     """Get the coordenates and the gene names for the given chromosome"""
-    domains = []
-    if Gene.objects.filter(chromosomeID=chromosome_obj).exists():
-        gene_objs = Gene.objects.filter(chromosomeID=chromosome_obj)
-        for gene_obj in gene_objs:
-            domains.append(
-                {
-                    "name": gene_obj.get_gene_name(),
-                    "coord": "-".join(gene_obj.get_gene_positions()),
-                }
-            )
-    return domains
+    if chromosome_obj is None:
+        return []
+    return Gene.objects.get_gene_index(chromosome_obj.pk).get_domains()
+
+
+def get_genes_from_positions(chromosome_obj, positions):
+    """Return an array with the gene name of each position of the chromosome.
+    None is set for the positions which are not inside any gene or not defined
+    """
+    return Gene.objects.get_gene_index(chromosome_obj.pk).get_genes(positions)
+
+
+def get_genes_from_variants(variant_objs):
+    """Return the list with the gene name of each variant, found from its
+    position in the chromosome. None is set when it is not inside any gene
+    """
+    genes = [None] * len(variant_objs)
+    variants_per_chromosome = {}
+    for idx, variant_obj in enumerate(variant_objs):
+        if variant_obj is None or variant_obj.chromosomeID_id is None:
+            continue
+        chromosome_obj = variant_obj.chromosomeID_id
+        if chromosome_obj.pk not in variants_per_chromosome:
+            variants_per_chromosome[chromosome_obj.pk] = (chromosome_obj, [])
+        variants_per_chromosome[chromosome_obj.pk][1].append(idx)
+    for chromosome_obj, idxs in variants_per_chromosome.values():
+        chrom_genes = get_genes_from_positions(
+            chromosome_obj, [variant_objs[idx].pos for idx in idxs]
+        )
+        for idx, gene in zip(idxs, chrom_genes):
+            genes[idx] = gene
+    return genes
 
 
 """
@@ -195,15 +221,8 @@ def get_gene_objs(chromosome):
 
 
 def get_domains_list(chromosome):
-    domains = []
-    gene_objs = get_gene_objs(chromosome)
-    for gene_obj in gene_objs:
-        gene_data = {}
-        coords = "-".join(gene_obj.get_gene_positions())
-        gene_data = {"name": gene_obj.get_gene_name(), "coord": coords}
-        domains.append(gene_data)
-
-    return domains
+    chromosome_obj = Chromosome.objects.filter(chromosome=chromosome).last()
+    return get_domains_and_coordenates(chromosome_obj)
 
 
 def get_alelle_frequency_per_sample(sample_name, chromosome):
@@ -1,3 +1,11 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
 from plotly.offline import plot
 
 import plotly.graph_objects as go
@@ -10,7 +18,71 @@ from dash import dcc, html
 from django_plotly_dash import DjangoDash
 from dash.dependencies import Input, Output
 
+from relecov_core.core_config import PLOTLY_FIGURE_CACHE_SIZE
+
+# Serialised figures keyed by the hash of the function name and its arguments
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+_figure_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+# Hash of the data used in the last registered needle plot DjangoDash app
+_needle_plot_key = {"key": None}
+
+
+def _json_default(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.to_json(orient="split", date_format="iso")
+    return str(value)
+
+
+def get_figure_cache_key(func_name, args, kwargs):
+    """Hash the function name and the input data and options"""
+    key_data = json.dumps(
+        [func_name, args, kwargs], sort_keys=True, default=_json_default
+    )
+    return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+
+def get_figure_cache_stats():
+    """Return the hits, misses and evictions of the figure cache"""
+    with _figure_cache_lock:
+        stats = dict(_figure_cache_stats)
+        stats["size"] = len(_figure_cache)
+    stats["max_size"] = PLOTLY_FIGURE_CACHE_SIZE
+    return stats
 
+
+def clear_figure_cache():
+    with _figure_cache_lock:
+        _figure_cache.clear()
+    return
+
+
+def cached_figure(func):
+    """Keep the serialised output of the graphic function in a size bounded
+    LRU, so that the figure is not built again for the same data
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = get_figure_cache_key(func.__name__, args, kwargs)
+        with _figure_cache_lock:
+            if key in _figure_cache:
+                _figure_cache.move_to_end(key)
+                _figure_cache_stats["hits"] += 1
+                return _figure_cache[key]
+            _figure_cache_stats["misses"] += 1
+        plot_div = func(*args, **kwargs)
+        with _figure_cache_lock:
+            _figure_cache[key] = plot_div
+            while len(_figure_cache) > PLOTLY_FIGURE_CACHE_SIZE:
+                _figure_cache.popitem(last=False)
+                _figure_cache_stats["evictions"] += 1
+        return plot_div
+
+    return wrapper
+
+
+@cached_figure
 def histogram_graphic(data, col_names, options):
 
     graph = px.bar(
@@ -31,11 +103,17 @@ def histogram_graphic(data, col_names, options):
         margin=dict(l=20, r=40, t=30, b=20),
     )
 
-    plot_div = plot(graph, output_type="div", config={"displaylogo": False})
+    plot_div = plot(
+        graph,
+        output_type="div",
+        include_plotlyjs=False,
+        config={"displaylogo": False},
+    )
 
     return plot_div
 
 
+@cached_figure
 def gauge_graphic(data):
     graph = go.Figure(
         go.Indicator(
@@ -48,11 +126,17 @@ def gauge_graphic(data):
         )
     )
     graph.update_layout(margin=dict(t=20, b=10, l=20, r=30))
-    plot_div = plot(graph, output_type="div", config={"displaylogo": False})
+    plot_div = plot(
+        graph,
+        output_type="div",
+        include_plotlyjs=False,
+        config={"displaylogo": False},
+    )
 
     return plot_div
 
 
+@cached_figure
 def bullet_graphic(value, title):
     point = str(value)
     top_value = int(value)
@@ -83,10 +167,11 @@ def bullet_graphic(value, title):
         ),
     )
     fig.update_layout(height=450, width=330)
-    plot_div = plot(fig, output_type="div")
+    plot_div = plot(fig, output_type="div", include_plotlyjs=False)
     return plot_div
 
 
+@cached_figure
 def pie_graphic(data, names, title, show_legend=False):
     colors = [
         "cyan",
@@ -112,7 +197,78 @@ def pie_graphic(data, names, title, show_legend=False):
     fig.update_layout(
         height=350, width=270, showlegend=show_legend, margin=dict(t=0, b=0, l=0, r=0)
     )
-    plot_div = plot(fig, output_type="div", config={"displaylogo": False})
+    plot_div = plot(
+        fig,
+        output_type="div",
+        include_plotlyjs=False,
+        config={"displaylogo": False},
+    )
+    return plot_div
+
+
+def get_histogram_box_values(histogram):
+    """Return the quartiles and the fences of the values given as a histogram
+    of value -> number of times, with the same linear interpolation that
+    plotly uses, without expanding the histogram into the list of values
+    """
+    values = np.array(sorted(histogram), dtype=float)
+    cum_counts = np.cumsum([histogram[value] for value in sorted(histogram)])
+    last = cum_counts[-1] - 1
+
+    def get_value(position):
+        return values[np.searchsorted(cum_counts, position, side="right")]
+
+    def get_quantile(quantile):
+        position = quantile * last
+        low = int(np.floor(position))
+        high = min(low + 1, last)
+        return get_value(low) + (get_value(high) - get_value(low)) * (position - low)
+
+    q1, median, q3 = [get_quantile(quantile) for quantile in (0.25, 0.5, 0.75)]
+    iqr = q3 - q1
+    return {
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "lowerfence": values[values >= q1 - 1.5 * iqr].min(),
+        "upperfence": values[values <= q3 + 1.5 * iqr].max(),
+    }
+
+
+@cached_figure
+def histogram_box_plot_graphic(data, options):
+    """Draw a box for each histogram in data, a dictionary of name ->
+    {value: number of times}. Boxes are drawn from the precomputed quartiles
+    """
+    fig = go.Figure()
+    for name, histogram in data.items():
+        if not histogram:
+            continue
+        box_values = get_histogram_box_values(histogram)
+        fig.add_trace(
+            go.Box(
+                name=name,
+                x=[name],
+                q1=[box_values["q1"]],
+                median=[box_values["median"]],
+                q3=[box_values["q3"]],
+                lowerfence=[box_values["lowerfence"]],
+                upperfence=[box_values["upperfence"]],
+            )
+        )
+    fig.update_layout(
+        title=options["title"],
+        height=options["height"],
+        width=options["width"],
+        showlegend=False,
+        margin=dict(l=20, r=20, t=40, b=20),
+    )
+    plot_div = plot(
+        fig,
+        output_type="div",
+        include_plotlyjs=False,
+        config={"displaylogo": False},
+    )
     return plot_div
 
 
@@ -132,6 +288,13 @@ def needle_plot(m_data):
         height=450,
     )
     """
+    # the app keeps the layout of the last call. Build it only when data change
+    key = get_figure_cache_key("needle_plot", [m_data], {})
+    with _figure_cache_lock:
+        if _needle_plot_key["key"] == key:
+            _figure_cache_stats["hits"] += 1
+            return
+        _figure_cache_stats["misses"] += 1
     app = DjangoDash("sampleVariantGraphic")
     # mdata["domains"] = m_data["domains"]
     # m_data["x"] = mdata["x"][48:72]
@@ -170,3 +333,6 @@ def needle_plot(m_data):
     )
     def update_needleplot(show_rangeslider):
         return True if show_rangeslider else False
+
+    with _figure_cache_lock:
+        _needle_plot_key["key"] = key
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+
+from relecov_core.core_config import (
+    METRICS_HISTOGRAM_BUCKETS,
+    METRICS_QUERY_COUNT_BUCKETS,
+    METRICS_ROLLING_WINDOW,
+)
+
+# Values recorded for the request handled by the current thread
+_request_data = threading.local()
+
+# {(view_name, metric): {"buckets": [..], "sum": x, "count": n, "window": deque}}
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+# metric name, help text and buckets used for each recorded value
+HISTOGRAM_METRICS = {
+    "wall_seconds": ["Time spent to create the response", METRICS_HISTOGRAM_BUCKETS],
+    "sql_seconds": ["Time spent in SQL queries", METRICS_HISTOGRAM_BUCKETS],
+    "sql_queries": ["Number of SQL queries", METRICS_QUERY_COUNT_BUCKETS],
+    "lims_seconds": ["Time spent in iSkyLIMS requests", METRICS_HISTOGRAM_BUCKETS],
+    "lims_requests": ["Number of iSkyLIMS requests", METRICS_QUERY_COUNT_BUCKETS],
+}
+
+
+def start_request_metrics():
+    _request_data.values = {
+        "sql_queries": 0,
+        "sql_seconds": 0.0,
+        "lims_requests": 0,
+        "lims_seconds": 0.0,
+    }
+    return
+
+
+def get_request_metrics():
+    """Return the values recorded for the current request or None when the
+    code does not run inside a request, e.g. management commands
+    """
+    return getattr(_request_data, "values", None)
+
+
+def end_request_metrics():
+    values = get_request_metrics()
+    _request_data.values = None
+    return values
+
+
+def sql_timer(execute, sql, params, many, context):
+    """Wrapper for connection.execute_wrapper to count the queries and the
+    time spent on them
+    """
+    values = get_request_metrics()
+    if values is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        values["sql_queries"] += 1
+        values["sql_seconds"] += time.perf_counter() - start
+
+
+def record_lims_request(duration):
+    values = get_request_metrics()
+    if values is not None:
+        values["lims_requests"] += 1
+        values["lims_seconds"] += duration
+    return
+
+
+def observe(view_name, metric, value):
+    """Add the value to the cumulative histogram and to the rolling window of
+    the view
+    """
+    buckets = HISTOGRAM_METRICS[metric][1]
+    with _histograms_lock:
+        if (view_name, metric) not in _histograms:
+            _histograms[(view_name, metric)] = {
+                "buckets": [0] * len(buckets),
+                "sum": 0.0,
+                "count": 0,
+                "window": deque(maxlen=METRICS_ROLLING_WINDOW),
+            }
+        histogram = _histograms[(view_name, metric)]
+        for idx, upper in enumerate(buckets):
+            if value <= upper:
+                histogram["buckets"][idx] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+        histogram["window"].append(value)
+    return
+
+
+def record_request(view_name, values, wall_time):
+    observe(view_name, "wall_seconds", wall_time)
+    for metric, value in values.items():
+        observe(view_name, metric, value)
+    return
+
+
+def get_server_timing(values, wall_time):
+    """Return the value of the Server-Timing header. Durations are in
+    milliseconds
+    """
+    return ", ".join(
+        [
+            'db;dur=%.1f;desc="%s queries"'
+            % (values["sql_seconds"] * 1000, values["sql_queries"]),
+            'lims;dur=%.1f;desc="%s requests"'
+            % (values["lims_seconds"] * 1000, values["lims_requests"]),
+            "total;dur=%.1f" % (wall_time * 1000),
+        ]
+    )
+
+
+def get_rolling_quantiles(view_name, metric, quantiles=(0.5, 0.9, 0.99)):
+    """Return the quantiles of the last values recorded for the view"""
+    with _histograms_lock:
+        if (view_name, metric) not in _histograms:
+            return {}
+        window = sorted(_histograms[(view_name, metric)]["window"])
+    if len(window) == 0:
+        return {}
+    return {q: window[min(int(q * len(window)), len(window) - 1)] for q in quantiles}
+
+
+def export_prometheus_metrics():
+    """Return the recorded metrics in Prometheus text exposition format.
+    Histograms are cumulative since the process started and the quantiles
+    are calculated over the rolling window
+    """
+    with _histograms_lock:
+        snapshot = {
+            key: {
+                "buckets": list(histogram["buckets"]),
+                "sum": histogram["sum"],
+                "count": histogram["count"],
+            }
+            for key, histogram in _histograms.items()
+        }
+    lines = []
+    for metric, (help_text, buckets) in HISTOGRAM_METRICS.items():
+        name = "relecov_request_%s" % metric
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s histogram" % name)
+        for (view_name, s_metric), histogram in sorted(snapshot.items()):
+            if s_metric != metric:
+                continue
+            for upper, count in zip(buckets, histogram["buckets"]):
+                lines.append(
+                    '%s_bucket{view="%s",le="%s"} %s' % (name, view_name, upper, count)
+                )
+            lines.append(
+                '%s_bucket{view="%s",le="+Inf"} %s'
+                % (name, view_name, histogram["count"])
+            )
+            lines.append('%s_sum{view="%s"} %s' % (name, view_name, histogram["sum"]))
+            lines.append(
+                '%s_count{view="%s"} %s' % (name, view_name, histogram["count"])
+            )
+        name = "relecov_request_%s_rolling" % metric
+        lines.append(
+            "# HELP %s %s in the last %s requests"
+            % (name, help_text, METRICS_ROLLING_WINDOW)
+        )
+        lines.append("# TYPE %s gauge" % name)
+        for view_name, s_metric in sorted(snapshot):
+            if s_metric != metric:
+                continue
+            for quantile, value in get_rolling_quantiles(view_name, metric).items():
+                lines.append(
+                    '%s{view="%s",quantile="%s"} %s'
+                    % (name, view_name, quantile, value)
+                )
+    return "\n".join(lines) + "\n"
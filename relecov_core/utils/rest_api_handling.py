@@ -1,5 +1,7 @@
 import json
+import time
 from relecov_tools.rest_api import RestApi
+from relecov_core.utils.request_metrics import record_lims_request
 from relecov_core.utils.generic_functions import get_configuration_value
 from relecov_core.core_config import (
     ISKLIMS_GET_LABORATORY_PARAMETERS,
@@ -17,6 +19,33 @@ from relecov_core.core_config import (
 )
 
 
+class InstrumentedRestApi(RestApi):
+    """RestApi that records the number and duration of the requests sent to
+    iSkyLIMS in the metrics of the current request
+    """
+
+    def get_request(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().get_request(*args, **kwargs)
+        finally:
+            record_lims_request(time.perf_counter() - start)
+
+    def put_request(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().put_request(*args, **kwargs)
+        finally:
+            record_lims_request(time.perf_counter() - start)
+
+    def post_request(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().post_request(*args, **kwargs)
+        finally:
+            record_lims_request(time.perf_counter() - start)
+
+
 def create_get_api_instance(request_param, data):
     """Crate api request to iSkyLIMS"""
     iskylims_server = get_configuration_value("ISKYLIMS_SERVER")
@@ -26,7 +55,7 @@ def create_get_api_instance(request_param, data):
         param = data
     else:
         request, param = request_param
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
     return r_api.get_request(request, param, data)
 
 
@@ -38,7 +67,7 @@ def fetch_samples_on_condition(request_param, filter_condition=None):
     iskylims_server = get_configuration_value("ISKYLIMS_SERVER")
     iskylims_url = ISKLIMS_REST_API
     request, param = ISKLIMS_FETCH_SAMPLES_ON_CONDITION
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
     data = r_api.get_request(request, param, request_param)
     if "ERROR" in data:
         return {"ERROR": data}
@@ -51,7 +80,7 @@ def get_laboratory_data(lab_name):
     iskylims_server = get_configuration_value("ISKYLIMS_SERVER")
     iskylims_url = ISKLIMS_REST_API
     request, param = ISKLIMS_GET_LABORATORY_PARAMETERS
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
     data = r_api.get_request(request, param, lab_name)
     if "ERROR" in data:
         return {"ERROR": data}
@@ -73,7 +102,7 @@ def set_laboratory_data(lab_data):
     iskylims_url = ISKLIMS_REST_API
 
     request = ISKLIMS_PUT_LABORATORY_PARAMETER
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
     credentials = get_user_credentials()
     data = r_api.put_request(lab_data, credentials, request)
     if "ERROR" in data:
@@ -86,7 +115,7 @@ def get_sample_fields_data():
     iskylims_server = get_configuration_value("ISKYLIMS_SERVER")
     iskylims_url = ISKLIMS_REST_API
     request = ISKLIMS_GET_SAMPLE_FIELDS
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
     data = r_api.get_request(request, "", "")
     if "ERROR" in data:
         return data
@@ -99,7 +128,7 @@ def get_sample_information(sample_name):
     iskylims_server = get_configuration_value("ISKYLIMS_SERVER")
     iskylims_url = ISKLIMS_REST_API
     request = ISKLIMS_GET_SAMPLE_INFORMATION
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
     """
     data = create_get_api_instance(ISKLIMS_GET_SAMPLE_INFORMATION, sample_name)
     # data = r_api.get_request(request, sample_name)
@@ -130,7 +159,7 @@ def get_sample_project_fields_data(project):
     iskylims_server = get_configuration_value("ISKYLIMS_SERVER")
     iskylims_url = ISKLIMS_REST_API
     request, param = ISKLIMS_GET_SAMPLE_PROJECT_FIELDS
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
     data = r_api.get_request(request, param, project)
     if "ERROR" in data:
         return {"ERROR": data}
@@ -142,7 +171,7 @@ def get_summarize_data(param_data):
     iskylims_server = get_configuration_value("ISKYLIMS_SERVER")
     iskylims_url = ISKLIMS_REST_API
     request = ISKLIMS_GET_SUMMARIZE_DATA
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
     data = r_api.get_request(request, param_data)
     if "ERROR" in data:
         return data
@@ -154,7 +183,7 @@ def get_stats_data(param_data):
     iskylims_server = get_configuration_value("ISKYLIMS_SERVER")
     iskylims_url = ISKLIMS_REST_API
     request = ISKLIMS_GET_STATS_DATA
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
     data = r_api.get_request(request, param_data)
     if "ERROR" in data:
         return data
@@ -166,7 +195,7 @@ def save_sample_form_data(post_data, credencials):
     iskylims_server = get_configuration_value("ISKYLIMS_SERVER")
     iskylims_url = ISKLIMS_REST_API
     request = ISKLIMS_POST_SAMPLE_DATA
-    r_api = RestApi(iskylims_server, iskylims_url)
+    r_api = InstrumentedRestApi(iskylims_server, iskylims_url)
 
     data = r_api.post_request(json.dumps(post_data), credencials, request)
     if "ERROR" in data:
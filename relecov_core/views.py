@@ -1,6 +1,8 @@
+import hmac
+
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import Group
 
 from relecov_core.utils.handling_samples import (
     analyze_input_samples,
@@ -18,7 +20,6 @@ from relecov_core.utils.handling_samples import (
     get_sample_per_date_per_all_lab,
     get_sample_per_date_per_lab,
     get_sample_pre_recorded,
-    get_sample_objs_per_lab,
     join_sample_and_batch,
     pending_samples_in_metadata_form,
     save_temp_sample_data,
@@ -47,11 +48,11 @@ from relecov_core.utils.handling_bioinfo_analysis import (
 from relecov_core.utils.handling_lab import (
     get_all_defined_labs,
     get_lab_contact_details,
-    get_lab_name_from_user,
     update_contact_lab,
 )
 from relecov_core.utils.handling_public_database import (
-    get_public_accession_from_sample_lab,
+    get_accession_list,
+    get_accession_stats,
     get_public_information_from_sample,
     percentage_graphic,
 )
@@ -61,6 +62,7 @@ from relecov_core.utils.handling_variant import (
 )
 from relecov_core.utils.generic_functions import (
     check_valid_date_format,
+    get_configuration_value,
     get_defined_users,
 )
 from relecov_core.utils.handling_annotation import (
@@ -71,8 +73,12 @@ from relecov_core.utils.handling_annotation import (
     get_annotation_data,
 )
 from relecov_core.utils.handling_lineage import get_lineage_data_from_sample
+from relecov_core.utils.request_metrics import export_prometheus_metrics
 
 from relecov_core.core_config import (
+    ACCESSION_LIST_MAX_PAGE_SIZE,
+    ACCESSION_LIST_PAGE_SIZE,
+    ERROR_METRICS_NOT_ALLOWED,
     ERROR_USER_IS_NOT_ASSIGNED_TO_LAB,
     ERROR_INVALID_DEFINED_SAMPLE_FORMAT,
     ERROR_NOT_MATCHED_ITEMS_IN_SEARCH,
@@ -107,7 +113,7 @@ def assign_samples_to_user(request):
 
 @login_required
 def sample_display(request, sample_id):
-    sample_data = get_sample_display_data(sample_id, request.user)
+    sample_data = get_sample_display_data(sample_id, request.auth_context)
     if "ERROR" in sample_data:
         return render(
             request, "relecov_core/sampleDisplay.html", {"ERROR": sample_data["ERROR"]}
@@ -169,7 +175,7 @@ def schema_display(request, schema_id):
 @login_required
 def search_sample(request):
     """Search sample using the filter in the form"""
-    search_data = get_search_data(request.user)
+    search_data = get_search_data(request.auth_context)
     if request.method == "POST" and request.POST["action"] == "searchSample":
         sample_name = request.POST["sampleName"]
         s_date = request.POST["sDate"]
@@ -191,7 +197,7 @@ def search_sample(request):
                 },
             )
         sample_list = search_samples(
-            sample_name, lab_name, sample_state, s_date, request.user
+            sample_name, lab_name, sample_state, s_date, request.auth_context
         )
         if len(sample_list) == 0:
             return render(
@@ -267,13 +273,11 @@ def metadata_visualization(request):
 
 @login_required
 def intranet(request):
-    relecov_group = Group.objects.get(name="RelecovManager")
-    if relecov_group not in request.user.groups.all():
+    if not request.auth_context.is_manager:
         intra_data = {}
-        lab_name = get_lab_name_from_user(request.user)
+        lab_name = request.auth_context.get_lab_name()
         date_lab_samples = get_sample_per_date_per_lab(lab_name)
         if len(date_lab_samples) > 0:
-            sample_lab_objs = get_sample_objs_per_lab(lab_name)
             analysis_percent = get_bio_analysis_stats_from_lab(lab_name)
             cust_data = {
                 "col_names": ["Sequencing Date", "Number of samples"],
@@ -288,28 +292,21 @@ def intranet(request):
                 analysis_percent
             )
             intra_data["actions"] = get_lab_last_actions(lab_name)
-            gisaid_acc = get_public_accession_from_sample_lab(
-                "gisaid_accession_id", sample_lab_objs
-            )
-            if len(gisaid_acc) > 0:
-                intra_data["gisaid_accession"] = gisaid_acc
+            # the accession lists are fetched from accession_list view
+            acc_stats = get_accession_stats(request.auth_context)["total"]
+            intra_data["accession_stats"] = acc_stats
             intra_data["gisaid_graph"] = percentage_graphic(
-                len(sample_lab_objs), len(gisaid_acc), ""
+                acc_stats["samples"], acc_stats["gisaid"], ""
             )
-            ena_acc = get_public_accession_from_sample_lab(
-                "ena_sample_accession", sample_lab_objs
-            )
-            if len(ena_acc) > 0:
-                intra_data["ena_accession"] = ena_acc
+            if acc_stats["ena"] > 0:
                 intra_data["ena_graph"] = percentage_graphic(
-                    len(sample_lab_objs), len(ena_acc), ""
+                    acc_stats["samples"], acc_stats["ena"], ""
                 )
         return render(request, "relecov_core/intranet.html", {"intra_data": intra_data})
     else:
         # loged user belongs to Relecov Manager group
         manager_intra_data = {}
         all_sample_per_date = get_sample_per_date_per_all_lab()
-        num_of_samples = count_handled_samples()
         if len(all_sample_per_date) > 0:
             cust_data = {
                 "col_names": ["Sequencing Date", "Number of samples"],
@@ -329,22 +326,15 @@ def intranet(request):
             create_dash_bar_for_each_lab()
             # Get the latest action from each lab
             manager_intra_data["actions"] = get_lab_last_actions()
-            # Collect GISAID information
-            gisaid_acc = get_public_accession_from_sample_lab(
-                "gisaid_accession_id", None
-            )
-            if len(gisaid_acc) > 0:
-                manager_intra_data["gisaid_accession"] = gisaid_acc
-                manager_intra_data["gisaid_graph"] = percentage_graphic(
-                    num_of_samples["Defined"], len(gisaid_acc), ""
-                )
-            # Collect Ena information
-            ena_acc = get_public_accession_from_sample_lab("ena_sample_accession", None)
-            if len(ena_acc) > 0:
-                manager_intra_data["ena_accession"] = ena_acc
-                manager_intra_data["ena_graph"] = percentage_graphic(
-                    num_of_samples["Defined"], len(ena_acc), ""
-                )
+            # Collect GISAID and ENA counts per lab. The accession lists are
+            # fetched from accession_list view
+            acc_stats = get_accession_stats(request.auth_context)
+            manager_intra_data["accession_stats"] = acc_stats
+            for p_type in ["gisaid", "ena"]:
+                if acc_stats["total"][p_type] > 0:
+                    manager_intra_data[p_type + "_graph"] = percentage_graphic(
+                        acc_stats["total"]["samples"], acc_stats["total"][p_type], ""
+                    )
         # import pdb; pdb.set_trace()
         return render(
             request,
@@ -353,6 +343,29 @@ def intranet(request):
         )
 
 
+@login_required
+def accession_list(request, database_type):
+    """Page of the accessions uploaded to the public database, in json, for
+    the samples that the user is allowed to see
+    """
+    try:
+        page = int(request.GET.get("page", 1))
+        page_size = int(request.GET.get("page_size", ACCESSION_LIST_PAGE_SIZE))
+    except ValueError:
+        page, page_size = 1, ACCESSION_LIST_PAGE_SIZE
+    page_size = min(max(page_size, 1), ACCESSION_LIST_MAX_PAGE_SIZE)
+    accessions = get_accession_list(
+        request.auth_context,
+        database_type,
+        page,
+        page_size,
+        request.GET.get("lab"),
+    )
+    if "ERROR" in accessions:
+        return JsonResponse(accessions, status=404)
+    return JsonResponse(accessions)
+
+
 def variants(request):
     return render(request, "relecov_core/variants.html", {})
 
@@ -500,3 +513,21 @@ def laboratory_contact(request):
 
 def contact(request):
     return render(request, "relecov_core/contact.html", {})
+
+
+def metrics(request):
+    """Request metrics in Prometheus format. Available for superusers or when
+    the request has the token defined in METRICS_TOKEN configuration setting
+    """
+    if not request.user.is_superuser:
+        token = get_configuration_value("METRICS_TOKEN")
+        auth_header = request.META.get("HTTP_AUTHORIZATION", "")
+        if (
+            token == "False"
+            or not auth_header.startswith("Bearer ")
+            or not hmac.compare_digest(auth_header[7:], token)
+        ):
+            return HttpResponseForbidden(ERROR_METRICS_NOT_ALLOWED)
+    return HttpResponse(
+        export_prometheus_metrics(), content_type="text/plain; version=0.0.4"
+    )
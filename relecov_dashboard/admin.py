@@ -5,6 +5,8 @@ from relecov_dashboard.models import (
     GraphicField,
     GraphicValue,
     GraphicJsonFile,
+    PreProcessJob,
+    PreProcessLock,
 )
 
 
@@ -22,10 +24,23 @@ class GraphicValueAdmin(admin.ModelAdmin):
 
 
 class GraphicJsonFileAdmin(admin.ModelAdmin):
-    list_display = ["graphic_name"]
+    list_display = ["graphic_name", "version", "is_current", "creation_date"]
+    list_filter = ["is_current"]
+    exclude = ["compressed_data"]
+
+
+class PreProcessJobAdmin(admin.ModelAdmin):
+    list_display = ["graphic_name", "state", "reason", "duration", "scheduled_at"]
+    list_filter = ["state"]
+
+
+class PreProcessLockAdmin(admin.ModelAdmin):
+    list_display = ["graphic_name", "job", "locked_at"]
 
 
 admin.site.register(GraphicName, GraphicNameAdmin)
 admin.site.register(GraphicField, GraphicFieldAdmin)
 admin.site.register(GraphicValue, GraphicValueAdmin)
 admin.site.register(GraphicJsonFile, GraphicJsonFileAdmin)
+admin.site.register(PreProcessJob, PreProcessJobAdmin)
+admin.site.register(PreProcessLock, PreProcessLockAdmin)
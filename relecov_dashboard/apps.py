@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class RelecovDashboardConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "relecov_dashboard"
+
+    def ready(self):
+        from relecov_core.signals import ingestion_completed
+        from relecov_dashboard.utils.pre_processing_jobs import (
+            schedule_pre_processing_after_ingestion,
+        )
+
+        ingestion_completed.connect(
+            schedule_pre_processing_after_ingestion,
+            dispatch_uid="relecov_dashboard_pre_processing",
+        )
@@ -1,3 +1,23 @@
+# Pre-processed graphic data storage
+GRAPHIC_JSON_COMPRESSION = "zlib"
+# Number of versions kept for each graphic, including the current one
+GRAPHIC_JSON_RETENTION = 3
+# Number of decoded graphics kept in memory by each process
+GRAPHIC_JSON_CACHE_SIZE = 20
+# Number of lineage prevalence results kept in memory by each process
+LINEAGE_PREVALENCE_CACHE_SIZE = 20
+# Minimum fraction of the values of a bioinfo field that must be numbers to
+# store the field as a numeric column in the bioinfo analysis snapshot
+BIOINFO_SNAPSHOT_NUMERIC_RATIO = 0.5
+# Days of the sliding window used in the lineages dashboard
+LINEAGE_PREVALENCE_WINDOW_SIZE = 14
+
+# Cache of rendered dashboard pages
+DASHBOARD_CACHE_PREFIX = "dashboard"
+DASHBOARD_CACHE_TIMEOUT = 86400
+# Seconds that dashboards built with LIMS data are considered up to date
+DASHBOARD_LIMS_DATA_INTERVAL = 900
+
 ERROR_NO_LINEAGES_ARE_DEFINED_YET = "There is no lineage defined yet"
 HOST_RANGE_AGE_TEXT = [
     "0 to 10",
@@ -14,3 +34,35 @@ HOST_RANGE_AGE_TEXT = [
     "111 to 120",
     "121 to 130",
 ]
+
+ERROR_PRE_PROCESSING_NOT_DEFINED = "pre-processing not defined"
+ERROR_PRE_PROCESSING_WORKER_STOPPED = "worker stopped while running the job"
+ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE = (
+    "Data for this graphic are being processed. Please try again later"
+)
+
+# Pre-processing jobs
+# Seconds after a lock row is considered stale (worker died while running)
+PRE_PROCESSING_LOCK_TIMEOUT = 3600
+# Seconds between polling the job queue and between periodic full scheduling
+PRE_PROCESSING_POLL_INTERVAL = 10
+PRE_PROCESSING_PERIODIC_INTERVAL = 86400
+# Graphics that must be recalculated after each kind of data ingestion
+PRE_PROCESSING_ON_INGESTION = {
+    "sample": ["calculation_date"],
+    "bioinfo": [
+        "bioinfo_analysis_snapshot",
+        "calculation_date",
+        "lineages_variations",
+        "variations_per_lineage",
+    ],
+    "variant": ["variations_per_lineage"],
+}
+# Graphics calculated from other pre-processed data, queued when it changes
+PRE_PROCESSING_DEPENDENTS = {
+    "bioinfo_analysis_snapshot": [
+        "ct_number_of_base_pairs_sequenced",
+        "depth_variant_consensus",
+        "depth_samples_in_run",
+    ],
+}
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from relecov_dashboard.dashboard_config import (
+    PRE_PROCESSING_PERIODIC_INTERVAL,
+    PRE_PROCESSING_POLL_INTERVAL,
+)
+from relecov_dashboard.utils.pre_processing_jobs import (
+    run_pending_pre_processing_jobs,
+    schedule_all_pre_processing,
+)
+
+
+class Command(BaseCommand):
+    help = "Run the queued pre-processing jobs used by the dashboard graphics"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the queued jobs and exit instead of waiting for new ones",
+        )
+        parser.add_argument(
+            "--schedule-all",
+            action="store_true",
+            help="Queue a job for every pre-processed graphic before starting",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=int,
+            default=PRE_PROCESSING_POLL_INTERVAL,
+            help="Seconds to wait between checks of the job queue",
+        )
+        parser.add_argument(
+            "--periodic-interval",
+            type=int,
+            default=PRE_PROCESSING_PERIODIC_INTERVAL,
+            help="Seconds between periodic scheduling of all graphics. 0 disables it",
+        )
+
+    def handle(self, *args, **options):
+        if options["schedule_all"]:
+            schedule_all_pre_processing()
+        if options["once"]:
+            executed = run_pending_pre_processing_jobs()
+            self.stdout.write("Executed %s pre-processing jobs" % executed)
+            return
+
+        last_periodic = time.monotonic()
+        while True:
+            if (
+                options["periodic_interval"] > 0
+                and time.monotonic() - last_periodic >= options["periodic_interval"]
+            ):
+                schedule_all_pre_processing()
+                last_periodic = time.monotonic()
+            executed = run_pending_pre_processing_jobs()
+            if executed > 0:
+                self.stdout.write("Executed %s pre-processing jobs" % executed)
+            time.sleep(options["poll_interval"])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from relecov_dashboard.models import GraphicJsonFile
+
+
+class Command(BaseCommand):
+    help = (
+        "Number the graphic json rows stored before versioning was "
+        "introduced, by creation order for each graphic, and set the newest "
+        "one as the current version"
+    )
+
+    def handle(self, *args, **options):
+        graphic_names = (
+            GraphicJsonFile.objects.filter(version=None)
+            .values_list("graphic_name", flat=True)
+            .distinct()
+        )
+        for graphic_name in sorted(set(graphic_names)):
+            with transaction.atomic():
+                graphic_objs = GraphicJsonFile.objects.select_for_update().filter(
+                    graphic_name__exact=graphic_name
+                )
+                pks = list(graphic_objs.order_by("pk").values_list("pk", flat=True))
+                # versioned rows are cleared first, so that renumbering does
+                # not collide in the unique index
+                graphic_objs.update(version=None, is_current=False)
+                for version, pk in enumerate(pks, start=1):
+                    GraphicJsonFile.objects.filter(pk=pk).update(version=version)
+                GraphicJsonFile.objects.filter(pk=pks[-1]).update(is_current=True)
+            self.stdout.write("%s: %s versions" % (graphic_name, len(pks)))
@@ -1,4 +1,12 @@
-from django.db import models
+import json
+import zlib
+
+from django.db import models, transaction
+
+from relecov_dashboard.dashboard_config import (
+    GRAPHIC_JSON_COMPRESSION,
+    GRAPHIC_JSON_RETENTION,
+)
 
 
 class GraphicNameManager(models.Manager):
@@ -73,23 +81,132 @@ class GraphicValue(models.Model):
 
 class GraphicJsonFileManager(models.Manager):
     def create_new_graphic_json(self, data):
-        return self.create(
-            graphic_name=data["graphic_name"], graphic_data=data["graphic_data"]
-        )
+        """Store a new version of the graphic data and set it as the current
+        one. Versions older than the retention limit are deleted
+        """
+        json_str = json.dumps(data["graphic_data"])
+        with transaction.atomic():
+            # lock the existing versions while the new one is created
+            versions = sorted(
+                self.select_for_update()
+                .filter(graphic_name__exact=data["graphic_name"])
+                .exclude(version=None)
+                .values_list("version", flat=True),
+                reverse=True,
+            )
+            self.filter(
+                graphic_name__exact=data["graphic_name"], is_current=True
+            ).update(is_current=False)
+            new_graphic_obj = self.create(
+                graphic_name=data["graphic_name"],
+                version=versions[0] + 1 if versions else 1,
+                is_current=True,
+                compression=GRAPHIC_JSON_COMPRESSION,
+                compressed_data=zlib.compress(json_str.encode("utf-8")),
+                data_size=len(json_str),
+            )
+            # the new version is not in the list, so keep one less
+            if len(versions) >= GRAPHIC_JSON_RETENTION:
+                self.filter(
+                    graphic_name__exact=data["graphic_name"],
+                    version__in=versions[GRAPHIC_JSON_RETENTION - 1 :],
+                ).delete()
+        return new_graphic_obj
 
 
 class GraphicJsonFile(models.Model):
-    graphic_name = models.CharField(max_length=60)
-    graphic_data = models.JSONField()
+    graphic_name = models.CharField(max_length=60, db_index=True)
+    # null for rows created before versioning, until set_graphic_json_versions
+    # command numbers them. Null values do not conflict in the unique index
+    version = models.PositiveIntegerField(null=True, blank=True)
+    is_current = models.BooleanField(default=False)
+    compression = models.CharField(max_length=10, null=True, blank=True)
+    compressed_data = models.BinaryField(null=True, blank=True)
+    data_size = models.PositiveIntegerField(null=True, blank=True)
+    # uncompressed data from rows created before versioning was introduced
+    graphic_data = models.JSONField(null=True, blank=True)
     creation_date = models.DateTimeField(auto_now=True, null=True, blank=True)
 
     class Meta:
         db_table = "GraphicJsonFile"
+        unique_together = ("graphic_name", "version")
+        index_together = ("graphic_name", "is_current")
 
     def __str__(self):
-        return "%s" % (self.graphic_name)
+        return "%s_%s" % (self.graphic_name, self.version)
+
+    def get_version(self):
+        return self.version
+
+    def get_payload_size(self):
+        if self.compressed_data is None:
+            return 0
+        return len(self.compressed_data)
 
     def get_json_data(self):
-        return self.graphic_data
+        if self.compressed_data is None:
+            return self.graphic_data
+        return json.loads(zlib.decompress(bytes(self.compressed_data)))
 
     objects = GraphicJsonFileManager()
+
+
+class PreProcessJobManager(models.Manager):
+    def create_new_job(self, data):
+        return self.create(
+            graphic_name=data["graphic_name"],
+            reason=data["reason"],
+            state="queued",
+        )
+
+
+class PreProcessJob(models.Model):
+    graphic_name = models.CharField(max_length=60, db_index=True)
+    state = models.CharField(max_length=20, db_index=True)
+    reason = models.CharField(max_length=40, null=True, blank=True)
+    outcome = models.CharField(max_length=255, null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    scheduled_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "PreProcessJob"
+
+    def __str__(self):
+        return "%s_%s" % (self.graphic_name, self.state)
+
+    def get_graphic_name(self):
+        return "%s" % (self.graphic_name)
+
+    def get_state(self):
+        return "%s" % (self.state)
+
+    def get_job_info(self):
+        data = []
+        data.append(self.pk)
+        data.append(self.graphic_name)
+        data.append(self.state)
+        data.append(self.duration)
+        data.append(self.outcome)
+        return data
+
+    objects = PreProcessJobManager()
+
+
+class PreProcessLock(models.Model):
+    """One row per graphic_name while a pre-processing job is running. The
+    unique constraint prevents two workers to compute the same graphic
+    """
+
+    graphic_name = models.CharField(max_length=60, unique=True)
+    job = models.ForeignKey(
+        PreProcessJob, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    locked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "PreProcessLock"
+
+    def __str__(self):
+        return "%s" % (self.graphic_name)
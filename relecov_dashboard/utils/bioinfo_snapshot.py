@@ -0,0 +1,104 @@
+import threading
+
+import pandas as pd
+
+from relecov_core.models import BioinfoAnalysisValue
+from relecov_dashboard.dashboard_config import BIOINFO_SNAPSHOT_NUMERIC_RATIO
+from relecov_dashboard.models import GraphicJsonFile
+from relecov_dashboard.utils.generic_functions import get_graphic_json_data
+
+# dataframe of the current snapshot version, kept per process.
+# {"version": version, "df": dataframe}
+_snapshot_cache = {}
+_snapshot_cache_lock = threading.Lock()
+
+
+def build_bioinfo_snapshot():
+    """Pivot the bioinfo analysis values into a wide table with one row per
+    (sample, analysis_date) and one column per bioinfo field. The values are
+    fetched in a single query. Fields where most of the values are numbers
+    are converted to numbers, with null for the values that are not numbers.
+    Return the data by column and the list of numeric columns
+    """
+    values = pd.DataFrame(
+        BioinfoAnalysisValue.objects.exclude(
+            bioinfo_analysis_fieldID__property_name__exact="analysis_date"
+        )
+        .filter(sample__collecting_lab_sample_id__isnull=False)
+        .order_by("pk")
+        .values_list(
+            "sample__collecting_lab_sample_id",
+            "analysis_date",
+            "bioinfo_analysis_fieldID__property_name",
+            "value",
+        ),
+        columns=["sample", "analysis_date", "field", "value"],
+    )
+    if values.empty:
+        return {"columns": {"sample": [], "analysis_date": []}, "numeric": []}
+    values["analysis_date"] = values["analysis_date"].fillna("")
+    # the last stored value is kept if a field is repeated in the analysis
+    wide = values.pivot_table(
+        index=["sample", "analysis_date"],
+        columns="field",
+        values="value",
+        aggfunc="last",
+    ).reset_index()
+    numeric = []
+    for field in wide.columns[2:]:
+        given = wide[field].notna() & (wide[field] != "")
+        parsed = pd.to_numeric(wide[field], errors="coerce")
+        if given.sum() > 0 and parsed.notna().sum() >= (
+            given.sum() * BIOINFO_SNAPSHOT_NUMERIC_RATIO
+        ):
+            wide[field] = parsed
+            numeric.append(field)
+    wide = wide.astype(object).where(wide.notna(), None)
+    return {
+        "columns": {column: wide[column].tolist() for column in wide.columns},
+        "numeric": numeric,
+    }
+
+
+def get_bioinfo_snapshot():
+    """Return the pre-processed bioinfo snapshot as a dataframe, or None if
+    it was not created yet. The dataframe is kept in memory while the
+    snapshot version does not change, so it must not be modified by the
+    caller
+    """
+    version = (
+        GraphicJsonFile.objects.filter(
+            graphic_name__exact="bioinfo_analysis_snapshot", is_current=True
+        )
+        .values_list("version", flat=True)
+        .first()
+    )
+    if version is None:
+        return None
+    with _snapshot_cache_lock:
+        if _snapshot_cache.get("version") == version:
+            return _snapshot_cache["df"]
+    json_data = get_graphic_json_data("bioinfo_analysis_snapshot")
+    if json_data is None:
+        return None
+    df = pd.DataFrame(json_data["columns"])
+    for field in json_data["numeric"]:
+        df[field] = pd.to_numeric(df[field], errors="coerce")
+    with _snapshot_cache_lock:
+        _snapshot_cache["version"] = version
+        _snapshot_cache["df"] = df
+    return df
+
+
+def get_sample_values(df, field):
+    """Return the value of the field in the latest analysis of each sample
+    where it is defined, indexed by sample name
+    """
+    if field not in df.columns:
+        return pd.Series(dtype="float64", name=field)
+    values = df[["sample", "analysis_date", field]].dropna(subset=[field])
+    return (
+        values.sort_values("analysis_date")
+        .drop_duplicates(subset="sample", keep="last")
+        .set_index("sample")[field]
+    )
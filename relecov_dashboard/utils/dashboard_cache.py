@@ -0,0 +1,110 @@
+import hashlib
+import time
+from datetime import datetime
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from relecov_core.models import Sample, VariantInSample
+from relecov_dashboard.models import GraphicJsonFile
+from relecov_dashboard.dashboard_config import (
+    DASHBOARD_CACHE_PREFIX,
+    DASHBOARD_CACHE_TIMEOUT,
+    DASHBOARD_LIMS_DATA_INTERVAL,
+)
+
+
+def get_dashboard_data_version(request, graphic_names, models, lims_data):
+    """Build a cheap string that changes whenever the data shown by the
+    dashboard changes. It contains the current version of the pre-processed
+    graphics, the max pk of the given models and, for the dashboards which
+    fetch data from LIMS, a time slot. The result is kept in the request
+    because it is requested more than once per response
+    """
+    if hasattr(request, "_dashboard_data_version"):
+        return request._dashboard_data_version
+    version = []
+    if graphic_names:
+        version += sorted(
+            GraphicJsonFile.objects.filter(
+                graphic_name__in=graphic_names, is_current=True
+            ).values_list("graphic_name", "version")
+        )
+    for model in models:
+        version.append((model.__name__, model.objects.aggregate(Max("pk"))["pk__max"]))
+    if lims_data:
+        version.append(("lims", int(time.time() // DASHBOARD_LIMS_DATA_INTERVAL)))
+    # rendered page includes the user menu
+    if request.user.is_authenticated:
+        version.append(("user", request.user.pk))
+    request._dashboard_data_version = hashlib.md5(
+        str(version).encode("utf-8")
+    ).hexdigest()
+    return request._dashboard_data_version
+
+
+def cache_dashboard(
+    graphic_names=None, models=(Sample, VariantInSample), lims_data=False
+):
+    """Decorator for dashboard views which render plotly graphics.
+    The rendered page is stored in the django cache for the data version
+    returned by get_dashboard_data_version. ETag and Last-Modified headers
+    are set so that browsers can send conditional requests, which are
+    answered with 304 while data does not change.
+    Do not use it in views that create DjangoDash applications, because
+    they are registered when the view is executed.
+    """
+
+    def decorator(view_func):
+        def get_cache_key(request):
+            return "%s_%s_%s" % (
+                DASHBOARD_CACHE_PREFIX,
+                view_func.__name__,
+                get_dashboard_data_version(request, graphic_names, models, lims_data),
+            )
+
+        def get_etag(request, *args, **kwargs):
+            return get_dashboard_data_version(request, graphic_names, models, lims_data)
+
+        def get_last_modified(request, *args, **kwargs):
+            cached = cache.get(get_cache_key(request))
+            if cached is None:
+                return None
+            return cached["last_modified"]
+
+        @wraps(view_func)
+        def cached_view(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+            cache_key = get_cache_key(request)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                response = HttpResponse(
+                    cached["content"], content_type=cached["content_type"]
+                )
+            else:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(
+                        cache_key,
+                        {
+                            "content": response.content,
+                            "content_type": response["Content-Type"],
+                            "last_modified": datetime.utcnow().replace(microsecond=0),
+                        },
+                        DASHBOARD_CACHE_TIMEOUT,
+                    )
+            patch_vary_headers(response, ("Cookie",))
+            return response
+
+        return wraps(view_func)(
+            condition(etag_func=get_etag, last_modified_func=get_last_modified)(
+                cached_view
+            )
+        )
+
+    return decorator
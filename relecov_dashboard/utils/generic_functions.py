@@ -1,4 +1,13 @@
+import threading
+from collections import OrderedDict
+
 from relecov_dashboard.models import GraphicJsonFile
+from relecov_dashboard.dashboard_config import GRAPHIC_JSON_CACHE_SIZE
+
+# decoded data of the current version of each graphic, kept per process.
+# {graphic_name: (version, data)}
+_graphic_json_cache = OrderedDict()
+_graphic_json_cache_lock = threading.Lock()
 
 """
 def get_graphic_in_data_frame(graphic_name):
@@ -23,11 +32,32 @@ def get_graphic_in_data_frame(graphic_name):
 
 
 def get_graphic_json_data(graphic_name):
-    """ """
-    if GraphicJsonFile.objects.filter(graphic_name__exact=graphic_name).exists():
-        return (
-            GraphicJsonFile.objects.filter(graphic_name__exact=graphic_name)
-            .last()
-            .get_json_data()
+    """Return the decoded data of the current version of the graphic, or None
+    if it was not created yet. The decoded object is kept in memory while
+    the version does not change, so it must not be modified by the caller
+    """
+    current = (
+        GraphicJsonFile.objects.filter(
+            graphic_name__exact=graphic_name, is_current=True
         )
-    return None
+        .values_list("pk", "version")
+        .first()
+    )
+    if current is None:
+        return None
+    with _graphic_json_cache_lock:
+        cached = _graphic_json_cache.get(graphic_name)
+        if cached is not None and cached[0] == current[1]:
+            _graphic_json_cache.move_to_end(graphic_name)
+            return cached[1]
+    graphic_json_obj = GraphicJsonFile.objects.filter(pk=current[0]).last()
+    if graphic_json_obj is None:
+        # replaced by a newer version while reading
+        return get_graphic_json_data(graphic_name)
+    json_data = graphic_json_obj.get_json_data()
+    with _graphic_json_cache_lock:
+        _graphic_json_cache[graphic_name] = (current[1], json_data)
+        _graphic_json_cache.move_to_end(graphic_name)
+        while len(_graphic_json_cache) > GRAPHIC_JSON_CACHE_SIZE:
+            _graphic_json_cache.popitem(last=False)
+    return json_data
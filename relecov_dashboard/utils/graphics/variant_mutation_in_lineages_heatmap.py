@@ -9,6 +9,7 @@ Mutation heatmap
     - Color represents allele frequency
 
 """
+
 from django_plotly_dash import DjangoDash
 from dash.dependencies import Input, Output
 from dash import dcc, html
@@ -45,13 +46,13 @@ def create_data_for_dataframe(sample_list, gene_list):
         if sample_obj is not None:
             variant_in_sample_objs = VariantInSample.objects.filter(
                 sampleID_id=sample_obj
-            )
+            ).select_related("variantID_id")
             for variant_in_sample_obj in variant_in_sample_objs:
                 variant_annotation_obj = VariantAnnotation.objects.filter(
                     variantID_id=variant_in_sample_obj.get_variantID_id()
                 ).last()
                 if variant_annotation_obj.get_geneID_id() in gene_list:
-                    hgvs_p = variant_annotation_obj.get_variant_in_sample_data()[1]
+                    hgvs_p = variant_annotation_obj.get_variant_annot_data()[1]
                     list_of_hgvs_p.append(hgvs_p)
 
                     geneID_id = variant_annotation_obj.get_geneID_id()
@@ -64,7 +65,7 @@ def create_data_for_dataframe(sample_list, gene_list):
                     effect_list.append(effect_obj.get_effect())
                     sample_list_df.append(sample_name)
                     lineage_list.append("B.1.1.7")
-                    af_list.append(variant_in_sample_obj.get_af())
+                    af_list.append(variant_in_sample_obj.af)
                     pos_list.append(variant_in_sample_obj.get_variant_pos())
 
     df["SAMPLE"] = sample_list_df
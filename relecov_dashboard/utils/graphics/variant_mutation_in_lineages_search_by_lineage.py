@@ -5,9 +5,7 @@ import dash_bio as dashbio
 
 from relecov_dashboard.utils.generic_functions import get_graphic_json_data
 
-from relecov_dashboard.utils.pre_processing_data import (
-    pre_proc_variations_per_lineage,
-)
+from relecov_dashboard.utils.pre_processing_jobs import schedule_pre_processing
 
 from relecov_core.models import (
     LineageValues,
@@ -19,12 +17,9 @@ def get_variant_data_from_lineages(graphic_name=None, lineage=None, chromosome=N
     json_data = get_graphic_json_data(graphic_name)
 
     if json_data is None:
-        # Execute the pre-processed task to get the data
-        result = pre_proc_variations_per_lineage(chromosome)
-        if "ERROR" in result:
-            return result
-
-    json_data = get_graphic_json_data(graphic_name)
+        # data is created in background by the pre-processing worker
+        schedule_pre_processing(graphic_name, "missing_data")
+        return None, None
 
     #    if not LineageValues.objects.filter(
     #        lineage_fieldID__property_name__iexact="lineage_name"
@@ -40,6 +35,8 @@ def get_variant_data_from_lineages(graphic_name=None, lineage=None, chromosome=N
             .first()
         )
 
+    if lineage not in json_data:
+        return None, lineage
     mdata = json_data[lineage]
 
     return mdata, lineage
@@ -5,6 +5,7 @@ Mutation table under needle plot
 - Clean or filter dataframe
 - Generate auxiliar table to needle plot
 """
+
 import pandas as pd
 
 from dash.dependencies import Input, Output
@@ -41,7 +42,7 @@ def create_data_for_dataframe(sample_list, effect_list):
         if sample_obj is not None:
             variant_in_sample_objs = VariantInSample.objects.filter(
                 sampleID_id=sample_obj
-            )
+            ).select_related("variantID_id")
 
             for variant_in_sample_obj in variant_in_sample_objs:
                 variant_annotation_obj = VariantAnnotation.objects.filter(
@@ -51,7 +52,7 @@ def create_data_for_dataframe(sample_list, effect_list):
                     effect__iexact=variant_annotation_obj.get_effectID_id()
                 ).last()
                 if effect_obj.get_effect() in effect_list:
-                    hgvs_p = variant_annotation_obj.get_variant_in_sample_data()[1]
+                    hgvs_p = variant_annotation_obj.get_variant_annot_data()[1]
                     list_of_hgvs_p.append(hgvs_p)
 
                     geneID_id = variant_annotation_obj.get_geneID_id()
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from relecov_dashboard.models import GraphicJsonFile
+from relecov_dashboard.dashboard_config import LINEAGE_PREVALENCE_CACHE_SIZE
+from relecov_dashboard.utils.generic_functions import get_graphic_json_data
+
+# prevalence computed for each (graphic version, window size, start date,
+# end date), kept per process
+_prevalence_cache = OrderedDict()
+_prevalence_cache_lock = threading.Lock()
+
+
+def get_lineage_count_matrix(lineage_data):
+    """Pivot the pre-processed (collection date, lineage, samples) values into
+    a matrix with one row per day and one column per lineage. Days without
+    samples are included with 0 counts. Lineages are sorted by their total
+    number of samples in decreasing order
+    """
+    df = pd.DataFrame(
+        {
+            "date": pd.to_datetime(
+                lineage_data["Collection date"], format="%Y-%m-%d", errors="coerce"
+            ),
+            "lineage": lineage_data["Lineage"],
+            "samples": lineage_data["samples"],
+        }
+    ).dropna(subset=["date"])
+    if df.empty:
+        return pd.DataFrame(dtype="int64")
+    matrix = df.pivot_table(
+        index="date",
+        columns="lineage",
+        values="samples",
+        aggfunc="sum",
+        fill_value=0,
+    )
+    matrix = matrix.reindex(
+        pd.date_range(matrix.index.min(), matrix.index.max()), fill_value=0
+    )
+    return matrix[matrix.sum().sort_values(ascending=False).index]
+
+
+def calculate_lineage_prevalence(matrix, window_size, start_date=None, end_date=None):
+    """Count the samples of each lineage in a sliding window of window_size
+    days ending on each day, and the relative percentage of each lineage in
+    the window. Days which do not have a full window of data before them
+    are discarded.
+    Return a dictionary with the counts and percentages matrices and the
+    number of samples of each window
+    """
+    if matrix.empty:
+        return {"counts": matrix, "percentages": matrix, "nsamples": pd.Series()}
+    start_date = pd.Timestamp(start_date) if start_date else matrix.index.min()
+    end_date = pd.Timestamp(end_date) if end_date else matrix.index.max()
+    # include the days before the start date needed by the first window
+    days = pd.date_range(
+        max(matrix.index.min(), start_date - pd.Timedelta(days=window_size - 1)),
+        max(matrix.index.max(), end_date),
+    )
+    counts = (
+        matrix.reindex(days, fill_value=0)
+        .rolling(window_size, min_periods=window_size)
+        .sum()
+        .dropna()
+    )
+    counts = counts.loc[start_date:end_date].astype("int64")
+    nsamples = counts.sum(axis=1)
+    percentages = (
+        counts.div(nsamples.where(nsamples > 0), axis=0).fillna(0).mul(100).round(2)
+    )
+    return {"counts": counts, "percentages": percentages, "nsamples": nsamples}
+
+
+def get_lineage_prevalence(window_size, start_date=None, end_date=None):
+    """Return the lineage prevalence for the window size and date range,
+    calculated from the pre-processed lineages_variations graphic. None is
+    returned if the graphic was not pre-processed yet. The result is kept in
+    memory while the graphic version does not change, so it must not be
+    modified by the caller
+    """
+    version = (
+        GraphicJsonFile.objects.filter(
+            graphic_name__exact="lineages_variations", is_current=True
+        )
+        .values_list("version", flat=True)
+        .first()
+    )
+    if version is None:
+        return None
+    key = (version, window_size, str(start_date), str(end_date))
+    with _prevalence_cache_lock:
+        if key in _prevalence_cache:
+            _prevalence_cache.move_to_end(key)
+            return _prevalence_cache[key]
+    lineage_data = get_graphic_json_data("lineages_variations")
+    if lineage_data is None:
+        return None
+    prevalence = calculate_lineage_prevalence(
+        get_lineage_count_matrix(lineage_data), window_size, start_date, end_date
+    )
+    with _prevalence_cache_lock:
+        _prevalence_cache[key] = prevalence
+        while len(_prevalence_cache) > LINEAGE_PREVALENCE_CACHE_SIZE:
+            _prevalence_cache.popitem(last=False)
+    return prevalence
@@ -1,51 +1,46 @@
 import pandas as pd
-from relecov_dashboard.utils.pre_processing_data import (
-    pre_proc_specimen_source_pcr_1,
-    pre_proc_extraction_protocol_pcr_1,
-    pre_proc_calculation_date,
-)
+from relecov_dashboard.utils.pre_processing_jobs import schedule_pre_processing
+from relecov_dashboard.dashboard_config import ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE
 from relecov_core.utils.rest_api_handling import get_stats_data
 from relecov_dashboard.utils.generic_functions import get_graphic_json_data
-from relecov_dashboard.utils.plotly_graphics import bar_graphic, box_plot_graphic
+from relecov_dashboard.utils.plotly_graphics import bar_graphic
+from relecov_core.utils.plotly_graphics import histogram_box_plot_graphic
 
 
 def sample_processing_graphics():
     def get_pre_proc_data(graphic_name):
-        """Get the pre-processed data for the graphic name.
-        If there is not data stored for the graphic, it will query to store
-        them before calling for the second time
+        """Get the pre-processed histograms for the graphic name, as a
+        dictionary of name -> {value: number of samples}.
+        If there is not data stored for the graphic, or it was stored in a
+        previous format, a pre-processing job is queued and None is returned
         """
-
-        # map_graphic = {"extraction_protocol_pcr_1" : pre_proc_specimen_source_pcr_1(), "specimen_source_pcr_1": pre_proc_extraction_protocol_pcr_1(), "calculation_date": pre_proc_calculation_date()}
-
         json_data = get_graphic_json_data(graphic_name)
         if json_data is None:
-            # Execute the pre-processed task to get the data
-            if graphic_name == "extraction_protocol_pcr_1":
-                result = pre_proc_specimen_source_pcr_1()
-            elif graphic_name == "specimen_source_pcr_1":
-                result = pre_proc_extraction_protocol_pcr_1()
-            elif graphic_name == "calculation_date":
-                result = pre_proc_calculation_date()
-            else:
-                return {"ERROR": "pre-processing not defined"}
-            if "ERROR" in result:
-                return result
-            json_data = get_graphic_json_data(graphic_name)
-        # Convert string to float values
+            schedule_pre_processing(graphic_name, "missing_data")
+            return None
         if graphic_name == "calculation_date":
-            return [json_data]
-        data = []
-
+            if "intervals" not in json_data:
+                schedule_pre_processing(graphic_name, "outdated_data")
+                return None
+            # join the histograms of all laboratories
+            days = {}
+            for interval, lab_data in json_data["intervals"].items():
+                days[interval] = {}
+                for values in lab_data.values():
+                    for str_val, numbers in values.items():
+                        day = int(str_val)
+                        days[interval][day] = days[interval].get(day, 0) + numbers
+            return days
+        data = {}
+        # Convert string to float values
         for key, values in json_data.items():
-            tmp_data = []
+            data[key] = {}
             for str_val, numbers in values.items():
                 try:
                     float_val = float(str_val)
                 except ValueError:
                     continue
-                tmp_data += [float_val] * numbers
-            data.append({key: tmp_data})
+                data[key][float_val] = data[key].get(float_val, 0) + numbers
         return data
 
     def fetching_data_for_sample_processing(project_field, columns):
@@ -97,22 +92,29 @@ def sample_processing_graphics():
     )
 
     cts_extraction_data = get_pre_proc_data("extraction_protocol_pcr_1")
-
-    sample_processing["cts_extraction"] = box_plot_graphic(
-        cts_extraction_data,
-        {"title": "Boxplot Cts / Extraction protocol", "height": 400, "width": 520},
-    )
+    if cts_extraction_data is not None:
+        sample_processing["cts_extraction"] = histogram_box_plot_graphic(
+            cts_extraction_data,
+            {"title": "Boxplot Cts / Extraction protocol", "height": 400, "width": 520},
+        )
     # expecimen source graphics
     cts_specimen_data = get_pre_proc_data("specimen_source_pcr_1")
-
-    sample_processing["cts_specimen"] = box_plot_graphic(
-        cts_specimen_data,
-        {"title": "Boxplot Cts / specimen source", "height": 400, "width": 600},
-    )
+    if cts_specimen_data is not None:
+        sample_processing["cts_specimen"] = histogram_box_plot_graphic(
+            cts_specimen_data,
+            {"title": "Boxplot Cts / specimen source", "height": 400, "width": 600},
+        )
     # calculate the number of days spent in each state before moved on to next step
     calculation_date_data = get_pre_proc_data("calculation_date")
-    sample_processing["calculation_date"] = box_plot_graphic(
-        calculation_date_data,
-        {"title": "Time between sample step actions", "height": 400, "width": 420},
-    )
+    if calculation_date_data is not None:
+        sample_processing["calculation_date"] = histogram_box_plot_graphic(
+            calculation_date_data,
+            {"title": "Time between sample step actions", "height": 400, "width": 420},
+        )
+    if (
+        cts_extraction_data is None
+        or cts_specimen_data is None
+        or calculation_date_data is None
+    ):
+        sample_processing["pending"] = ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE
     return sample_processing
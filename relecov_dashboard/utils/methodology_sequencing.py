@@ -7,30 +7,20 @@ from relecov_dashboard.utils.plotly_graphics import (
 )
 from relecov_core.utils.rest_api_handling import get_stats_data
 from relecov_dashboard.utils.generic_functions import get_graphic_json_data
-from relecov_dashboard.utils.pre_processing_data import (
-    pre_proc_library_kit_pcr_1,
-    pre_proc_based_pairs_sequenced,
-)
+from relecov_dashboard.utils.pre_processing_jobs import schedule_pre_processing
+from relecov_dashboard.dashboard_config import ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE
 
 
 def sequencing_graphics():
     def get_pre_proc_data(graphic_name, out_format):
         """Get the pre-processed data for the graphic name.
-        If there is not data stored for the graphic, it will query to store
-        them before calling for the second time
+        If there is not data stored for the graphic, a pre-processing job is
+        queued and None is returned
         """
         json_data = get_graphic_json_data(graphic_name)
         if json_data is None:
-            # Execute the pre-processed task to get the data
-            if graphic_name == "library_kit_pcr_1":
-                result = pre_proc_library_kit_pcr_1()
-            elif graphic_name == "ct_number_of_base_pairs_sequenced":
-                result = pre_proc_based_pairs_sequenced()
-            else:
-                return {"ERROR": "pre-processing not defined"}
-            if "ERROR" in result:
-                return result
-            json_data = get_graphic_json_data(graphic_name)
+            schedule_pre_processing(graphic_name, "missing_data")
+            return None
         if out_format == "list_of_dict":
             data = []
             for key, values in json_data.items():
@@ -113,21 +103,29 @@ def sequencing_graphics():
     # box plot for library preparation kit
 
     cts_library_data = get_pre_proc_data("library_kit_pcr_1", "list_of_dict")
-    sequencing["cts_library"] = box_plot_graphic(
-        cts_library_data,
-        {"title": "Boxplot Cts / Library preparation kit", "height": 400, "width": 420},
-    )
+    if cts_library_data is not None:
+        sequencing["cts_library"] = box_plot_graphic(
+            cts_library_data,
+            {
+                "title": "Boxplot Cts / Library preparation kit",
+                "height": 400,
+                "width": 420,
+            },
+        )
 
     cts_pcr_1 = get_pre_proc_data("ct_number_of_base_pairs_sequenced", "dict")
-    sequencing["number_of_base"] = line_graphic(
-        cts_pcr_1["based"],
-        cts_pcr_1["cts"],
-        {
-            "title": "CTs / Base pairs sequenced",
-            "height": 350,
-            "width": 300,
-            "x_title": "Number of base pairs sequenced",
-            "y_title": "PCR CT 1",
-        },
-    )
+    if cts_pcr_1 is not None:
+        sequencing["number_of_base"] = line_graphic(
+            cts_pcr_1["based"],
+            cts_pcr_1["cts"],
+            {
+                "title": "CTs / Base pairs sequenced",
+                "height": 350,
+                "width": 300,
+                "x_title": "Number of base pairs sequenced",
+                "y_title": "PCR CT 1",
+            },
+        )
+    if cts_library_data is None or cts_pcr_1 is None:
+        sequencing["pending"] = ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE
     return sequencing
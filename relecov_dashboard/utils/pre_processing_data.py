@@ -1,6 +1,14 @@
-from datetime import datetime
+import pandas as pd
+
+from relecov_dashboard.dashboard_config import ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE
 from relecov_dashboard.models import GraphicJsonFile
+from relecov_dashboard.utils.bioinfo_snapshot import (
+    build_bioinfo_snapshot,
+    get_bioinfo_snapshot,
+    get_sample_values,
+)
 from relecov_core.utils.handling_variant import (
+    get_default_chromosome,
     get_domains_and_coordenates,
 )
 
@@ -11,6 +19,7 @@ from relecov_core.utils.handling_lineage import (
 from relecov_core.models import (
     LineageValues,
     Sample,
+    Variant,
     VariantInSample,
     VariantAnnotation,
     BioinfoAnalysisValue,
@@ -24,113 +33,117 @@ from relecov_core.utils.rest_api_handling import (
 
 
 def pre_proc_calculation_date():
-    """Fetch the information about date for each sample to know about the
-    number of days between different steps of samples
+    """Calculate the number of days between the collection, reception,
+    sequencing and analysis of the samples. The stored graphic has, for
+    each interval, the histogram of days for each laboratory, and the number
+    of values discarded for each reason
     """
+    # dates before this one were mistyped by users
+    start_date = pd.Timestamp("2019-12-31")
+    intervals = {
+        "coll_rec_date": ["collection_date", "recorded_date"],
+        "rec_seq_date": ["recorded_date", "sequencing_date"],
+        "seq_analyis_date": ["sequencing_date", "analysis_date"],
+    }
 
-    def convert_data_to_sample_dict(data, data_1, data_2):
-        out_data = {}
-        for item in data:
-            if not item[data_1] in out_data:
-                out_data[item[data_1]] = item[data_2]
-        return out_data
+    def get_date_df(data, name_key, date_key, column):
+        """Return a dataframe with the first date of each sample"""
+        df = pd.DataFrame(list(data), columns=[name_key, date_key])
+        df.columns = ["sample", column]
+        return df.dropna(subset=["sample"]).drop_duplicates(
+            subset="sample", keep="first"
+        )
 
-    def convert_str_to_datetime(data, separator, invalid_samples):
-        """Convert the string values to datetime object to perform calculation
-        dates
-        """
-        # start_date is set to discard not valid dates, becuase they were
-        # mistyped by user
-        start_date = datetime.strptime("2019-12-31", "%Y-%m-%d")
-        if separator:
-            d_format = "%Y" + separator + "%m" + separator + "%d"
-        else:
-            d_format = "%Y%m%d"
-        for sample in data.keys():
-            if sample in invalid_samples:
-                continue
-            if data[sample]:
-                f_date = datetime.strptime(data[sample], d_format)
-                if f_date < start_date:
-                    invalid_samples[sample] = True
-
-                else:
-                    data[sample] = f_date
-        return data, invalid_samples
-
-    def calculate_days(sample_list, date_1, date_2):
-        """Function gets 2 dictionnary list. For the same sample the substract
-        operation date_2 - date_1 is done.
+    def parse_dates(values, d_format):
+        """Return the parsed dates and the mask of values which were given
+        but are not valid dates
         """
-        out_data = []
-        for sample in sample_list:
-            if sample in date_1 and sample in date_2:
-                try:
-                    days = (date_2[sample] - date_1[sample]).days
-                    if (date_2[sample] - date_1[sample]).days > 1000:
-                        print(sample, "numero dias ", days)
-                    out_data.append((date_2[sample] - date_1[sample]).days)
-                except TypeError:
-                    out_data.append("bbbb")
-            else:
-                out_data.append("aaaaaa")
-        return out_data
-
-    # get sequencing date from sample table
-    invalid_samples = {}
-    analysis_date = BioinfoAnalysisValue.objects.filter(
-        bioinfo_analysis_fieldID__property_name__exact="analysis_date",
-    ).values("value", "sample__collecting_lab_sample_id")
-    analysis_date = convert_data_to_sample_dict(
-        analysis_date, "sample__collecting_lab_sample_id", "value"
-    )
-    analysis_date, invalid_samples = convert_str_to_datetime(
-        analysis_date, None, invalid_samples
+        values = values.where(values != "")
+        dates = pd.to_datetime(values, format=d_format, errors="coerce")
+        return dates, values.notna() & dates.isna()
+
+    samples = pd.DataFrame(
+        Sample.objects.all().values_list(
+            "collecting_lab_sample_id", "collecting_institution", "sequencing_date"
+        ),
+        columns=["sample", "lab", "sequencing_date"],
+    ).dropna(subset=["sample"])
+    samples = samples.drop_duplicates(subset="sample", keep="first")
+    samples["lab"] = samples["lab"].fillna("Unknown")
+    samples["sequencing_date"] = (
+        pd.to_datetime(samples["sequencing_date"], utc=True)
+        .dt.tz_localize(None)
+        .dt.normalize()
     )
 
-    seq_date = Sample.objects.all().values(
-        "collecting_lab_sample_id", "sequencing_date"
-    )
-    seq_date = convert_data_to_sample_dict(
-        seq_date, "collecting_lab_sample_id", "sequencing_date"
+    analysis_date = get_date_df(
+        BioinfoAnalysisValue.objects.filter(
+            bioinfo_analysis_fieldID__property_name__exact="analysis_date",
+        ).values_list("sample__collecting_lab_sample_id", "value"),
+        "sample__collecting_lab_sample_id",
+        "value",
+        "analysis_date",
     )
 
     # send request to iSkyLIMS
     collection_date = get_sample_parameter_data("collectionSampleDate")
-    collection_date = convert_data_to_sample_dict(
-        collection_date, "Sample Name", "collectionSampleDate"
-    )
-    collection_date, invalid_samples = convert_str_to_datetime(
-        collection_date, "-", invalid_samples
-    )
-
+    if "ERROR" in collection_date:
+        return collection_date
     recorded_date = get_sample_parameter_data("sampleEntryDate")
-    recorded_date = convert_data_to_sample_dict(
-        recorded_date, "Sample Name", "sampleEntryDate"
+    if "ERROR" in recorded_date:
+        return recorded_date
+    collection_date = get_date_df(
+        [
+            (d.get("Sample Name"), d.get("collectionSampleDate"))
+            for d in collection_date
+        ],
+        "Sample Name",
+        "collectionSampleDate",
+        "collection_date",
     )
-    recorded_date, invalid_samples = convert_str_to_datetime(
-        recorded_date, "-", invalid_samples
+    recorded_date = get_date_df(
+        [(d.get("Sample Name"), d.get("sampleEntryDate")) for d in recorded_date],
+        "Sample Name",
+        "sampleEntryDate",
+        "recorded_date",
     )
 
-    # perform calculation dates
-    calculation_dates = {}
-    sample_list = []
-    for sam in seq_date.keys():
-        if sam not in invalid_samples:
-            sample_list.append(sam)
-
-    # calculation_dates["samples"] = sample_list
-    calculation_dates["coll_rec_date"] = calculate_days(
-        sample_list, collection_date, recorded_date
+    df = (
+        samples.merge(collection_date, on="sample", how="left")
+        .merge(recorded_date, on="sample", how="left")
+        .merge(analysis_date, on="sample", how="left")
     )
-    calculation_dates["rec_seq_date"] = calculate_days(
-        sample_list, recorded_date, seq_date
-    )
-    calculation_dates["seq_analyis_date"] = calculate_days(
-        sample_list, seq_date, analysis_date
-    )
-    # json_data = json.dumps(calculation_dates)
-    # Save json in database
+    # mask of the dates which are not valid for each column
+    invalid = {"sequencing_date": df["sequencing_date"] < start_date}
+    for column, d_format in [
+        ["collection_date", "%Y-%m-%d"],
+        ["recorded_date", "%Y-%m-%d"],
+        ["analysis_date", "%Y%m%d"],
+    ]:
+        df[column], invalid[column] = parse_dates(df[column], d_format)
+        invalid[column] |= df[column] < start_date
+
+    reasons = {"invalid_date": 0, "missing_date": 0, "negative_days": 0}
+    calculation_dates = {"intervals": {}, "invalid": reasons}
+    for interval, (date_1, date_2) in intervals.items():
+        days = (df[date_2] - df[date_1]).dt.days
+        invalid_date = invalid[date_1] | invalid[date_2]
+        missing = ~invalid_date & days.isna()
+        negative = ~invalid_date & (days < 0)
+        reasons["invalid_date"] += int(invalid_date.sum())
+        reasons["missing_date"] += int(missing.sum())
+        reasons["negative_days"] += int(negative.sum())
+        valid = ~(invalid_date | missing | negative)
+        histogram = (
+            pd.DataFrame({"lab": df["lab"][valid], "days": days[valid].astype(int)})
+            .groupby(["lab", "days"])
+            .size()
+        )
+        lab_data = {}
+        for (lab, day), count in histogram.items():
+            lab_data.setdefault(lab, {})[str(day)] = int(count)
+        calculation_dates["intervals"][interval] = lab_data
+
     GraphicJsonFile.objects.create_new_graphic_json(
         {"graphic_name": "calculation_date", "graphic_data": calculation_dates}
     )
@@ -140,46 +153,35 @@ def pre_proc_calculation_date():
 
 def pre_proc_lineages_variations():
     """Collect the lineages information to store them at the pre-processed
-    graphicJasonFile. Smoothing is performed before saving into database
+    graphicJasonFile. For each collection date the number of samples of each
+    lineage is stored. Collection dates are fetched in a single request to
+    iSkyLIMS and lineages in a single query
     """
 
     in_date_samples = fetch_samples_on_condition("collectionSampleDate")
     if "ERROR" in in_date_samples:
         return in_date_samples
-    collect_data = []
-    num_samples_data = []
-    lineage_data = []
-    date_sample = {}
-    for s_data in in_date_samples["DATA"]:
-        if s_data["collectionSampleDate"] not in date_sample:
-            date_sample[s_data["collectionSampleDate"]] = []
-            date_sample[s_data["collectionSampleDate"]].append(s_data["Sample Name"])
-
-    for date, samples in date_sample.items():
-        lineage_in_samples = (
-            LineageValues.objects.filter(
-                lineage_fieldID__property_name="lineage_name",
-                sample__collecting_lab_sample_id__in=samples,
-            )
-            .values_list("value", flat=True)
-            .distinct()
-        )
-        for lineage in lineage_in_samples:
-
-            # value_data = {"value_1": date, "value_2": str(lineage)}
-            collect_data.append(date)
-            lineage_data.append(lineage)
-            num_samples_data.append(
-                Sample.objects.filter(
-                    collecting_lab_sample_id__in=samples,
-                    lineage_values__value__iexact=lineage,
-                ).count()
-            )
+    date_df = pd.DataFrame(
+        in_date_samples["DATA"], columns=["Sample Name", "collectionSampleDate"]
+    )
+    lineage_df = pd.DataFrame(
+        LineageValues.objects.filter(
+            lineage_fieldID__property_name="lineage_name",
+            sample__collecting_lab_sample_id__isnull=False,
+        ).values_list("sample__collecting_lab_sample_id", "value"),
+        columns=["Sample Name", "Lineage"],
+    )
+    lineage_count = (
+        date_df.merge(lineage_df, on="Sample Name")
+        .drop_duplicates()
+        .groupby(["collectionSampleDate", "Lineage"])
+        .size()
+    )
 
     lineage_var_data = {
-        "Collection date": collect_data,
-        "Lineage": lineage_data,
-        "samples": num_samples_data,
+        "Collection date": lineage_count.index.get_level_values(0).tolist(),
+        "Lineage": lineage_count.index.get_level_values(1).tolist(),
+        "samples": [int(count) for count in lineage_count.values],
     }
     json_data = {
         "graphic_name": "lineages_variations",
@@ -191,9 +193,13 @@ def pre_proc_lineages_variations():
 
 
 def pre_proc_variations_per_lineage(chromosome=None):
-    """Process variants per lineages"""
-
+    """Process variants per lineages. When no chromosome is given, the
+    default one is used
+    """
+    if chromosome is None:
+        chromosome = get_default_chromosome()
     lineage_data = {}
+    domains = get_domains_and_coordenates(chromosome)
 
     # Grab lineages matching selected lineage
     for lineage in get_lineages_list():
@@ -224,7 +230,7 @@ def pre_proc_variations_per_lineage(chromosome=None):
                 .count()
             )
             mut_freq_population = number_samples_wmutation / number_samples_wlineage
-            pos = VariantInSample.objects.filter(variantID_id=variant)[0].get_pos()
+            pos = Variant.objects.filter(pk=variant).values_list("pos", flat=True)[0]
 
             effects = (
                 VariantAnnotation.objects.filter(variantID_id__pk=variant)
@@ -238,8 +244,6 @@ def pre_proc_variations_per_lineage(chromosome=None):
                 list_of_pos.append(pos)
                 list_of_effects.append(effects)
 
-        domains = get_domains_and_coordenates(chromosome)
-
         mutation_data["x"] = list_of_pos
         mutation_data["y"] = list_of_af
         mutation_data["mutationGroups"] = list_of_effects
@@ -310,33 +314,43 @@ def pre_proc_library_kit_pcr_1():
     return {"SUCCESS": "Success"}
 
 
+def pre_proc_bioinfo_analysis_snapshot():
+    """Store the bioinfo analysis values in a wide table, with typed
+    columns, used by the bioinfo graphics
+    """
+    GraphicJsonFile.objects.create_new_graphic_json(
+        {
+            "graphic_name": "bioinfo_analysis_snapshot",
+            "graphic_data": build_bioinfo_snapshot(),
+        }
+    )
+    return {"SUCCESS": "Success"}
+
+
+def get_lims_values(data, column):
+    """Return the numeric values of the LIMS parameter indexed by sample"""
+    df = pd.DataFrame(list(data), columns=["Sample name", column])
+    df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df.dropna().drop_duplicates(subset="Sample name").set_index("Sample name")
+
+
 def pre_proc_based_pairs_sequenced():
-    based_pairs = {}
+    snapshot = get_bioinfo_snapshot()
+    if snapshot is None:
+        return {"ERROR": ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE}
     pcr_ct_1_values = get_sample_parameter_data(
         {"sample_project_name": "relecov", "parameter": "diagnostic_pcr_Ct_value_1"}
     )
     if "ERROR" in pcr_ct_1_values:
         return pcr_ct_1_values
-    # import pdb; pdb.set_trace()
-    for ct_value in pcr_ct_1_values:
-        sample_name = ct_value["Sample name"]
-        # import pdb; pdb.set_trace()
-        base_value = (
-            BioinfoAnalysisValue.objects.filter(
-                bioinfo_analysis_fieldID__property_name__exact="number_of_base_pairs_sequenced",
-                sample__collecting_lab_sample_id__exact=sample_name,
-            )
-            .last()
-            .get_value()
-        )
-        try:
-            float_base_value = float(ct_value["diagnostic_pcr_Ct_value_1"])
-            base_value_int = int(base_value)
-        except ValueError:
-            continue
-        if base_value_int not in based_pairs:
-            based_pairs[base_value_int] = []
-        based_pairs[base_value_int].append(float_base_value)
+    # ignore the samples that do not have bioinfo analysis yet
+    df = get_lims_values(pcr_ct_1_values, "diagnostic_pcr_Ct_value_1").join(
+        get_sample_values(snapshot, "number_of_base_pairs_sequenced"), how="inner"
+    )
+    based_pairs = {
+        int(base_value): group["diagnostic_pcr_Ct_value_1"].tolist()
+        for base_value, group in df.groupby("number_of_base_pairs_sequenced")
+    }
 
     GraphicJsonFile.objects.create_new_graphic_json(
         {
@@ -350,35 +364,18 @@ def pre_proc_based_pairs_sequenced():
 
 # data preparation for methodology bioinfo dashboard
 def pre_proc_depth_variants():
-    depth_sample_list = BioinfoAnalysisValue.objects.filter(
-        bioinfo_analysis_fieldID__property_name__exact="depth_of_coverage_value"
-    ).values("value", "sample__collecting_lab_sample_id")
-    variant_sample_list = BioinfoAnalysisValue.objects.filter(
-        bioinfo_analysis_fieldID__property_name__exact="number_of_variants_in_consensus"
-    ).values("value", "sample__collecting_lab_sample_id")
-    # depth = []
-    # variant = []
-    tmp_depth = {}
+    snapshot = get_bioinfo_snapshot()
+    if snapshot is None:
+        return {"ERROR": ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE}
+    columns = ["depth_of_coverage_value", "number_of_variants_in_consensus"]
     depth_variant = {}
-    for item in depth_sample_list:
-        try:
-            tmp_depth[item["sample__collecting_lab_sample_id"]] = float(item["value"])
-        except ValueError:
-            # ignore the entry if value cannot converted to float
-            continue
-    for item in variant_sample_list:
-        # ignore the samples that do not have depth value
-        if item["sample__collecting_lab_sample_id"] not in tmp_depth:
-            continue
-        d_value = float(tmp_depth[item["sample__collecting_lab_sample_id"]])
-        if d_value not in depth_variant:
-            depth_variant[d_value] = []
-        depth_variant[d_value].append(int(item["value"]))
-    # depth_variant_ordered = dict(sorted(depth_variant.items()))
-    # depth.append(tmp_depth[item["sample__collecting_lab_sample_id"]])
-    # variant.append(int(item["value"]))
-    # depth_variant = {"depth": depth, "variant": variant}
-    # import pdb; pdb.set_trace()
+    if set(columns).issubset(snapshot.columns):
+        # ignore the analysis that do not have both values
+        df = snapshot[columns].dropna()
+        depth_variant = {
+            float(depth): group["number_of_variants_in_consensus"].astype(int).tolist()
+            for depth, group in df.groupby("depth_of_coverage_value")
+        }
     GraphicJsonFile.objects.create_new_graphic_json(
         {
             "graphic_name": "depth_variant_consensus",
@@ -389,27 +386,21 @@ def pre_proc_depth_variants():
 
 
 def pre_proc_depth_sample_run():
-    depth_sample_list = BioinfoAnalysisValue.objects.filter(
-        bioinfo_analysis_fieldID__property_name__exact="depth_of_coverage_value"
-    ).values("value", "sample__collecting_lab_sample_id")
+    snapshot = get_bioinfo_snapshot()
+    if snapshot is None:
+        return {"ERROR": ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE}
     sample_in_run = get_sample_parameter_data(
         {"sample_project_name": "relecov", "parameter": "number_of_samples_in_run"}
     )
-    tmp_depth = {}
-    depth_sample_run = {}
-    for item in depth_sample_list:
-        try:
-            tmp_depth[item["sample__collecting_lab_sample_id"]] = float(item["value"])
-        except ValueError:
-            # ignore the entry if value cannot converted to float
-            continue
-    for item in sample_in_run:
-        if item["Sample name"] not in tmp_depth:
-            continue
-        d_value = tmp_depth[item["Sample name"]]
-        if d_value not in depth_sample_run:
-            depth_sample_run[d_value] = []
-        depth_sample_run[d_value].append(int(item["number_of_samples_in_run"]))
+    if "ERROR" in sample_in_run:
+        return sample_in_run
+    df = get_lims_values(sample_in_run, "number_of_samples_in_run").join(
+        get_sample_values(snapshot, "depth_of_coverage_value"), how="inner"
+    )
+    depth_sample_run = {
+        float(depth): group["number_of_samples_in_run"].astype(int).tolist()
+        for depth, group in df.groupby("depth_of_coverage_value")
+    }
 
     GraphicJsonFile.objects.create_new_graphic_json(
         {
@@ -0,0 +1,195 @@
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from relecov_dashboard.models import PreProcessJob, PreProcessLock
+from relecov_dashboard.dashboard_config import (
+    ERROR_PRE_PROCESSING_NOT_DEFINED,
+    ERROR_PRE_PROCESSING_WORKER_STOPPED,
+    PRE_PROCESSING_DEPENDENTS,
+    PRE_PROCESSING_LOCK_TIMEOUT,
+    PRE_PROCESSING_ON_INGESTION,
+)
+from relecov_dashboard.utils.pre_processing_data import (
+    pre_proc_based_pairs_sequenced,
+    pre_proc_bioinfo_analysis_snapshot,
+    pre_proc_calculation_date,
+    pre_proc_depth_sample_run,
+    pre_proc_depth_variants,
+    pre_proc_extraction_protocol_pcr_1,
+    pre_proc_library_kit_pcr_1,
+    pre_proc_lineages_variations,
+    pre_proc_specimen_source_pcr_1,
+    pre_proc_variations_per_lineage,
+)
+
+# graphic_name stored in GraphicJsonFile and the function that creates it
+PRE_PROCESSING_FUNCTIONS = {
+    "bioinfo_analysis_snapshot": pre_proc_bioinfo_analysis_snapshot,
+    "calculation_date": pre_proc_calculation_date,
+    "lineages_variations": pre_proc_lineages_variations,
+    "variations_per_lineage": pre_proc_variations_per_lineage,
+    "specimen_source_pcr_1": pre_proc_specimen_source_pcr_1,
+    "extraction_protocol_pcr_1": pre_proc_extraction_protocol_pcr_1,
+    "library_kit_pcr_1": pre_proc_library_kit_pcr_1,
+    "ct_number_of_base_pairs_sequenced": pre_proc_based_pairs_sequenced,
+    "depth_variant_consensus": pre_proc_depth_variants,
+    "depth_samples_in_run": pre_proc_depth_sample_run,
+}
+
+
+def schedule_pre_processing(graphic_name, reason):
+    """Add a job to the queue for the graphic. If there is already a job
+    waiting for the graphic, no new job is created and the queued one is
+    returned
+    """
+    if graphic_name not in PRE_PROCESSING_FUNCTIONS:
+        return {"ERROR": ERROR_PRE_PROCESSING_NOT_DEFINED}
+    queued_job = PreProcessJob.objects.filter(
+        graphic_name__exact=graphic_name, state__exact="queued"
+    ).first()
+    if queued_job is not None:
+        return queued_job
+    return PreProcessJob.objects.create_new_job(
+        {"graphic_name": graphic_name, "reason": reason}
+    )
+
+
+def schedule_all_pre_processing(reason="periodic"):
+    """Add a job to the queue for every pre-processed graphic"""
+    return [
+        schedule_pre_processing(graphic_name, reason)
+        for graphic_name in PRE_PROCESSING_FUNCTIONS
+    ]
+
+
+def schedule_pre_processing_after_ingestion(sender, event, **kwargs):
+    """Receiver for the ingestion signal sent by the API. Queue the graphics
+    that depend on the ingested data
+    """
+    for graphic_name in PRE_PROCESSING_ON_INGESTION.get(event, []):
+        schedule_pre_processing(graphic_name, event)
+    return
+
+
+def acquire_pre_processing_lock(graphic_name, job_obj):
+    """Create the lock row for the graphic. Return False if another worker
+    is already running the graphic. Lock rows older than the timeout are
+    considered stale and removed
+    """
+    stale_date = timezone.now() - timedelta(seconds=PRE_PROCESSING_LOCK_TIMEOUT)
+    PreProcessLock.objects.filter(
+        graphic_name__exact=graphic_name, locked_at__lt=stale_date
+    ).delete()
+    try:
+        with transaction.atomic():
+            PreProcessLock.objects.create(graphic_name=graphic_name, job=job_obj)
+    except IntegrityError:
+        return False
+    return True
+
+
+def release_pre_processing_lock(graphic_name):
+    PreProcessLock.objects.filter(graphic_name__exact=graphic_name).delete()
+    return
+
+
+def recover_stale_pre_processing_jobs():
+    """Jobs left running by a worker that died are queued again, or set to
+    error if the graphic is already queued. A job is stale when it started
+    before the lock timeout, when its lock is also removed
+    """
+    stale_date = timezone.now() - timedelta(seconds=PRE_PROCESSING_LOCK_TIMEOUT)
+    PreProcessLock.objects.filter(locked_at__lt=stale_date).delete()
+    queued_names = set(
+        PreProcessJob.objects.filter(state__exact="queued").values_list(
+            "graphic_name", flat=True
+        )
+    )
+    recovered = 0
+    for job_obj in PreProcessJob.objects.filter(
+        state__exact="running", started_at__lt=stale_date
+    ).order_by("pk"):
+        graphic_name = job_obj.get_graphic_name()
+        if graphic_name in queued_names:
+            PreProcessJob.objects.filter(pk=job_obj.pk).update(
+                state="error",
+                outcome=ERROR_PRE_PROCESSING_WORKER_STOPPED,
+                finished_at=timezone.now(),
+            )
+        else:
+            PreProcessJob.objects.filter(pk=job_obj.pk).update(
+                state="queued", started_at=None
+            )
+            queued_names.add(graphic_name)
+        recovered += 1
+    return recovered
+
+
+def run_pre_processing_job(job_obj):
+    """Execute the pre-processing function for the job, recording the
+    duration and the outcome. Jobs are skipped, and kept in the queue, when
+    the graphic is locked by other worker
+    """
+    graphic_name = job_obj.get_graphic_name()
+    if not acquire_pre_processing_lock(graphic_name, job_obj):
+        return False
+    try:
+        # claim the job. Another worker could take it before getting the lock
+        claimed = PreProcessJob.objects.filter(
+            pk=job_obj.pk, state__exact="queued"
+        ).update(state="running", started_at=timezone.now())
+        if claimed == 0:
+            return False
+        start = time.perf_counter()
+        try:
+            result = PRE_PROCESSING_FUNCTIONS[graphic_name]()
+        except Exception as e:
+            result = {"ERROR": str(e)}
+        duration = time.perf_counter() - start
+        # functions which do not return a dictionary did not report errors
+        if isinstance(result, dict) and "ERROR" in result:
+            state = "error"
+            outcome = str(result["ERROR"])[:255]
+        else:
+            state = "done"
+            outcome = "Success"
+        PreProcessJob.objects.filter(pk=job_obj.pk).update(
+            state=state,
+            outcome=outcome,
+            duration=duration,
+            finished_at=timezone.now(),
+        )
+    finally:
+        release_pre_processing_lock(graphic_name)
+    if state == "done":
+        for dependent_name in PRE_PROCESSING_DEPENDENTS.get(graphic_name, []):
+            schedule_pre_processing(dependent_name, graphic_name)
+    return True
+
+
+def run_pending_pre_processing_jobs(max_jobs=None):
+    """Run the queued jobs in the order they were scheduled. Return the
+    number of executed jobs
+    """
+    recover_stale_pre_processing_jobs()
+    executed = 0
+    job_objs = PreProcessJob.objects.filter(state__exact="queued").order_by(
+        "scheduled_at"
+    )
+    for job_obj in job_objs:
+        if max_jobs is not None and executed >= max_jobs:
+            break
+        if run_pre_processing_job(job_obj):
+            executed += 1
+    return executed
+
+
+def get_pre_processing_jobs(graphic_name=None, last=20):
+    """Return the information of the latest jobs"""
+    job_objs = PreProcessJob.objects.all()
+    if graphic_name is not None:
+        job_objs = job_objs.filter(graphic_name__exact=graphic_name)
+    return [job_obj.get_job_info() for job_obj in job_objs.order_by("-pk")[:last]]
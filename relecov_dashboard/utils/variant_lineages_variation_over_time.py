@@ -0,0 +1,28 @@
+from plotly.offline import plot
+
+from relecov_dashboard.dashboard_config import (
+    ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE,
+    LINEAGE_PREVALENCE_WINDOW_SIZE,
+)
+from relecov_dashboard.utils.graphics.lineage_variation_over_time_fisabio import (
+    make_lineage_variaton_plot,
+)
+
+
+def create_lineages_variations_graphic(
+    window_size=LINEAGE_PREVALENCE_WINDOW_SIZE, start_date=None, end_date=None
+):
+    """Draw the relative percentage of the lineages in a sliding window of
+    window_size days. If start or end dates are given only that range is
+    displayed
+    """
+    select_range = start_date is not None or end_date is not None
+    fig = make_lineage_variaton_plot(start_date, end_date, select_range, window_size)
+    if fig is None:
+        return {"ERROR": ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE}
+    return plot(
+        fig,
+        output_type="div",
+        include_plotlyjs=False,
+        config={"displaylogo": False},
+    )
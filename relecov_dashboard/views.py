@@ -66,8 +66,11 @@ from relecov_dashboard.utils.graphics.samples_received_over_time_graph import (
 
 from relecov_dashboard.dashboard_config import (
     ERROR_NO_LINEAGES_ARE_DEFINED_YET,
+    ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE,
 )
 
+from relecov_dashboard.utils.dashboard_cache import cache_dashboard
+
 # New files
 from relecov_dashboard.utils.graphics.variant_sample_dashboard import (
     display_received_samples_graph,
@@ -87,6 +90,8 @@ def variants_index(request):
     return render(request, "relecov_dashboard/variantsIndex.html")
 
 
+# not cached because the map is a DjangoDash application, registered when
+# the view is executed
 def received_samples_dashboard(request):
     sample_data = {}
     # samples receive over time map
@@ -123,6 +128,12 @@ def mutations_in_lineages_dashboard(request):
         graphic_name="variations_per_lineage", lineage=None, chromosome=def_chrom
     )
 
+    if mdata is None and lineage is None:
+        return render(
+            request,
+            "relecov_dashboard/dashboard_templates/mutationsInLineagesDashboard.html",
+            {"ERROR": ERROR_PRE_PROCESSED_DATA_NOT_AVAILABLE},
+        )
     if not mdata:
         return render(
             request,
@@ -156,6 +167,7 @@ def spike_mutations_3d_dashboard(request):
     )
 
 
+@cache_dashboard(graphic_names=["lineages_variations"])
 def lineages_voc_dashboard(request):
     # Draw lineage based on time
     draw_lineages = {}
@@ -176,6 +188,7 @@ def methodology_index(request):
     )
 
 
+@cache_dashboard(models=(), lims_data=True)
 def methodology_host_info(request):
     host_info = host_info_graphics()
     if "ERROR" in host_info:
@@ -187,6 +200,15 @@ def methodology_host_info(request):
     )
 
 
+@cache_dashboard(
+    graphic_names=[
+        "extraction_protocol_pcr_1",
+        "specimen_source_pcr_1",
+        "calculation_date",
+    ],
+    models=(),
+    lims_data=True,
+)
 def methodology_sample_processing(request):
     sample_processing = sample_processing_graphics()
     if "ERROR" in sample_processing:
@@ -202,6 +224,11 @@ def methodology_sample_processing(request):
     )
 
 
+@cache_dashboard(
+    graphic_names=["library_kit_pcr_1", "ct_number_of_base_pairs_sequenced"],
+    models=(),
+    lims_data=True,
+)
 def methodology_sequencing(request):
     sequencing = sequencing_graphics()
     if "ERROR" in sequencing:
@@ -217,6 +244,14 @@ def methodology_sequencing(request):
     )
 
 
+@cache_dashboard(
+    graphic_names=[
+        "bioinfo_analysis_snapshot",
+        "depth_variant_consensus",
+        "depth_samples_in_run",
+    ],
+    models=(),
+)
 def methodology_bioinfo(request):
     bioinfo = bioinfo_graphics()
     return render(
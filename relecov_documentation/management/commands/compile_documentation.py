@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from relecov_documentation.utils.markdown_handling import (
+    compile_documentation,
+    get_markdown_folder,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile the markdown files of the documentation to html, to check "
+        "them before they are served. The server compiles each file on the "
+        "first request"
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        m_files = compile_documentation()
+        for m_file in m_files:
+            self.stdout.write("Compiled %s" % m_file)
+        self.stdout.write(
+            "Compiled %s documentation files from %s in %.3f seconds"
+            % (len(m_files), get_markdown_folder(), time.perf_counter() - start)
+        )
@@ -4,24 +4,79 @@ from relecov_documentation import views
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path("", views.index, name="index"),
+    path("", views.documentation_page, {"m_file": "documentation.md"}, name="index"),
     path(
         "createUserAccount/",
-        views.create_user_account,
+        views.documentation_page,
+        {"m_file": "create_user_account.md"},
         name="create_user_account",
     ),
     path(
         "initialConfiguration",
-        views.initial_configuration,
+        views.documentation_page,
+        {"m_file": "initialConfiguration.md"},
         name="initial_configuration",
     ),
-    path("installation.md/", views.installation, name="installation"),
-    path("intranet/", views.intranet, name="intranet"),
-    path("dashboard/", views.dashboard, name="dashboard"),
-    path("metadataLabForm/", views.upload_metadata_lab, name="upload_metadata_lab"),
-    path("UploadToEna/", views.upload_to_ena, name="upload_to_ena"),
-    path("UploadToGisaid/", views.upload_to_gisaid, name="upload_to_gisaid"),
-    path("ApiUsage/", views.api_usage, name="api_usage"),
+    path(
+        "installation.md/",
+        views.documentation_page,
+        {"m_file": "installation.md"},
+        name="installation",
+    ),
+    path(
+        "intranet/",
+        views.documentation_page,
+        {"m_file": "intranet.md"},
+        name="intranet",
+    ),
+    path(
+        "dashboard/",
+        views.documentation_page,
+        {"m_file": "dashboard.md"},
+        name="dashboard",
+    ),
+    path(
+        "ResultsDownload/",
+        views.documentation_page,
+        {"m_file": "results_download.md"},
+        name="results_download",
+    ),
+    path(
+        "ResultsInfoProcessed/",
+        views.documentation_page,
+        {"m_file": "results_info_processed.md"},
+        name="results_info_processed",
+    ),
+    path(
+        "ResultsInfoReceived/",
+        views.documentation_page,
+        {"m_file": "results_info_received.md"},
+        name="results_info_received",
+    ),
+    path(
+        "metadataLabForm/",
+        views.documentation_page,
+        {"m_file": "upload_metadata_lab.md"},
+        name="upload_metadata_lab",
+    ),
+    path(
+        "UploadToEna/",
+        views.documentation_page,
+        {"m_file": "upload_to_ena.md"},
+        name="upload_to_ena",
+    ),
+    path(
+        "UploadToGisaid/",
+        views.documentation_page,
+        {"m_file": "upload_to_gisaid.md"},
+        name="upload_to_gisaid",
+    ),
+    path(
+        "ApiUsage/",
+        views.documentation_page,
+        {"m_file": "api_usage.md"},
+        name="api_usage",
+    ),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
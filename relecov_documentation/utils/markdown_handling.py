@@ -1,10 +1,17 @@
+import hashlib
 import os
+import threading
 
 from django.conf import settings
 import markdown
 
 # from django import template
 
+# markdown file name -> {"mtime": mtime, "hash": hash, "html": html}, kept
+# per process
+_compiled_files = {}
+_compiled_files_lock = threading.Lock()
+
 
 def fix_img_folder(text):
     """Change the image folder inside the markdown_files to the the static"""
@@ -12,12 +19,69 @@ def fix_img_folder(text):
     return new_text
 
 
-def markdown_to_html(m_file):
-    m_path = os.path.join(
-        settings.BASE_DIR, "relecov_documentation", "markdown_files", m_file
+def get_markdown_folder():
+    return os.path.join(settings.BASE_DIR, "relecov_documentation", "markdown_files")
+
+
+def compile_markdown_file(m_file):
+    """Convert the markdown file to html and keep it in memory with the
+    modification time and the hash of the file. The conversion is skipped
+    if the content did not change since it was compiled.
+    Return the compiled html or None if the file does not exist
+    """
+    m_path = os.path.join(get_markdown_folder(), m_file)
+    try:
+        mtime = os.stat(m_path).st_mtime_ns
+        with open(m_path, "rb") as fh:
+            content = fh.read()
+    except (FileNotFoundError, IsADirectoryError):
+        with _compiled_files_lock:
+            _compiled_files.pop(m_file, None)
+        return None
+    content_hash = hashlib.sha256(content).hexdigest()
+    with _compiled_files_lock:
+        compiled = _compiled_files.get(m_file)
+        if compiled is not None and compiled["hash"] == content_hash:
+            compiled["mtime"] = mtime
+            return compiled["html"]
+    html = fix_img_folder(
+        markdown.markdown(content.decode("utf-8"), extensions=["toc", "tables"])
     )
-    if not os.path.isfile(m_path):
-        return {"ERROR": "FILE NOT FOUND"}
-    with open(m_path, "r") as fh:
-        text = fh.read()
-    return markdown.markdown(text, extensions=["toc", "tables"])
+    with _compiled_files_lock:
+        _compiled_files[m_file] = {"mtime": mtime, "hash": content_hash, "html": html}
+    return html
+
+
+def compile_documentation():
+    """Compile all the markdown files of the documentation. Return the names
+    of the compiled files, empty if the markdown folder does not exist
+    """
+    try:
+        m_files = sorted(
+            m_file
+            for m_file in os.listdir(get_markdown_folder())
+            if m_file.endswith(".md")
+        )
+    except FileNotFoundError:
+        return []
+    return [m_file for m_file in m_files if compile_markdown_file(m_file) is not None]
+
+
+def get_documentation_html(m_file):
+    """Return the compiled html of the markdown file, or None if the file
+    does not exist. When DEBUG is set the modification time of the file is
+    checked on each call, so that changes are displayed without restarting
+    """
+    with _compiled_files_lock:
+        compiled = _compiled_files.get(m_file)
+    if compiled is None:
+        return compile_markdown_file(m_file)
+    if settings.DEBUG:
+        m_path = os.path.join(get_markdown_folder(), m_file)
+        try:
+            mtime = os.stat(m_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != compiled["mtime"]:
+            return compile_markdown_file(m_file)
+    return compiled["html"]